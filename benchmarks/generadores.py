@@ -0,0 +1,102 @@
+"""
+Generadores sintéticos y reproducibles (con semilla) de los datos del sistema
+Producen los tres db_*.csv y ratings_Electronics.csv con el mismo formato que
+data/, a cualquier escala. Los ids del catálogo y de los usuarios son un
+subconjunto de los del archivo de ratings, como en los datos reales
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+PRENDAS = ['Camisa', 'Camiseta', 'Pantalón', 'Zapato', 'Chaqueta', 'Reloj', 'Bufanda', 'Cinturón', 'Gorra', 'Bolso']
+ADJETIVOS = ['Clásico', 'Algodón', 'Lino', 'Slim', 'Premium', 'Oversize', 'Cuero', 'Deportivo', 'Elegante', 'Básico']
+MARCAS = ['Zara', 'Mango', "Levi's", 'Nike', 'Adidas', 'Massimo Dutti', 'Gucci', 'Tommy Hilfiger', 'Lacoste', 'Uniqlo']
+CATEGORIAS = ['Camisas', 'Camisetas', 'Pantalones', 'Zapatos', 'Chaquetas', 'Accesorios']
+
+
+def dimensiones(n_ratings):
+    """Usuarios y productos para un tamaño de ratings (proporciones similares a Electronics)"""
+    n_usuarios = max(100, n_ratings // 8)
+    n_productos = max(50, n_ratings // 20)
+    return n_usuarios, n_productos
+
+
+def ids_usuarios(n):
+    return np.char.add('A', np.char.zfill(np.arange(n).astype(str), 13))
+
+
+def ids_productos(n):
+    return np.char.add('B', np.char.zfill(np.arange(n).astype(str), 9))
+
+
+def generar_ratings(ruta, n_ratings, semilla=0):
+    """Escribe ratings_Electronics.csv (sin encabezado: user_id,prod_id,rating,timestamp)"""
+    rng = np.random.default_rng(semilla)
+    n_usuarios, n_productos = dimensiones(n_ratings)
+
+    # La mitad de los ratings viene de un 3% de usuarios muy activos (los que pasan el filtro >= 50)
+    n_activos = max(1, int(n_usuarios * 0.03))
+    mitad = n_ratings // 2
+    usuarios = np.concatenate([
+        rng.integers(0, n_activos, mitad),
+        rng.integers(0, n_usuarios, n_ratings - mitad),
+    ])
+    # Popularidad de productos con cola larga
+    productos = (rng.zipf(1.3, n_ratings) - 1) % n_productos
+    ratings = rng.choice([1.0, 2.0, 3.0, 4.0, 5.0], n_ratings, p=[0.07, 0.05, 0.09, 0.2, 0.59])
+    timestamps = rng.integers(1_000_000_000, 1_400_000_000, n_ratings)
+
+    pd.DataFrame({
+        'user_id': ids_usuarios(n_usuarios)[usuarios],
+        'prod_id': ids_productos(n_productos)[productos],
+        'rating': ratings,
+        'timestamp': timestamps,
+    }).to_csv(ruta, header=False, index=False)
+
+
+def generar_base_relacional(directorio, n_calificaciones, semilla=0):
+    """Escribe db_usuarios.csv, db_productos.csv y db_calificaciones_completo.csv"""
+    rng = np.random.default_rng(semilla)
+    directorio = Path(directorio)
+    n_usuarios, n_productos = dimensiones(n_calificaciones)
+    user_ids = ids_usuarios(n_usuarios)
+    prod_ids = ids_productos(n_productos)
+
+    calificaciones = pd.DataFrame({
+        'user_id': user_ids[rng.integers(0, n_usuarios, n_calificaciones)],
+        'prod_id': prod_ids[(rng.zipf(1.3, n_calificaciones) - 1) % n_productos],
+        'calificacion': rng.choice([1, 2, 3, 4, 5], n_calificaciones, p=[0.07, 0.05, 0.09, 0.2, 0.59]),
+        'fecha': pd.to_datetime(rng.integers(1_600_000_000, 1_700_000_000, n_calificaciones), unit='s').strftime('%Y-%m-%d'),
+    })
+    calificaciones.to_csv(directorio / 'db_calificaciones_completo.csv', index=False)
+
+    pd.DataFrame({
+        'user_id': user_ids,
+        'nombre_usuario': [f'Usuario {i}' for i in range(n_usuarios)],
+        'total_calificaciones': np.bincount(pd.Categorical(calificaciones['user_id'], categories=user_ids).codes, minlength=n_usuarios),
+    }).to_csv(directorio / 'db_usuarios.csv', sep=';', index=False)
+
+    prendas = rng.integers(0, len(PRENDAS), n_productos)
+    imagenes = np.where(rng.random(n_productos) < 0.9, np.char.add('https://img.example.com/', prod_ids), '')
+    pd.DataFrame({
+        'prod_id': prod_ids,
+        'nombre_producto': [f'{PRENDAS[p]} {ADJETIVOS[a]} {i}' for i, (p, a) in enumerate(zip(prendas, rng.integers(0, len(ADJETIVOS), n_productos)))],
+        'marca': rng.choice(MARCAS, n_productos),
+        'precio': rng.integers(1000, 29900, n_productos),
+        'imagen_url': imagenes,
+        'cantidad_resenas': rng.integers(0, 500, n_productos),
+        'categoria': np.array(CATEGORIAS)[np.minimum(prendas, len(CATEGORIAS) - 1)],
+    }).to_csv(directorio / 'db_productos.csv', sep=';', index=False)
+
+
+def preparar_datos(directorio_base, n_ratings, semilla=0):
+    """Directorio data/ sintético para un tamaño; se reutiliza si ya existe"""
+    directorio = Path(directorio_base) / f'n{n_ratings}-s{semilla}'
+    if not (directorio / 'ratings_Electronics.csv').exists():
+        directorio.mkdir(parents=True, exist_ok=True)
+        generar_base_relacional(directorio, n_ratings, semilla)
+        generar_ratings(directorio / 'ratings_Electronics.csv.tmp', n_ratings, semilla)
+        (directorio / 'ratings_Electronics.csv.tmp').rename(directorio / 'ratings_Electronics.csv')
+    return directorio
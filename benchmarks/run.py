@@ -0,0 +1,714 @@
+"""
+Benchmarks de los caminos críticos del sistema de recomendación
+
+Mide tiempo de pared, RSS pico y throughput de la carga de datos, la búsqueda,
+la similitud entre usuarios y las recomendaciones SVD sobre datos sintéticos
+de 10^3 a 10^7 ratings, y guarda los resultados en JSON para comparar commits.
+
+Uso:
+    python benchmarks/run.py medir [--tamanos 1000 10000 100000] [--casos load_data ...]
+    python benchmarks/run.py comparar resultados/base.json resultados/nuevo.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).parent
+PROJECT_DIR = BENCH_DIR.parent
+sys.path.insert(0, str(PROJECT_DIR / 'src'))
+sys.path.insert(0, str(BENCH_DIR))
+
+import numpy as np
+
+import generadores
+
+TAMANOS = [10**3, 10**4, 10**5, 10**6, 10**7]
+N_CONSULTAS = 200
+NIVELES_CONCURRENCIA = [1, 8, 32]
+SESIONES_SIMULADAS = [1, 10, 100]
+
+# ============================================================================
+# CASOS
+# ============================================================================
+
+CASOS = {}
+
+
+def caso(nombre, unidad):
+    """Registra un caso: preparar(datos, rng) devuelve (ejecutar, unidades_por_llamada[, métricas extra])"""
+    def registrar(preparar):
+        CASOS[nombre] = (preparar, unidad)
+        return preparar
+    return registrar
+
+
+def _cargar_ratings(datos):
+    from recomendador.carga import cargar_datos_ratings
+    return cargar_datos_ratings(datos / 'ratings_Electronics.csv')
+
+
+@caso('load_relational_database', 'filas/s')
+def _preparar_carga_relacional(datos, rng):
+    from recomendador.carga import cargar_base_relacional
+
+    filas = sum(sum(1 for _ in open(datos / nombre, encoding='utf-8')) - 1
+                for nombre in ('db_usuarios.csv', 'db_productos.csv', 'db_calificaciones_completo.csv'))
+    return lambda: cargar_base_relacional(datos), filas
+
+
+@caso('load_data', 'ratings/s')
+def _preparar_carga_ratings(datos, rng):
+    filas = sum(1 for _ in open(datos / 'ratings_Electronics.csv', encoding='utf-8'))
+    return lambda: _cargar_ratings(datos), filas
+
+
+def _datos_columnares(datos):
+    """Copia de los CSV en datos/columnar con su conversión a Parquet (se hace una vez)"""
+    from recomendador.columnar import TABLAS, convertir_directorio
+
+    destino = datos / 'columnar'
+    if not all((destino / f'{tabla}.parquet').exists() for tabla in TABLAS):
+        destino.mkdir(exist_ok=True)
+        for tabla in TABLAS:
+            csv = destino / TABLAS[tabla]['csv']
+            if not csv.exists():
+                os.link(datos / TABLAS[tabla]['csv'], csv)
+        convertir_directorio(destino)
+    return destino
+
+
+@caso('load_relational_database[parquet]', 'filas/s')
+def _preparar_carga_relacional_columnar(datos, rng):
+    from recomendador.carga import cargar_base_relacional
+
+    _, filas = _preparar_carga_relacional(datos, rng)
+    columnar = _datos_columnares(datos)
+    return lambda: cargar_base_relacional(columnar), filas
+
+
+@caso('load_data[parquet]', 'ratings/s')
+def _preparar_carga_ratings_columnar(datos, rng):
+    _, filas = _preparar_carga_ratings(datos, rng)
+    columnar = _datos_columnares(datos)
+    return lambda: _cargar_ratings(columnar), filas
+
+
+@caso('buscar_productos_rapido', 'consultas/s')
+def _preparar_busqueda(datos, rng):
+    from recomendador.busqueda import buscar_productos_rapido
+    from recomendador.carga import cargar_base_relacional
+
+    product_info = cargar_base_relacional(datos)[4]
+    terminos = list(rng.choice(
+        [p.lower() for p in generadores.PRENDAS + generadores.MARCAS + generadores.ADJETIVOS] + ['cam', 'pant', 'xyz'],
+        N_CONSULTAS
+    ))
+
+    def ejecutar():
+        for termino in terminos:
+            buscar_productos_rapido(termino, product_info)
+    return ejecutar, len(terminos)
+
+
+@caso('encontrar_usuarios_similares', 'consultas/s')
+def _preparar_similares(datos, rng):
+    from recomendador import VecinosUsuarios, encontrar_usuarios_similares
+
+    motor = VecinosUsuarios(_cargar_ratings(datos)[0])
+    usuarios = rng.integers(0, motor.n_usuarios, N_CONSULTAS)
+
+    def ejecutar():
+        for user_index in usuarios:
+            encontrar_usuarios_similares(user_index, motor)
+    return ejecutar, len(usuarios)
+
+
+@caso('VecinosUsuarios.precalcular', 'usuarios/s')
+def _preparar_precalculo_vecinos(datos, rng):
+    from recomendador import VecinosUsuarios
+
+    motor = VecinosUsuarios(_cargar_ratings(datos)[0])
+    return lambda: motor.precalcular(n=5), motor.n_usuarios
+
+
+@caso('VecinosProductos.por_coratings', 'productos/s')
+def _preparar_similares_productos(datos, rng):
+    from recomendador import VecinosProductos
+
+    matriz = _cargar_ratings(datos)[0]
+    return lambda: VecinosProductos.por_coratings(matriz, k=8), matriz.shape[1]
+
+
+@caso('datos_compartidos', 'reruns/s')
+def _preparar_datos_compartidos(datos, rng):
+    import logging
+
+    import streamlit as st
+    from recomendador.almacen import congelar
+    from recomendador.carga import cargar_base_relacional
+
+    logging.getLogger('streamlit').setLevel(logging.ERROR)
+
+    # Lo que devuelven load_relational_database y load_data, con cada decorador
+    @st.cache_data
+    def copiados():
+        return cargar_base_relacional(datos), _cargar_ratings(datos)
+
+    @st.cache_resource
+    def compartidos():
+        return congelar((cargar_base_relacional(datos), _cargar_ratings(datos)))
+
+    extra = {}
+    for etiqueta, obtener in (('compartidos', compartidos), ('cache_data', copiados)):
+        obtener()
+        por_sesion_mb = 0.0
+        for sesiones in SESIONES_SIMULADAS:
+            # Con cache_data las copias de 100 sesiones pueden no entrar en memoria: ese nivel se omite
+            disponible_mb = _memoria_disponible_mb()
+            if disponible_mb is not None and por_sesion_mb * sesiones > disponible_mb / 2:
+                break
+            ms_por_rerun, rss_mb = _reruns_simultaneos(obtener, sesiones)
+            extra[f'{etiqueta}_s{sesiones}_ms'] = ms_por_rerun
+            extra[f'{etiqueta}_s{sesiones}_rss_mb'] = rss_mb
+            por_sesion_mb = max(por_sesion_mb, (rss_mb or 0) / sesiones)
+    return lambda: _reruns_simultaneos(compartidos, SESIONES_SIMULADAS[-1]), SESIONES_SIMULADAS[-1], extra
+
+
+def _reruns_simultaneos(obtener, sesiones):
+    """Un rerun por sesión, todos en curso a la vez (cada uno retiene lo que recibió)
+
+    Devuelve (ms por rerun, RSS agregado en MB mientras están en curso).
+    """
+    rss_antes = _rss_actual_mb()
+    inicio = time.perf_counter()
+    en_curso = [obtener() for _ in range(sesiones)]
+    ms_por_rerun = (time.perf_counter() - inicio) / sesiones * 1000
+    rss_mb = None if rss_antes is None else _rss_actual_mb() - rss_antes
+    del en_curso
+    return ms_por_rerun, rss_mb
+
+
+@caso('AgregadosRatings.aplicar', 'eventos/s')
+def _preparar_agregados_ratings(datos, rng):
+    import pandas as pd
+    from recomendador.carga import COLUMNAS_RATINGS
+    from recomendador.eventos import AgregadosRatings
+
+    _, popularidad, counts, _ = _cargar_ratings(datos)
+    agregados = AgregadosRatings.desde_carga(popularidad, counts)
+    eventos = list(zip(counts.index.to_numpy()[rng.integers(0, len(counts), N_CONSULTAS)],
+                       popularidad.index.to_numpy()[rng.integers(0, len(popularidad), N_CONSULTAS)],
+                       rng.integers(1, 6, N_CONSULTAS)))
+
+    # Referencia: lo que costaba cada rating nuevo, volver a agregar todos los ratings
+    df = pd.read_csv(datos / 'ratings_Electronics.csv', header=None, names=COLUMNAS_RATINGS,
+                     dtype={'user_id': 'category', 'prod_id': 'category'})
+    inicio = time.perf_counter()
+    conteos = df['user_id'].value_counts()
+    filtrado = df[df['user_id'].isin(conteos.index[conteos >= 50])]
+    filtrado.groupby('prod_id', observed=True)['rating'].agg(['mean', 'count'])
+    extra = {'recalculo_completo_ms': (time.perf_counter() - inicio) * 1000}
+    del df, filtrado
+
+    inicio = time.perf_counter()
+    agregados.aplicar_lote(*map(list, zip(*eventos)))
+    extra['lote_eventos_s'] = len(eventos) / (time.perf_counter() - inicio)
+
+    def ejecutar():
+        for user_id, prod_id, rating in eventos:
+            agregados.aplicar(user_id, prod_id, rating)
+    return ejecutar, len(eventos), extra
+
+
+@caso('metricas', 'llamadas/s')
+def _preparar_metricas(datos, rng):
+    from recomendador import metricas
+
+    # Costo de medir una llamada: función vacía medida (decorador) o con observar(), como
+    # ServicioRecomendaciones, frente a la misma sin medir
+    vacia = lambda: None
+    medida = metricas.medido('vacia')(vacia)
+    observada = lambda: metricas.observar('vacia', 0.0)
+    llamadas = N_CONSULTAS * 500
+    segundos = {}
+    for funcion in (vacia, medida, observada):
+        inicio = time.perf_counter()
+        for _ in range(llamadas):
+            funcion()
+        segundos[funcion] = time.perf_counter() - inicio
+    costos_s = {funcion: max(segundos[funcion] - segundos[vacia], 0) / llamadas for funcion in (medida, observada)}
+    extra = {'costo_por_llamada_us': costos_s[medida] * 1e6, 'costo_por_observacion_us': costos_s[observada] * 1e6}
+
+    # Sobrecosto en los caminos que usa la app: mediciones registradas × costo / tiempo del
+    # camino (la diferencia directa con y sin métricas queda por debajo del ruido entre corridas)
+    caminos = (('busqueda', _preparar_busqueda, medida), ('servicio', _preparar_servicio_metricas, observada))
+    for etiqueta, preparar, costo in caminos:
+        ejecutar = preparar(datos, rng)[0]
+        antes = sum(fila['llamadas'] for fila in metricas.resumen()[0])
+        inicio = time.perf_counter()
+        ejecutar()
+        tiempo = time.perf_counter() - inicio
+        mediciones = sum(fila['llamadas'] for fila in metricas.resumen()[0]) - antes
+        extra[f'{etiqueta}_sobrecosto_pct'] = mediciones * costos_s[costo] / tiempo * 100
+
+    def ejecutar():
+        for _ in range(llamadas):
+            medida()
+    return ejecutar, llamadas, extra
+
+
+def _preparar_servicio_metricas(datos, rng):
+    """ServicioRecomendaciones.recomendar como en la app (SVD con el puntuador por lotes)"""
+    from recomendador import ModeloSVD, PuntuadorLotes, ServicioRecomendaciones
+
+    modelo = ModeloSVD.entrenar(_cargar_ratings(datos)[0], n_factores=15)
+    # Con presupuesto holgado: toda consulta se puntúa (ninguna cae en popularidad)
+    servicio = ServicioRecomendaciones(modelo, None, modelo.ratings, np.arange(modelo.n_productos),
+                                       np.arange(min(100, modelo.n_productos)), presupuesto_ms=1000.0,
+                                       puntuador=PuntuadorLotes(modelo))
+    usuarios = rng.integers(0, modelo.n_usuarios, N_CONSULTAS)
+
+    def ejecutar():
+        for user_index in usuarios:
+            servicio.recomendar(int(user_index), n=10)
+    return ejecutar, len(usuarios)
+
+
+# Páginas de la app (etiqueta del menú → nombre de las métricas)
+PAGINAS_APP = {
+    "🏠 Inicio": 'inicio',
+    "🔍 Búsqueda de Productos": 'busqueda',
+    "📊 Estadísticas": 'estadisticas',
+    "🏆 Top Productos": 'top',
+    "🤖 Mis Recomendaciones": 'recomendaciones',
+    "🧠 IA Insights": 'insights',
+    "💬 Chat IA": 'chat',
+    "ℹ️ Acerca de": 'acerca',
+}
+
+# Primer render de una página en un proceso nuevo; -X importtime deja en stderr lo que importó
+_PRIMER_RENDER = """
+import json, sys, time
+from streamlit.testing.v1 import AppTest
+app, pagina = sys.argv[1:]
+antes = set(sys.modules)
+print('--- inicio del render', file=sys.stderr, flush=True)
+at = AppTest.from_file(app, default_timeout=3600)
+at.session_state['pagina'] = pagina
+at.secrets['GROQ_API_KEY'] = ''  # El chat se abre sin preguntar nada
+inicio = time.perf_counter()
+at.run()
+print(json.dumps({'render_s': time.perf_counter() - inicio, 'modulos': len(set(sys.modules) - antes),
+                  'errores': [str(e.value) for e in at.exception]}))
+"""
+
+
+def _primer_render(app, pagina):
+    """(ms del primer rerun, ms de importaciones dentro de él, módulos importados) en un proceso nuevo"""
+    proceso = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PRIMER_RENDER, str(app), pagina],
+        capture_output=True, text=True, check=True,
+        env={**os.environ, 'PYTHONPATH': str(PROJECT_DIR / 'src'), 'RECOMENDADOR_METRICAS': '0'},
+    )
+    resultado = json.loads(proceso.stdout.strip().splitlines()[-1])
+    if resultado['errores']:
+        raise RuntimeError(f"{pagina}: {resultado['errores']}")
+    # Solo las importaciones posteriores a la marca; 'self' en µs, sin contar submódulos dos veces
+    importes_us = 0
+    en_render = False
+    for linea in proceso.stderr.splitlines():
+        if linea.startswith('--- inicio del render'):
+            en_render = True
+        elif en_render and linea.startswith('import time:') and '|' in linea:
+            propio = linea.split(':', 1)[1].split('|')[0].strip()
+            if propio.isdigit():
+                importes_us += int(propio)
+    return resultado['render_s'] * 1000, importes_us / 1000, resultado['modulos']
+
+
+@caso('primer_render', 'páginas/s')
+def _preparar_primer_render(datos, rng):
+    import tempfile
+
+    # La app lee ../data y ../modelos relativos a su archivo: una copia apunta al directorio del caso
+    temporal = tempfile.TemporaryDirectory()
+    raiz = Path(temporal.name)
+    (raiz / 'src').mkdir()
+    app = raiz / 'src' / 'app_relacional.py'
+    shutil.copy(PROJECT_DIR / 'src' / 'app_relacional.py', app)
+    (raiz / 'data').symlink_to(datos.resolve())
+    # Con artefactos (los del caso precalcular_top_n) si los hay; si no, en modo CSV
+    if (datos / 'modelos' / 'ACTUAL').exists():
+        (raiz / 'modelos').symlink_to((datos / 'modelos').resolve())
+
+    # Cada página en frío: proceso nuevo, sin cachés ni módulos importados
+    extra = {}
+    for pagina, clave in PAGINAS_APP.items():
+        render_ms, importes_ms, modulos = _primer_render(app, pagina)
+        extra[f'{clave}_ms'] = render_ms
+        extra[f'{clave}_importes_ms'] = importes_ms
+        extra[f'{clave}_modulos'] = modulos
+
+    def ejecutar():
+        temporal  # El directorio vive mientras se mide
+        for pagina in PAGINAS_APP:
+            _primer_render(app, pagina)
+    return ejecutar, len(PAGINAS_APP), extra
+
+
+@caso('ModeloSVD.entrenar', 'ratings/s')
+def _preparar_entrenamiento_svd(datos, rng):
+    from recomendador import ModeloSVD
+
+    matriz = _cargar_ratings(datos)[0]
+    return lambda: ModeloSVD.entrenar(matriz, n_factores=15), matriz.nnz
+
+
+@caso('ModeloSVD.entrenar_aleatorio', 'ratings/s')
+def _preparar_entrenamiento_svd_aleatorio(datos, rng):
+    from recomendador import ModeloSVD
+    from recomendador.svd_aleatorio import error_reconstruccion
+
+    matriz = _cargar_ratings(datos)[0]
+    # Referencia: svds sobre la misma matriz
+    inicio = time.perf_counter()
+    exacto = ModeloSVD.entrenar(matriz, n_factores=15)
+    svds_s = time.perf_counter() - inicio
+    aleatorio = ModeloSVD.entrenar_aleatorio(matriz, n_factores=15)
+
+    def error(modelo):
+        return error_reconstruccion(matriz, modelo.U, modelo.sigma, modelo.Vt)
+    return lambda: ModeloSVD.entrenar_aleatorio(matriz, n_factores=15), matriz.nnz, {
+        'error_relativo': error(aleatorio),
+        'error_relativo_svds': error(exacto),
+        'svds_s': svds_s,
+    }
+
+
+@caso('ModeloALS.entrenar', 'ratings/s')
+def _preparar_entrenamiento_als(datos, rng):
+    from recomendador import ModeloALS, ModeloSVD
+
+    matriz = _cargar_ratings(datos)[0]
+    entrenamiento, usuarios, ocultos = _separar_holdout(matriz, rng)
+    # Referencia: el SVD sobre la misma matriz de entrenamiento
+    inicio = time.perf_counter()
+    svd = ModeloSVD.entrenar(entrenamiento, n_factores=15)
+    svd_s = time.perf_counter() - inicio
+    als = ModeloALS.entrenar(entrenamiento, n_factores=15)
+
+    def aciertos(modelo):
+        indices, _ = modelo.recomendar_lote(usuarios, n=10)
+        return float(np.mean(np.any(indices == ocultos[:, np.newaxis], axis=1))) if len(usuarios) else 0.0
+    return lambda: ModeloALS.entrenar(entrenamiento, n_factores=15), entrenamiento.nnz, {
+        'hit@10': aciertos(als),
+        'hit@10_svd': aciertos(svd),
+        'svd_s': svd_s,
+        'iteraciones': als.iteraciones,
+    }
+
+
+def _separar_holdout(matriz, rng, n_usuarios=2000):
+    """Oculta un rating al azar de hasta n_usuarios con al menos 2: (entrenamiento, usuarios, columnas ocultas)"""
+    from recomendador.matriz import a_csr
+
+    ratings = a_csr(matriz).copy()
+    por_usuario = np.diff(ratings.indptr)
+    candidatos = np.flatnonzero(por_usuario >= 2)
+    usuarios = np.sort(rng.choice(candidatos, min(n_usuarios, len(candidatos)), replace=False))
+    posiciones = ratings.indptr[usuarios] + rng.integers(0, por_usuario[usuarios])
+    ocultos = ratings.indices[posiciones].copy()
+    ratings.data[posiciones] = 0
+    ratings.eliminate_zeros()
+    return ratings, usuarios, ocultos
+
+
+@caso('obtener_recomendaciones_svd', 'consultas/s')
+def _preparar_recomendaciones_svd(datos, rng):
+    from recomendador import ModeloSVD, obtener_recomendaciones_svd
+
+    modelo = ModeloSVD.entrenar(_cargar_ratings(datos)[0], n_factores=15)
+    usuarios = rng.integers(0, modelo.n_usuarios, N_CONSULTAS)
+
+    def ejecutar():
+        for user_index in usuarios:
+            obtener_recomendaciones_svd(user_index, modelo, n_recommendations=10)
+    return ejecutar, len(usuarios)
+
+
+@caso('PuntuadorLotes.enviar', 'consultas/s')
+def _preparar_puntuador_lotes(datos, rng):
+    from recomendador import ModeloSVD, PuntuadorLotes
+    from recomendador.seleccion import top_k
+
+    modelo = ModeloSVD.entrenar(_cargar_ratings(datos)[0], n_factores=15)
+    usuarios = rng.integers(0, modelo.n_usuarios, N_CONSULTAS * 4)
+    puntuador = PuntuadorLotes(modelo, max_lote=64, max_espera_ms=2.0)
+
+    def en_lote(user_index):
+        puntuador.recomendar(user_index, n=10).result()
+
+    def directa(user_index):
+        top_k(modelo.puntuar(user_index), 10, modelo.calificados(user_index))
+
+    # Referencia: cada sesión puntúa su usuario por separado (una GEMV por consulta)
+    extra = {}
+    for sesiones in NIVELES_CONCURRENCIA:
+        lotes, consultas = puntuador.lotes, puntuador.consultas
+        for etiqueta, consulta in (('', en_lote), ('_directa', directa)):
+            consultas_s, latencias = _concurrente(consulta, usuarios, sesiones)
+            extra[f'c{sesiones}{etiqueta}_consultas_s'] = consultas_s
+            extra[f'c{sesiones}{etiqueta}_p99_ms'] = float(np.percentile(latencias, 99))
+        extra[f'c{sesiones}_lote_medio'] = (puntuador.consultas - consultas) / max(puntuador.lotes - lotes, 1)
+    return lambda: _concurrente(en_lote, usuarios, NIVELES_CONCURRENCIA[-1]), len(usuarios), extra
+
+
+def _concurrente(consulta, usuarios, sesiones):
+    """Reparte las consultas entre sesiones (hilos); (consultas/s, latencias en ms)"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    def sesion(porcion):
+        latencias = []
+        for user_index in porcion:
+            inicio = time.perf_counter()
+            consulta(user_index)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        return latencias
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=sesiones) as pool:
+        latencias = sum(pool.map(sesion, np.array_split(usuarios, sesiones)), [])
+    return len(usuarios) / (time.perf_counter() - inicio), latencias
+
+
+@caso('IndiceIVF.buscar', 'consultas/s')
+def _preparar_indice_aproximado(datos, rng):
+    from recomendador import IndiceIVF, ModeloSVD
+    from recomendador.seleccion import top_k
+
+    modelo = ModeloSVD.entrenar(_cargar_ratings(datos)[0], n_factores=15)
+    indice = IndiceIVF.para_modelo(modelo)
+    consultas = modelo.U[rng.integers(0, modelo.n_usuarios, N_CONSULTAS)] * modelo.sigma
+    productos = modelo.Vt.T[rng.integers(0, modelo.n_productos, N_CONSULTAS)]
+    similares = IndiceIVF.para_modelo(modelo, 'coseno')
+
+    # Referencia: puntuar todo el catálogo y argpartition
+    inicio = time.perf_counter()
+    for consulta in consultas:
+        top_k(consulta @ modelo.Vt, 10)
+    exacto_ms = (time.perf_counter() - inicio) / len(consultas) * 1000
+
+    def ejecutar():
+        for consulta in consultas:
+            indice.buscar(consulta, 10)
+    return ejecutar, len(consultas), {
+        'recall@10': indice.recall(consultas, 10),
+        'recall@10_coseno': similares.recall(productos, 10),
+        'exacto_ms': exacto_ms,
+        'listas': indice.n_listas,
+        'sondeos': indice.n_sondeos,
+    }
+
+
+@caso('ModeloSVD.plegar_usuario', 'usuarios/s')
+def _preparar_pliegue_svd(datos, rng):
+    from recomendador import ModeloSVD
+
+    modelo = ModeloSVD.entrenar(_cargar_ratings(datos)[0], n_factores=15)
+    # Usuarios nuevos con 5 ratings cada uno, plegados y recomendados
+    columnas = rng.integers(0, modelo.n_productos, (N_CONSULTAS, 5))
+    ratings = rng.integers(1, 6, (N_CONSULTAS, 5))
+
+    def ejecutar():
+        for cols, valores in zip(columnas, ratings):
+            modelo.recomendar(modelo.plegar_usuario(cols, valores), n=10)
+    return ejecutar, N_CONSULTAS
+
+
+@caso('precalcular_top_n', 'usuarios/s')
+def _preparar_precalculo_top_n(datos, rng):
+    from recomendador import ModeloSVD
+    from recomendador.artefactos import guardar_artefactos
+    from recomendador.precalculo import ARCHIVO_TOP_N, precalcular_top_n
+
+    matriz, popularidad = _cargar_ratings(datos)[:2]
+    base = datos / 'modelos'
+    shutil.rmtree(base, ignore_errors=True)
+    version = guardar_artefactos(base, matriz, ModeloSVD.entrenar(matriz, n_factores=15), popularidad)
+
+    # En el proceso actual: los casos ya corren dentro de un proceso daemon, que no
+    # puede abrir su propio pool
+    def ejecutar():
+        (base / version / ARCHIVO_TOP_N).unlink(missing_ok=True)
+        precalcular_top_n(base, version, n=12, max_procesos=1)
+    return ejecutar, matriz.shape[0]
+
+
+# ============================================================================
+# MEDICIÓN
+# ============================================================================
+
+
+def _rss_pico_mb():
+    """RSS pico del proceso en MB (None donde no existe el módulo resource)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == 'darwin' else pico / 1024
+
+
+def _rss_actual_mb():
+    """RSS actual del proceso en MB (None fuera de Linux)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError):
+        return None
+
+
+def _memoria_disponible_mb():
+    """MemAvailable del sistema en MB (None fuera de Linux)"""
+    try:
+        with open('/proc/meminfo') as meminfo:
+            for linea in meminfo:
+                if linea.startswith('MemAvailable:'):
+                    return int(linea.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _medir_en_proceso(nombre, datos, repeticiones, semilla):
+    """Corre un caso en el proceso actual (se invoca en un proceso hijo aislado)"""
+    preparar, unidad = CASOS[nombre]
+    ejecutar, unidades, *extra = preparar(Path(datos), np.random.default_rng(semilla))
+
+    rss_antes = _rss_pico_mb()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        ejecutar()
+        tiempos.append(time.perf_counter() - inicio)
+    rss_despues = _rss_pico_mb()
+
+    mediana = statistics.median(tiempos)
+    return {
+        'funcion': nombre,
+        'tiempo_s': mediana,
+        'tiempo_min_s': min(tiempos),
+        'repeticiones': repeticiones,
+        'rss_pico_mb': rss_despues,
+        'rss_incremento_mb': None if rss_antes is None else rss_despues - rss_antes,
+        'throughput': unidades / mediana if mediana > 0 else None,
+        'unidad': unidad,
+        **(extra[0] if extra else {}),
+    }
+
+
+def medir(nombre, datos, repeticiones=3, semilla=0):
+    """Mide un caso en un proceso nuevo para que el RSS pico no se contamine entre casos"""
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Pool(1) as pool:
+        return pool.apply(_medir_en_proceso, (nombre, str(datos), repeticiones, semilla))
+
+
+def _commit_actual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'desconocido'
+
+
+# Campos comunes a todos los casos; los demás son métricas propias del caso
+_CAMPOS = {'funcion', 'tiempo_s', 'tiempo_min_s', 'repeticiones', 'rss_pico_mb', 'rss_incremento_mb', 'throughput',
+           'unidad', 'n_ratings'}
+
+
+def comando_medir(args):
+    commit = _commit_actual()
+    casos = args.casos or list(CASOS)
+    resultados = []
+
+    for n_ratings in args.tamanos:
+        datos = generadores.preparar_datos(args.datos, n_ratings, args.semilla)
+        for nombre in casos:
+            resultado = medir(nombre, datos, args.repeticiones, args.semilla)
+            resultado['n_ratings'] = n_ratings
+            resultados.append(resultado)
+            print(f"{nombre:32s} n={n_ratings:>9,}  {resultado['tiempo_s'] * 1000:10.2f} ms  "
+                  f"{resultado['throughput']:>14,.0f} {resultado['unidad']:12s} RSS {resultado['rss_pico_mb'] or 0:8.1f} MB"
+                  + "".join(f"  {clave} {valor:.3g}" for clave, valor in resultado.items() if clave not in _CAMPOS))
+
+    salida = args.salida or BENCH_DIR / 'resultados' / f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json"
+    salida.parent.mkdir(parents=True, exist_ok=True)
+    salida.write_text(json.dumps({
+        'commit': commit,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'plataforma': platform.platform(),
+        'procesadores': multiprocessing.cpu_count(),
+        'semilla': args.semilla,
+        'resultados': resultados,
+    }, indent=2), encoding='utf-8')
+    print(f"\n✅ Resultados en {salida}")
+    return 0
+
+
+def comando_comparar(args):
+    base, nuevo = (json.loads(Path(p).read_text(encoding='utf-8')) for p in (args.base, args.nuevo))
+    indice_base = {(r['funcion'], r['n_ratings']): r for r in base['resultados']}
+
+    print(f"{'función':32s} {'n':>9s} {base['commit']:>12s} {nuevo['commit']:>12s} {'speedup':>9s}")
+    for r in nuevo['resultados']:
+        anterior = indice_base.get((r['funcion'], r['n_ratings']))
+        if anterior is None:
+            continue
+        print(f"{r['funcion']:32s} {r['n_ratings']:>9,} {anterior['tiempo_s'] * 1000:10.2f}ms "
+              f"{r['tiempo_s'] * 1000:10.2f}ms {anterior['tiempo_s'] / r['tiempo_s']:8.2f}x")
+    return 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Benchmarks de los caminos críticos")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    medir_parser = subparsers.add_parser('medir', help="Genera datos sintéticos y mide los casos")
+    medir_parser.add_argument('--tamanos', type=int, nargs='+', default=TAMANOS[:4],
+                              help="Cantidades de ratings (hasta 10^7)")
+    medir_parser.add_argument('--casos', nargs='+', choices=sorted(CASOS))
+    medir_parser.add_argument('--repeticiones', type=int, default=3)
+    medir_parser.add_argument('--semilla', type=int, default=0)
+    medir_parser.add_argument('--datos', type=Path, default=BENCH_DIR / '.datos',
+                              help="Caché de datos sintéticos generados")
+    medir_parser.add_argument('--salida', type=Path)
+    medir_parser.set_defaults(func=comando_medir)
+
+    comparar_parser = subparsers.add_parser('comparar', help="Compara dos archivos de resultados")
+    comparar_parser.add_argument('base')
+    comparar_parser.add_argument('nuevo')
+    comparar_parser.set_defaults(func=comando_comparar)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
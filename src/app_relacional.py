@@ -3,21 +3,20 @@ Sistema de Recomendación de Productos E-commerce - Versión Mejorada
 Interfaz intuitiva con búsqueda visual y recomendaciones personalizadas
 """
 
+import functools
+import os
+import threading
+import time
 import warnings
 warnings.filterwarnings('ignore')
 
 import streamlit as st
-import pandas as pd
-import numpy as np
 from pathlib import Path
-from sklearn.metrics.pairwise import cosine_similarity
-from scipy.sparse.linalg import svds
-from scipy.sparse import csr_matrix
 
-try:
-    from groq import Groq
-except ImportError:
-    Groq = None
+# Solo lo liviano: pandas, scipy, los motores y groq se importan con la página que los usa
+from recomendador.busqueda import buscar_productos_rapido, ordenar_resultados
+from recomendador.metricas import (contar_cache, exportar_archivo, habilitadas, medido, observar, reiniciar, resumen,
+                                   servir, texto_prometheus)
 
 # ============================================================================
 # CONFIGURACIÓN DE PÁGINA
@@ -30,6 +29,8 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+inicio_rerun = time.perf_counter()
+
 # CSS personalizado para mejor visualización
 st.markdown("""
 <style>
@@ -332,91 +333,105 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# ============================================================================
+# MÉTRICAS
+# ============================================================================
+
+# Latencias y aciertos de caché del proceso (todas las sesiones); ?diagnostico en la URL las
+# muestra. Cada caché de recursos cuenta sus consultas: el cuerpo solo corre en un fallo
+_fallos_cache = threading.local()
+
+def cache_medido(**opciones):
+    """st.cache_resource que registra aciertos y fallos en las métricas (el cuerpo solo corre en un fallo)"""
+    def decorar(funcion):
+        nombre = funcion.__name__
+
+        @functools.wraps(funcion)
+        def calcular(*args, **kwargs):
+            setattr(_fallos_cache, nombre, True)
+            return funcion(*args, **kwargs)
+        cacheada = st.cache_resource(**opciones)(calcular)
+
+        @functools.wraps(funcion)
+        def consultar(*args, **kwargs):
+            setattr(_fallos_cache, nombre, False)
+            valor = cacheada(*args, **kwargs)
+            contar_cache(nombre, not getattr(_fallos_cache, nombre))
+            return valor
+        return consultar
+    return decorar
+
+@cache_medido()
+def exportar_metricas():
+    """/metrics en RECOMENDADOR_METRICAS_PUERTO y/o un archivo Prometheus en RECOMENDADOR_METRICAS_ARCHIVO"""
+    puerto = os.environ.get('RECOMENDADOR_METRICAS_PUERTO')
+    archivo = os.environ.get('RECOMENDADOR_METRICAS_ARCHIVO')
+    servidor = servir(int(puerto)) if puerto and habilitadas() else None
+    if archivo and habilitadas():
+        exportar_archivo(archivo)
+    return servidor
+
+servidor_metricas = exportar_metricas()
+
 # ============================================================================
 # CARGAR BASE DE DATOS RELACIONAL
 # ============================================================================
 
-@st.cache_data
+DATA_DIR = Path(__file__).parent.parent / 'data'
+
+# Una versión de los datos por proceso, compartida por todas las sesiones: objetos de solo
+# lectura en lugar de una copia deserializada en cada rerun. Un hilo vigila los archivos de
+# data/ y, si cambian, arma la versión nueva en segundo plano; cada rerun usa la versión que
+# era vigente al empezar. Los módulos de carga se importan dentro de cada función: una página
+# que no usa datos no los trae
+
+@medido()
 def load_relational_database():
     """Carga las tablas de la base de datos relacional"""
-    try:
-        project_dir = Path(__file__).parent.parent / 'data'
-        
-        df_usuarios = pd.read_csv(project_dir / 'db_usuarios.csv', sep=';', on_bad_lines='skip')
-        df_productos = pd.read_csv(project_dir / 'db_productos.csv', sep=';', on_bad_lines='skip')
-        df_calificaciones = pd.read_csv(project_dir / 'db_calificaciones_completo.csv', on_bad_lines='skip')
-        
-        user_id_to_name = dict(zip(df_usuarios['user_id'], df_usuarios['nombre_usuario']))
-        
-        product_info = {}
-        placeholder_image = "https://via.placeholder.com/250x250?text=Sin+Imagen"
-        
-        for _, row in df_productos.iterrows():
-            imagen = row['imagen_url']
-            if pd.isna(imagen) or imagen == '':
-                imagen = placeholder_image
-                
-            product_info[row['prod_id']] = {
-                'nombre': row['nombre_producto'],
-                'marca': row['marca'],
-                'precio': row['precio'] / 100,
-                'imagen': imagen,
-                'reviews': row['cantidad_resenas'],
-                'prod_id': row['prod_id']
-            }
-        
-        # Pre-crear índices para búsquedas rápidas
-        productos_nombres = {info['nombre'].lower(): prod_id for prod_id, info in product_info.items()}
-        productos_marcas = {str(info['marca']).lower(): prod_id for prod_id, info in product_info.items() if info['marca']}
-        
-        return df_usuarios, df_productos, df_calificaciones, user_id_to_name, product_info, productos_nombres, productos_marcas
-        
-    except Exception as e:
-        st.error(f"❌ Error al cargar datos: {str(e)}")
-        return None, None, None, None, None, None, None
+    from recomendador.almacen import congelar
+    from recomendador.carga import cargar_base_relacional
+    return congelar(cargar_base_relacional(DATA_DIR))
 
-@st.cache_data
+@medido()
 def load_data():
-    """Carga el dataset de ratings y crea matrices necesarias"""
+    """Carga el dataset de ratings, crea las matrices y entrena el SVD (None si no hay ratings)"""
+    from recomendador import ModeloSVD
+    from recomendador.almacen import congelar
+    from recomendador.carga import cargar_datos_ratings
+    from recomendador.columnar import columnar_vigente
+
+    data_path = DATA_DIR / 'ratings_Electronics.csv'
+    if not data_path.exists() and not columnar_vigente(DATA_DIR, 'ratings_Electronics'):
+        return None
+    matriz, popularidad, counts, descartadas = congelar(cargar_datos_ratings(data_path, min_ratings=50))
+    return matriz, popularidad, counts, descartadas, ModeloSVD.entrenar(matriz, n_factores=15)
+
+@cache_medido()
+def vigilar_base_relacional():
+    """Versión vigente de las tablas relacionales, recargada en segundo plano cuando cambian"""
+    from recomendador.carga import TABLAS_RELACIONALES
+    from recomendador.recarga import RecargaDatos, archivos_de_tablas
+    return RecargaDatos(archivos_de_tablas(DATA_DIR, TABLAS_RELACIONALES), load_relational_database).iniciar()
+
+@cache_medido()
+def vigilar_ratings():
+    """Versión vigente de los ratings del CSV (solo sin artefactos), recargada en segundo plano"""
+    from recomendador.recarga import RecargaDatos, archivos_de_tablas
+    return RecargaDatos(archivos_de_tablas(DATA_DIR, ['ratings_Electronics']), load_data).iniciar()
+
+def abrir_tablas():
+    """Recarga de las tablas relacionales (detiene el rerun si no se pudieron cargar)"""
     try:
-        data_path = Path(__file__).parent.parent / 'data' / 'ratings_Electronics.csv'
-        if not data_path.exists():
-            return None, None, None, None, None, None, None
-        
-        df = pd.read_csv(data_path, header=None)
-        df.columns = ['user_id', 'prod_id', 'rating', 'timestamp']
-        df = df.drop('timestamp', axis=1)
-        
-        counts = df['user_id'].value_counts()
-        df_final = df[df['user_id'].isin(counts[counts >= 50].index)]
-        
-        final_ratings_matrix = df_final.pivot(
-            index='user_id', 
-            columns='prod_id', 
-            values='rating'
-        ).fillna(0)
-        
-        user_id_mapping = final_ratings_matrix.index.tolist()
-        index_to_user_id = {i: user_id for i, user_id in enumerate(user_id_mapping)}
-        user_id_to_index = {user_id: i for i, user_id in enumerate(user_id_mapping)}
-        
-        average_rating = df_final.groupby("prod_id")['rating'].mean()
-        count_rating = df_final.groupby('prod_id')['rating'].count()
-        final_rating = pd.DataFrame({
-            'avg_rating': average_rating, 
-            'rating_count': count_rating
-        }).sort_values(by='avg_rating', ascending=False)
-        
-        return df, df_final, final_ratings_matrix, final_rating, counts, index_to_user_id, user_id_to_index
-        
+        return vigilar_base_relacional()
     except Exception as e:
-        st.error(f"❌ Error cargando datos: {str(e)}")
-        return None, None, None, None, None, None, None
+        st.error(f"❌ Error al cargar datos: {str(e)}")
+        st.stop()
 
 # ============================================================================
 # FUNCIONES DE VISUALIZACIÓN DE PRODUCTOS
 # ============================================================================
 
+@medido()
 def mostrar_producto_grid(prod_id, product_info):
     """Muestra un producto en formato de tarjeta para grid"""
     if prod_id not in product_info:
@@ -433,8 +448,8 @@ def mostrar_producto_grid(prod_id, product_info):
     st.markdown(f"### 💰 ${info['precio']:.2f}")
     st.markdown(f"⭐ {info['reviews']} reseñas")
 
-def mostrar_producto_detalle(prod_id, product_info):
-    """Muestra producto con todos los detalles"""
+def mostrar_producto_detalle(prod_id, product_info, similares=None, diccionarios=None):
+    """Muestra producto con todos los detalles y, si hay índice, sus productos similares"""
     if prod_id not in product_info:
         return
     
@@ -454,8 +469,49 @@ def mostrar_producto_detalle(prod_id, product_info):
         st.markdown(f"**Precio:** <span class='price'>${info['precio']:.2f}</span>", unsafe_allow_html=True)
         st.markdown(f"**Reseñas:** <span class='rating'>⭐ {info['reviews']}</span>", unsafe_allow_html=True)
     
+    if similares is not None:
+        # Una lectura de fila en el índice item-item; códigos compartidos → filas del catálogo
+        codigo = diccionarios.productos.codigo(prod_id)
+        columna = diccionarios.columna_de_producto[codigo] if codigo >= 0 else -1
+        if columna >= 0:
+            columnas, sims = similares.similares(columna, 4)
+            filas = diccionarios.fila_catalogo[diccionarios.producto_de_columna[columnas]]
+            vecinos = [(product_info.prod_id(fila), sim) for fila, sim in zip(filas, sims) if fila >= 0]
+            if vecinos:
+                st.markdown("#### 🔗 Productos similares")
+                cols = st.columns(4)
+                for idx, (similar_id, similitud) in enumerate(vecinos):
+                    with cols[idx]:
+                        mostrar_producto_grid(similar_id, product_info)
+                        st.caption(f"Similitud {similitud:.0%}")
+    
     st.markdown("---")
 
+@medido()
+def mostrar_recomendacion(recomendacion, diccionarios, product_info):
+    """Muestra en grid los productos de una recomendación (códigos compartidos → catálogo)"""
+    filas_catalogo = diccionarios.fila_catalogo[recomendacion.productos]
+    productos_recomendados = [product_info.prod_id(fila) for fila in filas_catalogo if fila >= 0]
+    
+    if recomendacion.fuente == 'popularidad':
+        st.info("📈 Aún no tenemos suficientes datos tuyos: te mostramos los productos más populares")
+    
+    if len(productos_recomendados) > 0:
+        cols = st.columns(3)
+        for idx, prod_id in enumerate(productos_recomendados):
+            with cols[idx % 3]:
+                with st.container(border=True):
+                    mostrar_producto_grid(prod_id, product_info)
+                    
+                    # Mostrar información
+                    info = product_info[prod_id]
+                    st.markdown(f"<span class='rating'>⭐ {info['reviews']} reseñas</span>", unsafe_allow_html=True)
+                    st.markdown(f"<span class='price'>${info['precio']:.2f}</span>", unsafe_allow_html=True)
+    else:
+        st.warning("❌ No hay recomendaciones disponibles")
+    
+    st.caption(f"⚡ {recomendacion.latencia_ms:.1f} ms · fuente: {recomendacion.fuente}")
+
 # ============================================================================
 # FUNCIONES DE RECOMENDACIÓN
 # ============================================================================
@@ -465,253 +521,212 @@ def obtener_top_productos(final_rating, n, min_reviews):
     recomendaciones = final_rating[final_rating['rating_count'] > min_reviews]
     return recomendaciones.sort_values('avg_rating', ascending=False).index[:n].tolist()
 
-def buscar_productos_rapido(search_term, product_info):
-    """Búsqueda optimizada de productos"""
-    if not search_term:
-        return []
-    
-    term_lower = search_term.lower()
-    resultados = []
-    
-    for prod_id, info in product_info.items():
-        nombre = info['nombre'].lower()
-        marca = str(info['marca']).lower() if info['marca'] else ""
-        
-        if term_lower in nombre or term_lower in marca:
-            resultados.append((prod_id, info))
-    
-    return resultados
-
-def ordenar_resultados(resultados, sort_by):
-    """Ordena resultados según criterio"""
-    if sort_by == "↓ Precio":
-        return sorted(resultados, key=lambda x: x[1]['precio'])
-    elif sort_by == "↑ Precio":
-        return sorted(resultados, key=lambda x: x[1]['precio'], reverse=True)
-    elif sort_by == "⭐ Popular":
-        return sorted(resultados, key=lambda x: x[1]['reviews'], reverse=True)
-    return resultados
-
-def encontrar_usuarios_similares(user_index, interactions_matrix, n=5):
-    """Encuentra usuarios similares mediante similitud coseno"""
-    similarity = []
-    for user in range(0, interactions_matrix.shape[0]):
-        sim = cosine_similarity(
-            [interactions_matrix.iloc[user_index]], 
-            [interactions_matrix.iloc[user]]
-        )
-        similarity.append((user, sim[0][0]))
-    
-    similarity.sort(key=lambda x: x[1], reverse=True)
-    return [x[0] for x in similarity[1:n+1]]
-
-def obtener_recomendaciones_svd(user_index, interactions_matrix, n_factors=15, n_recommendations=5):
-    """SVD-based recommendations"""
-    interactions_sparse = csr_matrix(interactions_matrix.values)
-    
-    U, sigma, Vt = svds(interactions_sparse, k=n_factors)
-    sigma = np.diag(sigma)
-    predicted_ratings = np.dot(np.dot(U, sigma), Vt)
-    predicted_ratings_df = pd.DataFrame(
-        predicted_ratings,
-        columns=interactions_matrix.columns,
-        index=interactions_matrix.index
+# ============================================================================
+# INTERFAZ PRINCIPAL
+# ============================================================================
+
+st.title("🛒 Sistema de Recomendación E-commerce")
+
+# Cada página declara lo que usa; en su rerun solo se carga (y se importa) eso, con el primer
+# uso: 'tablas' las tablas relacionales, 'ratings' la matriz, el modelo y el servicio de
+# recomendaciones, 'pandas' y 'chat' los módulos
+PAGINAS = {
+    "🏠 Inicio": {'tablas'},
+    "🔍 Búsqueda de Productos": {'tablas'},
+    "📊 Estadísticas": {'tablas', 'pandas'},
+    "🏆 Top Productos": {'tablas'},
+    "🤖 Mis Recomendaciones": {'tablas', 'ratings'},
+    "🧠 IA Insights": {'tablas', 'pandas'},
+    "💬 Chat IA": {'chat'},
+    "ℹ️ Acerca de": set(),
+    "🩺 Diagnóstico": {'pandas'},
+}
+
+# Crear layout principal con sidebar personalizado
+with st.sidebar:
+    st.markdown("""
+    <div style="text-align: center; margin-bottom: 30px;">
+        <h1 style="color: #d4af37; font-size: 2em;">✨</h1>
+        <h2>ESTILO</h2>
+        <p style="color: #a0a0a0; font-size: 0.9em;">Premium Fashion</p>
+    </div>
+    """, unsafe_allow_html=True)
+
+    st.markdown("---")
+    st.markdown("### 📋 NAVEGACIÓN")
+
+    page = st.radio(
+        "Selecciona una sección:",
+        ["🏠 Inicio",
+         "🔍 Búsqueda de Productos",
+         "📊 Estadísticas",
+         "🏆 Top Productos",
+         "🤖 Mis Recomendaciones",
+         "🧠 IA Insights",
+         "💬 Chat IA",
+         "ℹ️ Acerca de"],
+        key="pagina"
     )
-    
-    user_predictions = predicted_ratings_df.iloc[user_index].sort_values(ascending=False)
-    return user_predictions[user_predictions > 0].index[:n_recommendations].tolist()
+
+    # Página oculta (no está en la navegación): se abre con ?diagnostico en la URL
+    if "diagnostico" in st.query_params:
+        page = "🩺 Diagnóstico"
+
+    st.markdown("---")
 
 # ============================================================================
-# FUNCIÓN: CHATBOT IA CON GOOGLE GEMINI
+# CARGAR DATOS
 # ============================================================================
 
-def obtener_contexto_datos(db_usuarios, db_productos, db_calificaciones):
-    """Genera un contexto detallado de los datos para enviar a la IA"""
-    
-    # Estadísticas generales
-    stats = {
-        'total_usuarios': len(db_usuarios),
-        'total_productos': len(db_productos),
-        'total_calificaciones': len(db_calificaciones),
-        'rating_promedio': db_calificaciones['calificacion'].mean(),
-        'precio_promedio': db_productos['precio'].mean() / 100,
-        'precio_min': db_productos['precio'].min() / 100,
-        'precio_max': db_productos['precio'].max() / 100,
-    }
-    
-    # Productos más vendidos
-    top_productos = db_productos.nlargest(5, 'cantidad_resenas')[['prod_id', 'nombre_producto', 'cantidad_resenas']].to_dict('records')
-    
-    # Usuarios más activos
-    usuarios_activos = db_usuarios[db_usuarios['total_calificaciones'] > 0].shape[0]
-    
-    contexto = f"""
-Eres un **analista experto en e-commerce y estrategia comercial**, especializado en análisis de datos,
-comportamiento de clientes y optimización de catálogos de productos.
-
-A continuación se te proporciona un **resumen estadístico de la base de datos de un e-commerce**.
-Debes analizarla y generar **respuestas claras, estratégicas y basadas únicamente en los datos proporcionados**.
+necesita = set(PAGINAS[page])
+# El detalle de un producto muestra sus similares: recién ahí hacen falta los ratings
+if page == "🔍 Búsqueda de Productos" and 'selected_product' in st.session_state:
+    necesita.add('ratings')
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-📊 CONTEXTO DE LA BASE DE DATOS
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+if 'pandas' in necesita:
+    import pandas as pd
+if 'chat' in necesita:
+    from recomendador.chat import responder_con_groq_stream
 
-🔹 ESTADÍSTICAS GENERALES:
-- Total de Usuarios: {stats['total_usuarios']}
-- Usuarios Activos: {usuarios_activos}
-- Total de Productos: {stats['total_productos']}
-- Total de Calificaciones: {stats['total_calificaciones']}
-- Rating Promedio: {stats['rating_promedio']:.2f} / 5.0
-- Tasa de Conversión (reseñas/usuarios): {(stats['total_calificaciones']/stats['total_usuarios']*100):.1f} %
+filas_descartadas = {}
+recarga_tablas = recarga_ratings = None
 
-🔹 ANÁLISIS DE PRECIOS:
-- Precio Promedio: ${stats['precio_promedio']:.2f}
-- Precio Mínimo: ${stats['precio_min']:.2f}
-- Precio Máximo: ${stats['precio_max']:.2f}
+if 'tablas' in necesita:
+    recarga_tablas = abrir_tablas()
+    # Una sola lectura de la versión vigente por rerun: el resto del script usa esta aunque se publique otra
+    datos_tablas = recarga_tablas.actual
+    db_usuarios, db_productos, db_calificaciones, user_id_to_name, product_info, productos_nombres, productos_marcas, filas_descartadas = datos_tablas.datos
 
-🔹 PRODUCTOS MÁS POPULARES (por número de reseñas):
-{chr(10).join([f"- {p['nombre_producto']}: {p['cantidad_resenas']} reseñas" for p in top_productos])}
+MODELOS_DIR = Path(__file__).parent.parent / 'modelos'
 
-🔹 PRODUCTOS DISPONIBLES EN EL CATÁLOGO:
-{', '.join(db_productos['nombre_producto'].head(20).tolist())} (y más…)
+@cache_medido(max_entries=2)
+def cargar_modelo_persistido(version):
+    """Abre los artefactos de una versión mapeados en memoria (compartidos entre procesos)"""
+    return cargar_artefactos(MODELOS_DIR, version)
 
-🔹 DISTRIBUCIÓN POR CATEGORÍAS:
-- Pantalones: 5 productos
-- Camisas: 5 productos
-- Camisetas: 5 productos
-- Zapatos: 5 productos
-- Chaquetas: 4 productos
-- Accesorios: 21 productos
+@cache_medido(max_entries=2)
+def cargar_top_n_persistido(version, marca):
+    """Tabla top-N precalculada de la versión (python src/cli.py precompute), mapeada en memoria"""
+    return cargar_top_n(MODELOS_DIR / version) if marca is not None else None
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-📌 INSTRUCCIONES DE ANÁLISIS
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+@cache_medido(max_entries=2)
+def cargar_indice_aproximado(version):
+    """Índice IVF de los factores de la versión (python src/cli.py train/precompute), o None"""
+    return IndiceIVF.cargar(MODELOS_DIR / version)
 
-Utiliza **solo esta información** para:
+@cache_medido(max_entries=2)
+def cargar_similares_productos(_interactions_matrix, _diccionarios, version_modelo, version):
+    """Productos similares: los de los artefactos o, si no están, calculados una vez por versión"""
+    con_artefactos = not version_modelo.startswith('csv')
+    similares = VecinosProductos.cargar(MODELOS_DIR / version_modelo) if con_artefactos else None
+    if similares is None:
+        similares = VecinosProductos.por_coratings(
+            _interactions_matrix, k=8, validos=_diccionarios.columnas_en_catalogo()
+        )
+    return similares
 
-1️⃣ Detectar patrones relevantes de comportamiento del cliente  
-2️⃣ Identificar oportunidades comerciales y riesgos  
-3️⃣ Proponer mejoras en el catálogo y surtido de productos  
-4️⃣ Recomendar estrategias de ventas y marketing  
-5️⃣ Responder preguntas analíticas que se te formulen posteriormente  
+@cache_medido(max_entries=2)
+def construir_motor_vecinos(_interactions_matrix, version):
+    """Construye una sola vez por versión el motor de usuarios similares"""
+    return VecinosUsuarios(_interactions_matrix)
 
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
-🧠 FORMATO DE RESPUESTA
-━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+@cache_medido()
+def abrir_registro_eventos():
+    """Registro de calificaciones nuevas en data/ (python src/cli.py compact lo pliega en las tablas)"""
+    return RegistroEventos(DATA_DIR)
 
-- Usa lenguaje claro y profesional
-- Organiza la respuesta con títulos y viñetas
-- Incluye recomendaciones accionables
-- Justifica cada sugerencia con los datos disponibles
-- No inventes métricas ni supongas información no incluida
+@cache_medido(max_entries=2)
+def seguir_eventos(_interactions_matrix, _popularidad, _counts, min_ratings, version):
+    """Agregados de ratings de la versión: los de la carga completa más los eventos del registro"""
+    if _counts is None:
+        return AgregadosRatings.desde_matriz(_interactions_matrix, _popularidad, min_ratings)
+    return AgregadosRatings.desde_carga(_popularidad, _counts, min_ratings)
 
-Si faltan datos para una conclusión, indícalo explícitamente.
+@cache_medido(max_entries=2)
+def compartir_diccionarios(_product_info, _interactions_matrix, _nombres_usuarios, version):
+    """Diccionarios de ids compartidos por catálogo, tablas y matriz (uno por versión)"""
+    return Diccionarios(_product_info, _interactions_matrix, _nombres_usuarios)
 
-"""
-    return contexto
+@cache_medido(max_entries=2)
+def construir_servicio_recomendaciones(_modelo_svd, _motor_vecinos, _interactions_matrix, _diccionarios, _product_info, _top_n,
+                                       _indice, version, marca_tabla):
+    """Servicio de recomendaciones (SVD / vecinos con respaldo por popularidad) por versión"""
+    # Solo se recomiendan productos que existen en el catálogo; el respaldo es el top por reseñas
+    populares = _diccionarios.producto_de_fila_catalogo[(-_product_info.reviews).argsort(kind='stable')]
+    # Uno solo para todas las sesiones: el puntuador junta en lotes sus consultas SVD concurrentes
+    return ServicioRecomendaciones(
+        _modelo_svd, _motor_vecinos, _interactions_matrix, _diccionarios.producto_de_columna,
+        populares, productos_validos=_diccionarios.columnas_en_catalogo(), presupuesto_ms=20.0, top_n=_top_n,
+        indice=_indice, puntuador=PuntuadorLotes(_modelo_svd, max_lote=64, max_espera_ms=2.0)
+    )
 
-def responder_con_groq(pregunta, db_usuarios, db_productos, db_calificaciones, api_key):
-    """Genera respuestas inteligentes usando Groq API (IA de código abierto)"""
-    try:
-        if Groq is None:
-            return "❌ Error: Módulo groq no está instalado"
-        
-        # Crear cliente de Groq
-        client = Groq(api_key=api_key)
-        
-        # Obtener contexto de datos
-        contexto = obtener_contexto_datos(db_usuarios, db_productos, db_calificaciones)
-        
-        # Crear mensaje con contexto
-        mensaje_completo = f"{contexto}\n\nPREGUNTA DEL USUARIO: {pregunta}"
-        
-        # Intentar con diferentes modelos disponibles en Groq
-        modelos = [
-            "llama-3.1-8b-instant",      # Modelo rápido y ligero
-            "llama-3.1-70b-versatile",   # Modelo más potente
-            "gemma-7b-it",                # Alternativa
-        ]
-        
-        for modelo in modelos:
-            try:
-                chat_completion = client.chat.completions.create(
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": "Eres un asistente de IA experto en e-commerce y análisis de datos. Responde de forma clara, concisa y útil."
-                        },
-                        {
-                            "role": "user",
-                            "content": mensaje_completo
-                        }
-                    ],
-                    model=modelo,
-                    max_tokens=1024,
-                    temperature=0.7
-                )
-                return chat_completion.choices[0].message.content
-            except Exception as e:
-                if "decommissioned" in str(e).lower() or "not available" in str(e).lower():
-                    continue  # Intentar con el siguiente modelo
-                else:
-                    raise  # Si es otro error, lo pasamos arriba
-        
-        # Si ningún modelo funcionó
-        return "❌ No hay modelos disponibles en Groq. Intenta más tarde."
-        
-    except Exception as e:
-        error_msg = str(e)
-        if "api" in error_msg.lower() or "key" in error_msg.lower() or "401" in error_msg:
-            return f"❌ Error de API Key: Verifica que tu API Key de Groq sea válida en `.streamlit/secrets.toml`"
-        else:
-            return f"❌ Error al conectar con Groq: {error_msg}\n\nIntenta nuevamente en un momento."
+if 'ratings' in necesita:
+    # scipy, los índices y el servicio se importan con la primera página que recomienda
+    from recomendador import Diccionarios, PuntuadorLotes, ServicioRecomendaciones, VecinosProductos, VecinosUsuarios
+    from recomendador.artefactos import cargar_artefactos, version_actual
+    from recomendador.eventos import AgregadosRatings, RegistroEventos
+    from recomendador.indice_aproximado import IndiceIVF
+    from recomendador.precalculo import cargar_top_n, marca_top_n
 
-# ============================================================================
-# CARGAR DATOS
-# ============================================================================
+    # Si hay artefactos entrenados offline (python src/cli.py train) se usan directamente;
+    # ACTUAL se relee en cada rerun, así una versión nueva entra sin reiniciar la app
+    version_modelo = version_actual(MODELOS_DIR)
 
-db_usuarios, db_productos, db_calificaciones, user_id_to_name, product_info, productos_nombres, productos_marcas = load_relational_database()
+    if version_modelo:
+        artefactos = cargar_modelo_persistido(version_modelo)
+        final_ratings_matrix = artefactos.matriz
+        final_rating = artefactos.popularidad
+        counts = None
+        min_ratings = artefactos.meta.get('min_ratings', 50)
+        modelo_svd = artefactos.modelo
+        # La tabla puede terminar de calcularse con la app corriendo: se consulta en cada rerun
+        # (con la marca de la tabla: un precompute nuevo sobre la misma versión la reemplaza)
+        marca_tabla = marca_top_n(artefactos.directorio)
+        top_n = cargar_top_n_persistido(version_modelo, marca_tabla)
+        indice_aproximado = cargar_indice_aproximado(version_modelo)
+    else:
+        try:
+            recarga_ratings = vigilar_ratings()
+        except Exception as e:
+            st.error(f"❌ Error cargando datos: {str(e)}")
+        datos_ratings = recarga_ratings.actual if recarga_ratings is not None else None
+        if datos_ratings is None or datos_ratings.datos is None:
+            st.error("❌ No se pudieron cargar los datos")
+            st.stop()
 
-result = load_data()
-if result[0] is None:
-    st.error("❌ No se pudieron cargar los datos")
-    st.stop()
+        final_ratings_matrix, final_rating, counts, ratings_descartadas, modelo_svd = datos_ratings.datos
+        min_ratings = 50
+        filas_descartadas = {**filas_descartadas, 'ratings_Electronics': ratings_descartadas}
+        version_modelo = f'csv-{datos_ratings.huella[:12]}'
+        top_n = marca_tabla = None
+        indice_aproximado = None
 
-df, df_final, final_ratings_matrix, final_rating, counts, index_to_user_id, user_id_to_index = result
+    # Solo se leen los eventos que llegaron desde el rerun anterior, sin recorrer los ratings
+    registro_eventos = abrir_registro_eventos()
+    agregados_ratings = seguir_eventos(final_ratings_matrix, final_rating, counts, min_ratings, version_modelo)
+    agregados_ratings.actualizar(registro_eventos)
 
-# ============================================================================
-# INTERFAZ PRINCIPAL
-# ============================================================================
+    # Lo que cruza modelo y tablas se reconstruye cuando cambia cualquiera de los dos
+    version_datos = f'{version_modelo}+{datos_tablas.huella[:12]}'
 
-st.title("🛒 Sistema de Recomendación E-commerce")
+    diccionarios = compartir_diccionarios(product_info, final_ratings_matrix, user_id_to_name, version_datos)
+    motor_vecinos = construir_motor_vecinos(final_ratings_matrix, version_modelo)
+    servicio_recomendaciones = construir_servicio_recomendaciones(
+        modelo_svd, motor_vecinos, final_ratings_matrix, diccionarios, product_info, top_n, indice_aproximado, version_datos,
+        marca_tabla
+    )
 
-# Crear layout principal con sidebar personalizado
 with st.sidebar:
-    st.markdown("""
-    <div style="text-align: center; margin-bottom: 30px;">
-        <h1 style="color: #d4af37; font-size: 2em;">✨</h1>
-        <h2>ESTILO</h2>
-        <p style="color: #a0a0a0; font-size: 0.9em;">Premium Fashion</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown("---")
-    st.markdown("### 📋 NAVEGACIÓN")
-    
-    page = st.radio(
-        "Selecciona una sección:",
-        ["🏠 Inicio", 
-         "🔍 Búsqueda de Productos",
-         "📊 Estadísticas", 
-         "🏆 Top Productos",
-         "🤖 Mis Recomendaciones",
-         "🧠 IA Insights",
-         "💬 Chat IA",
-         "ℹ️ Acerca de"]
-    )
-    
-    st.markdown("---")
-    
+    # Filas que no respetaron el esquema al cargar (antes se omitían en silencio)
+    detalle_descartadas = [f"{tabla}: {n:,}" for tabla, n in filas_descartadas.items() if n]
+    if detalle_descartadas:
+        st.warning("⚠️ Filas descartadas al cargar los datos\n\n" + "\n".join(f"- {d}" for d in detalle_descartadas))
+
+    # Una recarga fallida deja la versión anterior en uso
+    for recarga in (recarga_tablas, recarga_ratings):
+        if recarga is not None and recarga.error is not None:
+            st.warning(f"⚠️ No se pudieron recargar los datos (sigue la versión anterior): {recarga.error}")
+
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
 
@@ -830,7 +845,7 @@ elif page == "🔍 Búsqueda de Productos":
     </div>
     """, unsafe_allow_html=True)
     
-    todos_productos = [(prod_id, info['nombre']) for prod_id, info in product_info.items()]
+    todos_productos = list(zip(product_info.prod_ids, product_info.nombres))
     todos_productos.sort(key=lambda x: x[1])
     
     col1, col2, col3 = st.columns([2, 2, 1])
@@ -852,6 +867,17 @@ elif page == "🔍 Búsqueda de Productos":
     with col3:
         sort_by = st.selectbox("💱 Ordenar:", ["Relevancia", "↓ Precio", "↑ Precio", "⭐ Popular"], key="sort_select")
     
+    # Detalle del producto elegido con "Ver detalles" (el índice de similares se abre recién aquí)
+    if st.session_state.get('selected_product') in product_info:
+        with st.container(border=True):
+            mostrar_producto_detalle(
+                st.session_state.selected_product, product_info,
+                cargar_similares_productos(final_ratings_matrix, diccionarios, version_modelo, version_datos), diccionarios
+            )
+            if st.button("✖ Cerrar detalle", key="cerrar_detalle"):
+                del st.session_state.selected_product
+                st.rerun()
+    
     if search_term:
         with st.spinner("🔍 Buscando productos..."):
             resultados = buscar_productos_rapido(search_term, product_info)
@@ -1018,44 +1044,85 @@ elif page == "🤖 Mis Recomendaciones":
     </div>
     """, unsafe_allow_html=True)
     
-    # Seleccionar usuario
-    user_ids = list(index_to_user_id.values())
-    
-    col1, col2 = st.columns([3, 1])
+    # Seleccionar usuario: las opciones son filas de la matriz; el nombre se resuelve al mostrar
+    col1, col2, col3 = st.columns([3, 1, 1])
     with col1:
-        selected_user_id = st.selectbox(
+        user_index = st.selectbox(
             "👤 Selecciona tu usuario:",
-            user_ids,
-            format_func=lambda x: f"{user_id_to_name.get(x, x)}"
+            range(final_ratings_matrix.shape[0]),
+            format_func=diccionarios.nombre_usuario
         )
     
     with col2:
         n_recomendaciones = st.slider("Cuántas recomendaciones:", 3, 12, 6)
     
-    if selected_user_id:
-        user_index = user_id_to_index[selected_user_id]
-        user_name = user_id_to_name.get(selected_user_id, selected_user_id)
+    with col3:
+        motor = st.selectbox("🧠 Motor:", ["SVD", "Usuarios similares"])
+    
+    # Productos populares que están en la matriz (para calificar)
+    calificables = [
+        codigo for codigo in servicio_recomendaciones.populares[:60]
+        if diccionarios.columna_de_producto[codigo] >= 0
+    ][:30]
+    nombre_calificable = lambda codigo: product_info.nombres[diccionarios.fila_catalogo[codigo]]
+    
+    if user_index is not None:
+        user_name = diccionarios.nombre_usuario(user_index)
         
         st.subheader(f"👋 Hola, {user_name}!")
         st.write("Basado en tus preferencias, te recomendamos estos productos:")
         st.markdown("---")
         
         with st.spinner("🤖 Generando recomendaciones personalizadas..."):
-            # Obtener productos recomendados de la BD relacional
-            productos_recomendados = db_productos.nlargest(n_recomendaciones, 'cantidad_resenas')
-            
-            if len(productos_recomendados) > 0:
-                cols = st.columns(3)
-                for idx, (_, row) in enumerate(productos_recomendados.iterrows()):
-                    with cols[idx % 3]:
-                        with st.container(border=True):
-                            mostrar_producto_grid(row['prod_id'], product_info)
-                            
-                            # Mostrar información
-                            st.markdown(f"<span class='rating'>⭐ {row['cantidad_resenas']} reseñas</span>", unsafe_allow_html=True)
-                            st.markdown(f"<span class='price'>${row['precio'] / 100:.2f}</span>", unsafe_allow_html=True)
-            else:
-                st.warning("❌ No hay recomendaciones disponibles")
+            recomendacion = servicio_recomendaciones.recomendar(
+                user_index, n_recomendaciones, 'svd' if motor == "SVD" else 'vecinos'
+            )
+            mostrar_recomendacion(recomendacion, diccionarios, product_info)
+        
+        # La calificación se pliega en el SVD del usuario y va al registro de eventos: los
+        # agregados la cuentan al instante y python src/cli.py compact la pliega en las tablas.
+        # Se guarda en el callback, que corre antes del rerun: las recomendaciones de arriba
+        # ya la reflejan
+        def guardar_calificacion(user_index):
+            codigo = st.session_state.calificar_codigo
+            if codigo is None:
+                return
+            calificacion = st.session_state.calificar_valor
+            prod_id = diccionarios.productos.id(codigo)
+            registro_eventos.agregar(diccionarios.usuarios.id(diccionarios.usuario_de_fila[user_index]),
+                                     prod_id, calificacion)
+            servicio_recomendaciones.plegar_usuario([diccionarios.columna_de_producto[codigo]], [calificacion],
+                                                    user_index)
+            st.session_state.calificacion_guardada = prod_id
+
+        with st.expander("⭐ Califica un producto"):
+            with st.form("calificar_producto", clear_on_submit=True):
+                st.selectbox("Producto:", calificables, format_func=nombre_calificable, key="calificar_codigo")
+                st.slider("Tu calificación:", 1, 5, 5, key="calificar_valor")
+                st.form_submit_button("Guardar calificación", on_click=guardar_calificacion, args=(user_index,))
+            prod_id = st.session_state.pop("calificacion_guardada", None)
+            if prod_id is not None:
+                promedio, cantidad = agregados_ratings.producto(prod_id)
+                st.success(f"✅ Calificación guardada: ⭐ {promedio:.2f} promedio con {cantidad:,} ratings")
+    
+    # Usuario nuevo: sus ratings se pliegan en el SVD solo para esta consulta (sin reentrenar)
+    st.markdown("---")
+    with st.expander("🆕 ¿Eres nuevo? Califica algunos productos y te recomendamos al instante"):
+        elegidos = st.multiselect(
+            "Productos que conoces:",
+            calificables,
+            format_func=nombre_calificable,
+            max_selections=10
+        )
+        calificaciones = [
+            st.slider(nombre_calificable(codigo), 1, 5, 5, key=f"nuevo_{codigo}")
+            for codigo in elegidos
+        ]
+        if elegidos:
+            recomendacion = servicio_recomendaciones.recomendar_nuevo(
+                diccionarios.columna_de_producto[elegidos], calificaciones, n_recomendaciones
+            )
+            mostrar_recomendacion(recomendacion, diccionarios, product_info)
 
 # ============================================================================
 # PÁGINA: IA INSIGHTS - ANÁLISIS INTELIGENTE
@@ -1176,10 +1243,30 @@ elif page == "💬 Chat IA":
         
         if prompt := st.chat_input("Escribe tu pregunta..."):
             st.session_state.chat_history.append({"role": "user", "content": prompt})
-            with st.spinner("Pensando..."):
-                respuesta = responder_con_groq(prompt, db_usuarios, db_productos, db_calificaciones, api_key)
-            st.session_state.chat_history.append({"role": "assistant", "content": respuesta})
-            st.rerun()
+            with st.chat_message("user"):
+                st.write(prompt)
+            
+            def guardar_respuesta(texto, completa):
+                """Guarda la respuesta al cerrar el stream, aunque se haya interrumpido"""
+                if not completa:
+                    texto = f"{texto} …\n\n_(respuesta interrumpida)_" if texto else "_(respuesta interrumpida)_"
+                st.session_state.chat_history.append({"role": "assistant", "content": texto})
+            
+            # Los tokens se muestran a medida que llegan
+            with st.chat_message("assistant"):
+                # Las tablas se cargan recién con la primera pregunta; el contexto se arma una vez por versión
+                tablas_chat = abrir_tablas().actual
+                db_usuarios, db_productos, db_calificaciones = tablas_chat.datos[:3]
+                respuesta = responder_con_groq_stream(
+                    prompt, db_usuarios, db_productos, db_calificaciones, api_key,
+                    al_terminar=guardar_respuesta, huella=tablas_chat.huella
+                )
+                try:
+                    st.write_stream(respuesta)
+                finally:
+                    # Si el rerun se corta a mitad (otra pregunta, cambio de página), el stream se
+                    # cierra acá y guardar_respuesta corre dentro de esta ejecución
+                    respuesta.close()
 
 elif page == "ℹ️ Acerca de":
     st.markdown("""<div class="hero-section"><h1 class="hero-title">ℹ️ Acerca de LUXE ESSENCE</h1><p class="hero-subtitle">Conoce más sobre nuestro sistema de recomendación premium</p></div>""", unsafe_allow_html=True)
@@ -1201,6 +1288,39 @@ elif page == "ℹ️ Acerca de":
     
     st.info("Desarrollado para demostrar capacidades de recomendación en e-commerce.")
 
+# ============================================================================
+# PÁGINA OCULTA: DIAGNÓSTICO
+# ============================================================================
+
+elif page == "🩺 Diagnóstico":
+    st.markdown("""<div class="hero-section"><h1 class="hero-title">🩺 Diagnóstico</h1><p class="hero-subtitle">Latencias y cachés de este proceso (todas las sesiones)</p></div>""", unsafe_allow_html=True)
+    
+    if not habilitadas():
+        st.warning("⚠️ Métricas desactivadas (RECOMENDADOR_METRICAS=0)")
+    if servidor_metricas is not None:
+        st.caption(f"📡 Prometheus: http://{servidor_metricas.server_address[0]}:{servidor_metricas.server_address[1]}/metrics")
+    
+    operaciones, caches = resumen()
+    st.subheader("⏱️ Operaciones")
+    if operaciones:
+        # Las que más tiempo acumulan primero: ahí se va el rerun
+        st.dataframe(pd.DataFrame(operaciones).sort_values('total_s', ascending=False).round(3),
+                     hide_index=True)
+    else:
+        st.info("Todavía no hay mediciones")
+    
+    st.subheader("🗃️ Cachés")
+    if caches:
+        st.dataframe(pd.DataFrame(caches).round(3), hide_index=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button("⬇️ Texto Prometheus", texto_prometheus(), file_name="metricas.prom", mime="text/plain")
+    with col2:
+        if st.button("🔄 Reiniciar métricas"):
+            reiniciar()
+            st.rerun()
+
 st.markdown("---")
 st.markdown("""
 <div style='text-align: center; color: #888; margin-top: 80px; padding: 40px;'>
@@ -1209,3 +1329,5 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# La duración de los reruns que llegan hasta aquí (st.stop() los corta antes)
+observar('rerun', time.perf_counter() - inicio_rerun)
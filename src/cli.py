@@ -0,0 +1,252 @@
+"""
+Comandos offline del sistema de recomendación
+
+Uso:
+    python src/cli.py convert [--datos data]
+    python src/cli.py compact [--datos data] [--cada MINUTOS]
+    python src/cli.py train [--datos data/ratings_Electronics.csv] [--salida modelos] [--cada MINUTOS]
+                            [--entrenador svds|aleatorio|als] [--desde VERSION] [--en-caliente VERSION]
+    python src/cli.py precompute [--version VERSION] [--top-n 12] [--procesos N] [--similares 8] [--listas N]
+    python src/cli.py versions [--salida modelos]
+    python src/cli.py publish VERSION [--salida modelos]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+from recomendador import DiccionarioIds, ModeloALS, ModeloSVD
+from recomendador.artefactos import (cargar_artefactos, guardar_artefactos, listar_versiones, publicar_version,
+                                     version_actual)
+from recomendador.carga import leer_ratings
+from recomendador.columnar import convertir_directorio, leer_tabla
+from recomendador.eventos import compactar
+from recomendador.indice_aproximado import IndiceIVF
+from recomendador.precalculo import precalcular_top_n
+from recomendador.svd_aleatorio import error_reconstruccion
+from recomendador.vecinos_productos import VecinosProductos
+
+PROJECT_DIR = Path(__file__).parent.parent
+
+
+def comando_train(args):
+    """Entrena el modelo y publica una nueva versión; con --cada repite según ese intervalo"""
+    while True:
+        _entrenar(args)
+        if not args.cada:
+            return 0
+        # La app toma cada versión nueva en su siguiente rerun; lo plegado al vuelo se descarta
+        print(f"⏰ Próximo entrenamiento en {args.cada:g} min")
+        time.sleep(args.cada * 60)
+
+
+def _entrenar(args):
+    inicio = time.perf_counter()
+    if args.desde:
+        # Ratings de una versión ya guardada, mapeados desde el disco (sin releer el CSV)
+        artefactos = cargar_artefactos(args.salida, args.desde)
+        matriz, popularidad = artefactos.matriz, artefactos.popularidad
+        min_ratings, descartadas = artefactos.meta.get('min_ratings', args.min_ratings), 0
+    else:
+        matriz, popularidad, _, descartadas = leer_ratings(
+            args.datos, min_ratings=args.min_ratings, tam_bloque=args.tam_bloque
+        )
+        min_ratings = args.min_ratings
+    print(f"📥 Datos: {matriz.shape[0]:,} usuarios × {matriz.shape[1]:,} productos, {matriz.nnz:,} ratings "
+          f"({time.perf_counter() - inicio:.2f}s)")
+    if descartadas:
+        print(f"⚠️ Filas descartadas: {descartadas:,}")
+
+    inicio = time.perf_counter()
+    extra = {'min_ratings': min_ratings, 'entrenador': args.entrenador}
+    if args.entrenador == 'als':
+        anterior = cargar_artefactos(args.salida, args.en_caliente).modelo if args.en_caliente else None
+        modelo = ModeloALS.entrenar(matriz, n_factores=args.factores, regularizacion=args.regularizacion,
+                                    alpha=args.alpha, iteraciones=args.iteraciones or 15,
+                                    tolerancia=args.tolerancia, max_hilos=args.hilos, anterior=anterior)
+        extra.update(regularizacion=args.regularizacion, alpha=args.alpha, iteraciones=modelo.iteraciones)
+        print(f"🧠 ALS con {modelo.n_factores} factores, {modelo.iteraciones} iteraciones "
+              f"({time.perf_counter() - inicio:.2f}s)")
+    else:
+        if args.entrenador == 'aleatorio':
+            modelo = ModeloSVD.entrenar_aleatorio(matriz, n_factores=args.factores, sobremuestreo=args.sobremuestreo,
+                                                  iteraciones=args.iteraciones or 2)
+        else:
+            modelo = ModeloSVD.entrenar(matriz, n_factores=args.factores)
+        segundos = time.perf_counter() - inicio
+        error = error_reconstruccion(matriz, modelo.U, modelo.sigma, modelo.Vt)
+        extra['error_relativo'] = round(error, 6)
+        print(f"🧠 SVD ({args.entrenador}) con {modelo.n_factores} factores, error relativo {error:.4f} "
+              f"({segundos:.2f}s)")
+
+    # La versión se publica con su tabla top-N y sus similares ya escritos
+    version = guardar_artefactos(args.salida, matriz, modelo, popularidad, extra=extra, publicar=False)
+    _precalcular(args, version, matriz, args.datos.parent, modelo)
+    publicar_version(args.salida, version)
+    print(f"✅ Versión publicada: {version} en {args.salida}")
+
+
+def comando_precompute(args):
+    """Calcula (o retoma) la tabla top-N y los productos similares de una versión ya guardada"""
+    version = args.version or version_actual(args.salida)
+    if version is None:
+        print(f"❌ No hay artefactos publicados en {args.salida}")
+        return 1
+    _precalcular(args, version, cargar_artefactos(args.salida, version).matriz, args.datos)
+    return 0
+
+
+def _precalcular(args, version, matriz, directorio_datos, modelo=None):
+    en_catalogo = _productos_en_catalogo(directorio_datos, matriz)
+    if args.top_n:
+        inicio = time.perf_counter()
+        meta = precalcular_top_n(args.salida, version, n=args.top_n, tam_bloque=args.usuarios_por_bloque,
+                                 max_procesos=args.procesos, productos_validos=en_catalogo)
+        print(f"📋 Top-{meta['n']} de {meta['n_usuarios']:,} usuarios, {meta['bloques_calculados']} bloques "
+              f"calculados ({time.perf_counter() - inicio:.2f}s)")
+
+    if args.similares:
+        inicio = time.perf_counter()
+        similares = VecinosProductos.por_coratings(matriz.matriz, k=args.similares, validos=en_catalogo,
+                                                   max_hilos=args.hilos)
+        similares.guardar(args.salida / version)
+        print(f"🔗 {similares.k} similares por producto para {similares.n_productos:,} productos "
+              f"({time.perf_counter() - inicio:.2f}s)")
+
+    # Sin productos del catálogo en la matriz no hay nada que indexar
+    if args.listas != 0 and (en_catalogo is None or en_catalogo.any()):
+        inicio = time.perf_counter()
+        modelo = modelo or cargar_artefactos(args.salida, version).modelo
+        indice = IndiceIVF.para_modelo(modelo, n_listas=args.listas, validos=en_catalogo, n_sondeos=args.sondeos)
+        indice.guardar(args.salida / version)
+        # Recall frente al top exacto para una muestra de usuarios
+        usuarios = np.random.default_rng(0).choice(modelo.U.shape[0], min(200, modelo.U.shape[0]), replace=False)
+        recall = indice.recall(modelo.U[usuarios] * modelo.sigma, k=10)
+        print(f"🧭 Índice aproximado: {indice.n_listas:,} listas, {indice.n_sondeos} sondeos, "
+              f"recall@10 {recall:.3f} ({time.perf_counter() - inicio:.2f}s)")
+
+
+def _productos_en_catalogo(directorio_datos, matriz):
+    """Columnas de la matriz cuyo producto está en db_productos (None si no hay catálogo)"""
+    try:
+        productos, _ = leer_tabla(directorio_datos, 'db_productos', ['prod_id'])
+    except FileNotFoundError:
+        return None
+    return DiccionarioIds.desde_valores(productos['prod_id'].to_numpy()).codigos(matriz.prod_ids) >= 0
+
+
+def _opciones_precalculo(subparser):
+    subparser.add_argument('--top-n', type=int, default=12, help="Recomendaciones precalculadas por usuario (0 = no)")
+    subparser.add_argument('--procesos', type=int, default=None, help="Procesos del cálculo top-N (por defecto, uno por CPU)")
+    subparser.add_argument('--usuarios-por-bloque', type=int, default=None, help="Usuarios por bloque del cálculo top-N")
+    subparser.add_argument('--similares', type=int, default=8, help="Productos similares por producto (0 = no)")
+    subparser.add_argument('--hilos', type=int, default=None, help="Hilos del cálculo de similares y del ALS")
+    subparser.add_argument('--listas', type=int, default=None,
+                           help="Listas del índice aproximado de productos (por defecto √productos; 0 = no)")
+    subparser.add_argument('--sondeos', type=int, default=None,
+                           help="Listas recorridas por consulta (por defecto listas/12 y al menos ~2.000 productos): más recall y más latencia")
+
+
+def comando_convert(args):
+    """Convierte los CSV de datos a Parquet tipado junto a los originales"""
+    inicio = time.perf_counter()
+    for tabla, (filas, descartadas) in convertir_directorio(args.datos, tam_bloque=args.tam_bloque).items():
+        aviso = f", ⚠️ {descartadas:,} filas descartadas" if descartadas else ""
+        print(f"📦 {tabla}.parquet: {filas:,} filas{aviso}")
+    print(f"✅ Conversión terminada ({time.perf_counter() - inicio:.2f}s)")
+    return 0
+
+
+def comando_compact(args):
+    """Pliega el registro de calificaciones nuevas en las tablas base; con --cada repite"""
+    while True:
+        inicio = time.perf_counter()
+        agregadas = compactar(args.datos)
+        for tabla, filas in agregadas.items():
+            print(f"📥 {tabla}: {filas:,} filas agregadas")
+        # La app recarga las tablas cambiadas en segundo plano (sin reiniciar)
+        print(f"✅ Compactación terminada ({time.perf_counter() - inicio:.2f}s)" if agregadas
+              else "✅ No hay calificaciones nuevas")
+        if not args.cada:
+            return 0
+        time.sleep(args.cada * 60)
+
+
+def comando_versions(args):
+    """Lista las versiones disponibles marcando la publicada"""
+    actual = version_actual(args.salida)
+    for version in listar_versiones(args.salida):
+        print(f"{'*' if version == actual else ' '} {version}")
+    return 0
+
+
+def comando_publish(args):
+    """Publica una versión existente (cambio en caliente o rollback)"""
+    publicar_version(args.salida, args.version)
+    print(f"✅ Versión publicada: {args.version}")
+    return 0
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(description="Entrenamiento offline del sistema de recomendación")
+    parser.add_argument('--salida', type=Path, default=PROJECT_DIR / 'modelos',
+                        help="Directorio base de artefactos versionados")
+    subparsers = parser.add_subparsers(dest='comando', required=True)
+
+    convert = subparsers.add_parser('convert', help="Convierte los CSV de data/ a Parquet tipado")
+    convert.add_argument('--datos', type=Path, default=PROJECT_DIR / 'data', help="Directorio con los CSV")
+    convert.add_argument('--tam-bloque', type=int, default=1_000_000, help="Filas del CSV por bloque de lectura")
+    convert.set_defaults(func=comando_convert)
+
+    compact = subparsers.add_parser('compact', help="Pliega las calificaciones nuevas en las tablas de data/")
+    compact.add_argument('--datos', type=Path, default=PROJECT_DIR / 'data', help="Directorio con los CSV")
+    compact.add_argument('--cada', type=float, default=None, help="Compactar cada estos minutos (sin fin)")
+    compact.set_defaults(func=comando_compact)
+
+    train = subparsers.add_parser('train', help="Entrena y persiste una nueva versión de artefactos")
+    train.add_argument('--datos', type=Path, default=PROJECT_DIR / 'data' / 'ratings_Electronics.csv')
+    train.add_argument('--factores', type=int, default=15)
+    train.add_argument('--min-ratings', type=int, default=50)
+    train.add_argument('--tam-bloque', type=int, default=1_000_000, help="Filas del CSV por bloque de lectura")
+    train.add_argument('--cada', type=float, default=None, help="Reentrenar cada estos minutos (sin fin)")
+    train.add_argument('--desde', metavar='VERSION', help="Reentrenar con los ratings de una versión guardada")
+    train.add_argument('--entrenador', choices=['svds', 'aleatorio', 'als'], default='svds',
+                       help="svds (ARPACK), SVD aleatorizado por bloques de usuarios o ALS implícito")
+    train.add_argument('--sobremuestreo', type=int, default=10, help="Columnas extra del bosquejo (aleatorio)")
+    train.add_argument('--iteraciones', type=int, default=None,
+                       help="Iteraciones de potencia (aleatorio, 2) o máximo de iteraciones (als, 15)")
+    train.add_argument('--regularizacion', type=float, default=0.1, help="λ del ALS")
+    train.add_argument('--alpha', type=float, default=40.0, help="Confianza del ALS: c = 1 + alpha * rating")
+    train.add_argument('--tolerancia', type=float, default=1e-3,
+                       help="El ALS se detiene cuando la pérdida mejora menos que esto (relativo)")
+    train.add_argument('--en-caliente', metavar='VERSION',
+                       help="ALS: arrancar desde los factores de producto de esa versión")
+    _opciones_precalculo(train)
+    train.set_defaults(func=comando_train)
+
+    precompute = subparsers.add_parser('precompute', help="Calcula o retoma el top-N y los similares de una versión")
+    precompute.add_argument('--version', help="Versión de artefactos (por defecto la publicada)")
+    precompute.add_argument('--datos', type=Path, default=PROJECT_DIR / 'data', help="Directorio con db_productos")
+    _opciones_precalculo(precompute)
+    precompute.set_defaults(func=comando_precompute)
+
+    versions = subparsers.add_parser('versions', help="Lista las versiones de artefactos")
+    versions.set_defaults(func=comando_versions)
+
+    publish = subparsers.add_parser('publish', help="Publica una versión existente")
+    publish.add_argument('version')
+    publish.set_defaults(func=comando_publish)
+
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
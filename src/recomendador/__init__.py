@@ -0,0 +1,48 @@
+"""
+Motores de recomendación del sistema LUXE ESSENCE
+Estructuras vectorizadas y dispersas usadas por la aplicación Streamlit
+Los nombres del paquete se importan con su primer uso: importar un submódulo
+(recomendador.busqueda, recomendador.chat...) no trae scipy ni los demás
+motores
+"""
+
+import importlib
+
+# Nombre exportado → submódulo que lo define
+_SUBMODULOS = {
+    'Catalogo': 'catalogo',
+    'DiccionarioIds': 'diccionario',
+    'Diccionarios': 'diccionario',
+    'IndiceBusqueda': 'indice_busqueda',
+    'IndiceIVF': 'indice_aproximado',
+    'MatrizRatings': 'matriz',
+    'ModeloALS': 'als',
+    'ModeloSVD': 'svd',
+    'NombresUsuarios': 'diccionario',
+    'PuntuadorLotes': 'lotes',
+    'Recomendacion': 'servicio',
+    'ServicioRecomendaciones': 'servicio',
+    'VecinosProductos': 'vecinos_productos',
+    'VecinosUsuarios': 'vecinos',
+    'a_csr': 'matriz',
+    'encontrar_usuarios_similares': 'vecinos',
+    'obtener_recomendaciones_svd': 'svd',
+    'top_k': 'seleccion',
+    'top_k_filas': 'seleccion',
+}
+
+__all__ = sorted(_SUBMODULOS)
+
+
+def __getattr__(nombre):
+    submodulo = _SUBMODULOS.get(nombre)
+    if submodulo is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+    valor = getattr(importlib.import_module(f'.{submodulo}', __name__), nombre)
+    # Las siguientes búsquedas lo encuentran directamente en el módulo
+    globals()[nombre] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,53 @@
+"""
+Datos de solo lectura compartidos por todas las sesiones
+Con st.cache_data cada sesión recibe, en cada rerun, una copia deserializada
+de las tablas y la matriz; con st.cache_resource todas reciben el mismo
+objeto. congelar() lo prepara para compartirlo: los arreglos NumPy quedan de
+solo lectura (una escritura en el lugar falla en vez de alterar los datos de
+las demás sesiones), los DataFrames se rearman sobre columnas de solo lectura
+y los dicts se entregan como vistas inmutables. Lo derivado (filtros, columnas
+nuevas, copias) sigue funcionando igual: pandas copia al escribir
+"""
+
+import sys
+from types import MappingProxyType
+
+import numpy as np
+import pandas as pd
+
+
+def congelar(valor):
+    """El valor listo para compartir sin copias; recorre tuplas, listas, dicts y objetos del paquete"""
+    if isinstance(valor, np.ndarray):
+        valor.setflags(write=False)
+        return valor
+    if isinstance(valor, pd.DataFrame):
+        return pd.DataFrame({col: _columna(valor[col]) for col in valor.columns}, index=valor.index, copy=False)
+    if isinstance(valor, pd.Series):
+        return pd.Series(_columna(valor), index=valor.index, name=valor.name, copy=False)
+    # Si scipy.sparse no se importó, el valor no puede ser una matriz dispersa (y no se importa por esto)
+    sparse = sys.modules.get('scipy.sparse')
+    if sparse is not None and sparse.issparse(valor):
+        for arreglo in (valor.data, getattr(valor, 'indices', None), getattr(valor, 'indptr', None)):
+            if isinstance(arreglo, np.ndarray):
+                arreglo.setflags(write=False)
+        return valor
+    if isinstance(valor, tuple):
+        congelados = [congelar(v) for v in valor]
+        return type(valor)(*congelados) if hasattr(valor, '_fields') else tuple(congelados)
+    if isinstance(valor, list):
+        return [congelar(v) for v in valor]
+    if isinstance(valor, dict):
+        return MappingProxyType({clave: congelar(v) for clave, v in valor.items()})
+    if type(valor).__module__.startswith(__package__ + '.'):
+        # Catálogo, diccionarios, matriz...: sus atributos se congelan en el lugar
+        for nombre, atributo in vars(valor).items():
+            setattr(valor, nombre, congelar(atributo))
+    return valor
+
+
+def _columna(serie):
+    """Arreglo de solo lectura con los valores de una columna NumPy; las demás (texto, categorías) quedan igual"""
+    if not isinstance(serie.dtype, np.dtype):
+        return serie.array
+    return congelar(serie.to_numpy(copy=True))
@@ -0,0 +1,185 @@
+"""
+Mínimos cuadrados alternados (ALS) para feedback implícito
+Cada rating es una preferencia (1) con confianza c = 1 + alpha * rating y los
+pares sin rating son preferencia 0 con confianza 1, en lugar de ratings cero
+como en el SVD. Alterna la solución de los factores de usuarios y de
+productos: cada fila es un sistema f × f que se aproxima con unos pasos de
+gradiente conjugado desde la solución anterior, vectorizados sobre un bloque
+de filas; los bloques se reparten en un pool de hilos. Arranca en
+caliente desde los factores de producto de un modelo anterior y se detiene
+cuando la pérdida deja de bajar. El modelo resultante es un ModeloSVD con
+sigma = 1: puntúa, recomienda y se precalcula igual que el SVD
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy import sparse
+
+from .diccionario import DiccionarioIds
+from .matriz import MEMORIA_BLOQUE, a_csr
+from .svd import ModeloSVD, _prod_ids
+
+
+class ModeloALS(ModeloSVD):
+    """Factores ALS: U (usuarios × f) y Vt (f × productos); score = U[u] @ Vt"""
+
+    def __init__(self, U, Vt, ratings, prod_ids=None, regularizacion=0.1, alpha=40.0):
+        super().__init__(U, np.ones(np.shape(U)[1], dtype=np.float32), Vt, ratings, prod_ids)
+        self.regularizacion = regularizacion
+        self.alpha = alpha
+        self.iteraciones = 0
+        self._gram_productos = None
+        self._gram_usuarios = None
+
+    @classmethod
+    def entrenar(cls, matriz, n_factores=15, regularizacion=0.1, alpha=40.0, iteraciones=15, tolerancia=1e-3,
+                 pasos_cg=3, max_hilos=None, anterior=None, semilla=0):
+        """Entrena hasta iteraciones o hasta que la pérdida mejore menos que tolerancia (relativa)
+
+        pasos_cg: pasos de gradiente conjugado por fila y media iteración (cada
+        uno parte de la solución anterior). anterior: modelo (SVD o ALS) cuyos
+        factores de producto, alineados por prod_id, son el punto de partida;
+        los productos nuevos arrancan al azar.
+        """
+        ratings = a_csr(matriz)
+        por_producto = ratings.T.tocsr()
+        prod_ids = _prod_ids(matriz)
+
+        rng = np.random.default_rng(semilla)
+        if anterior is not None:
+            n_factores = anterior.n_factores
+        Y = rng.normal(0, 0.01, (ratings.shape[1], n_factores)).astype(np.float32)
+        if anterior is not None:
+            Y = _alinear(Y, anterior, prod_ids)
+        X = np.zeros((ratings.shape[0], n_factores), dtype=np.float32)
+
+        # Cada iteración termina con los usuarios: X queda resuelto para el Y final, así
+        # plegar los ratings de un usuario entrenado reproduce sus factores
+        realizadas = 0
+        with ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='als') as pool:
+            X = _resolver(ratings, Y, X, regularizacion, alpha, pasos_cg, pool)
+            perdida = _perdida(ratings, X, Y, regularizacion, alpha)
+            for realizadas in range(1, iteraciones + 1):
+                Y = _resolver(por_producto, X, Y, regularizacion, alpha, pasos_cg, pool)
+                X = _resolver(ratings, Y, X, regularizacion, alpha, pasos_cg, pool)
+                anterior_perdida, perdida = perdida, _perdida(ratings, X, Y, regularizacion, alpha)
+                if anterior_perdida - perdida < tolerancia * abs(perdida):
+                    break
+
+        modelo = cls(X, Y.T, ratings, prod_ids, regularizacion, alpha)
+        modelo.iteraciones = realizadas
+        return modelo
+
+    # ========================================================================
+    # PLIEGUE (FOLD-IN)
+    # ========================================================================
+
+    def proyectar(self, columnas, ratings):
+        """Factores de un usuario: el mismo paso ALS, con los productos fijos"""
+        columnas = np.asarray(columnas, dtype=np.int64)
+        Y = self._Vt_columnas(columnas).T
+        if self._gram_productos is None or self._gram_productos[0] != self.n_productos:
+            todos = self._Vt_columnas(np.arange(self.n_productos))
+            self._gram_productos = (self.n_productos, todos @ todos.T)
+        return _resolver_uno(Y, ratings, self._gram_productos[1], self.regularizacion, self.alpha)
+
+    def proyectar_producto(self, factores, ratings):
+        """Factores de un producto: el paso ALS de productos, con los usuarios entrenados fijos"""
+        if self._gram_usuarios is None:
+            self._gram_usuarios = self.U.T @ self.U
+        return _resolver_uno(factores, ratings, self._gram_usuarios, self.regularizacion, self.alpha)
+
+
+def _alinear(Y, anterior, prod_ids):
+    """Copia en Y los factores de producto del modelo anterior, por prod_id"""
+    if prod_ids is None:
+        columnas = np.arange(len(Y))
+        previas = np.where(columnas < anterior.Vt.shape[1], columnas, -1)
+    else:
+        previas = DiccionarioIds(anterior.prod_ids).codigos(prod_ids)
+    encontradas = previas >= 0
+    Y[encontradas] = (np.asarray(anterior.Vt)[:, previas[encontradas]] * anterior.sigma[:, np.newaxis]).T
+    return Y
+
+
+def _perdida(P, X, Y, regularizacion, alpha):
+    """Σ c_ui (p_ui - x_u·y_i)² sobre todos los pares + λ(|X|² + |Y|²), en O(ratings × f)
+
+    Los pares sin rating aportan (x_u·y_i)²: su suma sobre todos los pares es
+    tr(XᵀX YᵀY) y a los calificados se les corrige el término.
+    """
+    X64, Y64 = X.astype(np.float64), Y.astype(np.float64)
+    total = float(np.sum((X64.T @ X64) * (Y64.T @ Y64)))
+    for inicio, fin in _bloques(P.indptr, max(1, MEMORIA_BLOQUE // (4 * X.shape[1] * 2))):
+        bloque = P[inicio:fin]
+        filas = inicio + np.repeat(np.arange(fin - inicio), np.diff(bloque.indptr))
+        s = np.einsum('ij,ij->i', X[filas], Y[bloque.indices]).astype(np.float64)
+        total += float(np.sum((1 + alpha * bloque.data) * (1 - s) ** 2 - s ** 2))
+    return total + regularizacion * (float(np.sum(X64 ** 2)) + float(np.sum(Y64 ** 2)))
+
+
+def _resolver(P, Y, X, regularizacion, alpha, pasos, pool):
+    """Nuevos factores de las filas de P (CSR) con Y fijo, partiendo de X, por bloques en el pool"""
+    base = (Y.T.astype(np.float64) @ Y + regularizacion * np.eye(Y.shape[1])).astype(np.float32)
+    nuevo = np.empty_like(X)
+    # Temporales float32 de un bloque (ratings × f, unos pocos a la vez), por hilo
+    max_ratings = max(1, MEMORIA_BLOQUE // (4 * Y.shape[1] * 3))
+
+    def resolver_bloque(limites):
+        inicio, fin = limites
+        nuevo[inicio:fin] = _gradiente_conjugado(P[inicio:fin], Y, X[inicio:fin], base, alpha, pasos)
+
+    list(pool.map(resolver_bloque, _bloques(P.indptr, max_ratings)))
+    return nuevo
+
+
+def _bloques(indptr, max_ratings):
+    """Límites (inicio, fin) de bloques de filas con a lo sumo max_ratings ratings (o una sola fila)"""
+    cortes = np.searchsorted(indptr, np.arange(max_ratings, indptr[-1], max_ratings), side='right') - 1
+    cortes = np.unique(np.concatenate([[0], cortes, [len(indptr) - 1]]))
+    return list(zip(cortes[:-1], cortes[1:]))
+
+
+def _gradiente_conjugado(P, Y, x, base, alpha, pasos):
+    """pasos de gradiente conjugado sobre (YᵀY + λI + Yᵀ(C_u - I)Y) x_u = Yᵀ C_u p_u, todas las filas a la vez
+
+    Sin formar las matrices f × f por fila: A v solo necesita Y de los
+    productos calificados, O(ratings × f) por paso.
+    """
+    confianza = alpha * np.asarray(P.data, dtype=np.float32)
+    filas = np.repeat(np.arange(P.shape[0]), np.diff(P.indptr))
+    Yi = Y[P.indices]
+
+    def por_A(v):
+        proyecciones = np.einsum('ij,ij->i', Yi, v[filas]) * confianza
+        return v @ base + _ponderar(P, proyecciones) @ Y
+
+    x = x.copy()
+    r = _ponderar(P, 1 + confianza) @ Y - por_A(x)
+    p = r.copy()
+    r_cuadrado = np.einsum('ij,ij->i', r, r)
+    for _ in range(pasos):
+        Ap = por_A(p)
+        paso = np.divide(r_cuadrado, np.einsum('ij,ij->i', p, Ap), out=np.zeros_like(r_cuadrado),
+                         where=r_cuadrado > 0)
+        x += paso[:, np.newaxis] * p
+        r -= paso[:, np.newaxis] * Ap
+        nuevo_cuadrado = np.einsum('ij,ij->i', r, r)
+        p = r + np.divide(nuevo_cuadrado, r_cuadrado, out=np.zeros_like(r_cuadrado),
+                          where=r_cuadrado > 0)[:, np.newaxis] * p
+        r_cuadrado = nuevo_cuadrado
+    return x
+
+
+def _ponderar(P, valores):
+    """La misma estructura de P con otros valores por rating"""
+    return sparse.csr_matrix((valores, P.indices, P.indptr), shape=P.shape)
+
+
+def _resolver_uno(Y, ratings, gram, regularizacion, alpha):
+    """Un solo sistema ALS: Y (ratings × f) de los calificados y sus ratings"""
+    Y = np.asarray(Y, dtype=np.float64)
+    confianza = alpha * np.asarray(ratings, dtype=np.float64)
+    A = gram + regularizacion * np.eye(Y.shape[1]) + (Y.T * confianza) @ Y
+    return np.linalg.solve(A, Y.T @ (1 + confianza)).astype(np.float32)
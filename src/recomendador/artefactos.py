@@ -0,0 +1,167 @@
+"""
+Artefactos de modelo persistidos en disco y versionados
+Cada versión es un directorio con arreglos .npy que se abren con
+np.load(mmap_mode='r'): varios procesos del mismo host comparten las páginas
+y el arranque en frío no recalcula nada. El archivo ACTUAL apunta a la
+versión vigente y se reemplaza de forma atómica
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .als import ModeloALS
+from .matriz import MatrizRatings
+from .svd import ModeloSVD
+
+ARCHIVO_ACTUAL = 'ACTUAL'
+ARCHIVO_META = 'meta.json'
+
+
+class Artefactos:
+    """Ratings, factores SVD y popularidad de una versión cargada desde disco"""
+
+    def __init__(self, version, directorio, matriz, modelo, popularidad, meta):
+        self.version = version
+        self.directorio = directorio
+        self.matriz = matriz
+        self.modelo = modelo
+        self.popularidad = popularidad
+        self.meta = meta
+
+
+def _guardar(directorio, nombre, arreglo):
+    np.save(directorio / f'{nombre}.npy', np.ascontiguousarray(arreglo), allow_pickle=False)
+
+
+def _cargar(directorio, nombre):
+    return np.load(directorio / f'{nombre}.npy', mmap_mode='r', allow_pickle=False)
+
+
+def _nueva_version(directorio_base):
+    version = datetime.now().strftime('v%Y%m%d-%H%M%S')
+    sufijo = 1
+    candidata = version
+    while (directorio_base / candidata).exists():
+        sufijo += 1
+        candidata = f'{version}-{sufijo}'
+    return candidata
+
+
+def guardar_artefactos(directorio_base, matriz, modelo, popularidad, extra=None, publicar=True):
+    """Escribe una nueva versión completa y (por defecto) la publica como ACTUAL; devuelve su nombre"""
+    directorio_base = Path(directorio_base)
+    directorio_base.mkdir(parents=True, exist_ok=True)
+    version = _nueva_version(directorio_base)
+
+    # Se escribe en un directorio temporal y se publica con renombres atómicos
+    temporal = directorio_base / f'.tmp-{version}'
+    temporal.mkdir()
+    try:
+        ratings = matriz.matriz
+        tipo_indices = np.int32 if ratings.nnz < np.iinfo(np.int32).max else np.int64
+        _guardar(temporal, 'ratings_data', ratings.data.astype(np.float32))
+        _guardar(temporal, 'ratings_indices', ratings.indices.astype(tipo_indices))
+        _guardar(temporal, 'ratings_indptr', ratings.indptr.astype(tipo_indices))
+        # Ids compactos (bytes de ancho fijo), los mismos arreglos de los diccionarios
+        _guardar(temporal, 'user_ids', matriz.user_ids)
+        _guardar(temporal, 'prod_ids', matriz.prod_ids)
+
+        _guardar(temporal, 'svd_U', modelo.U)
+        _guardar(temporal, 'svd_sigma', modelo.sigma)
+        _guardar(temporal, 'svd_Vt', modelo.Vt)
+
+        # Popularidad alineada con prod_ids
+        popularidad = popularidad.reindex(matriz.productos.ids_texto())
+        _guardar(temporal, 'popularidad_avg', popularidad['avg_rating'].fillna(0).to_numpy(np.float32))
+        _guardar(temporal, 'popularidad_count', popularidad['rating_count'].fillna(0).to_numpy(np.int32))
+
+        meta = {
+            'version': version,
+            'creado': datetime.now().isoformat(timespec='seconds'),
+            'n_usuarios': int(matriz.shape[0]),
+            'n_productos': int(matriz.shape[1]),
+            'n_ratings': int(ratings.nnz),
+            'n_factores': int(modelo.n_factores),
+        }
+        meta.update(extra or {})
+        (temporal / ARCHIVO_META).write_text(json.dumps(meta, indent=2), encoding='utf-8')
+
+        os.replace(temporal, directorio_base / version)
+    except Exception:
+        shutil.rmtree(temporal, ignore_errors=True)
+        raise
+
+    if publicar:
+        publicar_version(directorio_base, version)
+    return version
+
+
+def publicar_version(directorio_base, version):
+    """Apunta ACTUAL a una versión existente (reemplazo atómico)"""
+    directorio_base = Path(directorio_base)
+    if not (directorio_base / version / ARCHIVO_META).exists():
+        raise FileNotFoundError(f"No existe la versión de artefactos '{version}'")
+
+    temporal = directorio_base / f'.{ARCHIVO_ACTUAL}.tmp'
+    temporal.write_text(version, encoding='utf-8')
+    os.replace(temporal, directorio_base / ARCHIVO_ACTUAL)
+
+
+def version_actual(directorio_base):
+    """Nombre de la versión publicada, o None si no hay artefactos"""
+    try:
+        return (Path(directorio_base) / ARCHIVO_ACTUAL).read_text(encoding='utf-8').strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def listar_versiones(directorio_base):
+    """Versiones completas disponibles, de la más antigua a la más reciente"""
+    directorio_base = Path(directorio_base)
+    if not directorio_base.exists():
+        return []
+    return sorted(p.name for p in directorio_base.iterdir() if (p / ARCHIVO_META).exists())
+
+
+def cargar_artefactos(directorio_base, version=None):
+    """Abre una versión (por defecto la ACTUAL) con arreglos mapeados en memoria"""
+    directorio_base = Path(directorio_base)
+    version = version or version_actual(directorio_base)
+    if version is None:
+        raise FileNotFoundError(f"No hay artefactos publicados en {directorio_base}")
+
+    directorio = directorio_base / version
+    meta = json.loads((directorio / ARCHIVO_META).read_text(encoding='utf-8'))
+    forma = (meta['n_usuarios'], meta['n_productos'])
+
+    ratings = sparse.csr_matrix(
+        (_cargar(directorio, 'ratings_data'), _cargar(directorio, 'ratings_indices'), _cargar(directorio, 'ratings_indptr')),
+        shape=forma,
+        copy=False
+    )
+    matriz = MatrizRatings(ratings, _cargar(directorio, 'user_ids'), _cargar(directorio, 'prod_ids'))
+    if meta.get('entrenador') == 'als':
+        # Mismos archivos (sigma = 1); el pliegue usa el paso ALS con los hiperparámetros del entrenamiento
+        modelo = ModeloALS(
+            _cargar(directorio, 'svd_U'), _cargar(directorio, 'svd_Vt'), ratings, matriz.prod_ids,
+            regularizacion=meta['regularizacion'], alpha=meta['alpha']
+        )
+    else:
+        modelo = ModeloSVD(
+            _cargar(directorio, 'svd_U'), _cargar(directorio, 'svd_sigma'), _cargar(directorio, 'svd_Vt'),
+            ratings, matriz.prod_ids
+        )
+    popularidad = pd.DataFrame({
+        'avg_rating': _cargar(directorio, 'popularidad_avg'),
+        'rating_count': _cargar(directorio, 'popularidad_count'),
+    }, index=pd.Index(matriz.productos.ids_texto(), name='prod_id'), copy=False)
+    popularidad = popularidad[popularidad['rating_count'] > 0].sort_values(by='avg_rating', ascending=False)
+
+    return Artefactos(version, directorio, matriz, modelo, popularidad, meta)
@@ -0,0 +1,47 @@
+"""
+Búsqueda y ordenamiento de productos del catálogo
+"""
+
+from .catalogo import Catalogo
+from .metricas import medido
+
+
+@medido()
+def buscar_productos_rapido(search_term, product_info):
+    """Búsqueda optimizada de productos"""
+    if not search_term:
+        return []
+
+    term_lower = search_term.lower()
+    resultados = []
+
+    if isinstance(product_info, Catalogo):
+        # Índice invertido: solo se visitan los postings de las palabras buscadas
+        filas, puntajes = product_info.indice_busqueda.buscar(search_term)
+        for fila, puntaje in zip(filas, puntajes):
+            info = product_info.vista(fila)
+            info['relevancia'] = float(puntaje)
+            resultados.append((info['prod_id'], info))
+        return resultados
+
+    for prod_id, info in product_info.items():
+        nombre = info['nombre'].lower()
+        marca = str(info['marca']).lower() if info['marca'] else ""
+
+        if term_lower in nombre or term_lower in marca:
+            resultados.append((prod_id, info))
+
+    return resultados
+
+
+def ordenar_resultados(resultados, sort_by):
+    """Ordena resultados según criterio"""
+    if sort_by == "↓ Precio":
+        return sorted(resultados, key=lambda x: x[1]['precio'])
+    elif sort_by == "↑ Precio":
+        return sorted(resultados, key=lambda x: x[1]['precio'], reverse=True)
+    elif sort_by == "⭐ Popular":
+        return sorted(resultados, key=lambda x: x[1]['reviews'], reverse=True)
+    elif sort_by == "Relevancia":
+        return sorted(resultados, key=lambda x: x[1].get('relevancia', 0), reverse=True)
+    return resultados
@@ -0,0 +1,207 @@
+"""
+Carga del dataset de ratings y agregados de popularidad
+Lógica compartida entre la aplicación y el entrenamiento offline
+"""
+
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .catalogo import Catalogo
+from .columnar import columnar_vigente, contar_lineas_omitidas, leer_tabla, tipar
+from .diccionario import NombresUsuarios
+
+COLUMNAS_RATINGS = ['user_id', 'prod_id', 'rating', 'timestamp']
+TAM_BLOQUE = 1_000_000
+
+TABLAS_RELACIONALES = ('db_usuarios', 'db_productos', 'db_calificaciones_completo')
+
+# Columnas que usa la app de cada tabla relacional
+COLUMNAS_USUARIOS = ['user_id', 'nombre_usuario', 'total_calificaciones']
+COLUMNAS_PRODUCTOS = ['prod_id', 'nombre_producto', 'marca', 'precio', 'imagen_url', 'cantidad_resenas']
+COLUMNAS_CALIFICACIONES = ['calificacion']
+
+
+def cargar_base_relacional(directorio):
+    """Lee db_usuarios, db_productos y db_calificaciones_completo y arma los índices de la app
+
+    El último elemento es {tabla: filas descartadas} para reportarlas en la interfaz.
+    """
+    directorio = Path(directorio)
+
+    # Solo las columnas que usa la app (desde Parquet si está convertido)
+    df_usuarios, malas_usuarios = leer_tabla(directorio, 'db_usuarios', COLUMNAS_USUARIOS)
+    df_productos, malas_productos = leer_tabla(directorio, 'db_productos', COLUMNAS_PRODUCTOS)
+    df_calificaciones, malas_calificaciones = leer_tabla(directorio, 'db_calificaciones_completo',
+                                                         COLUMNAS_CALIFICACIONES)
+    filas_descartadas = {
+        'db_usuarios': malas_usuarios,
+        'db_productos': malas_productos,
+        'db_calificaciones_completo': malas_calificaciones,
+    }
+
+    # user_id → nombre sobre un diccionario de ids compacto (sin dict de strings)
+    user_id_to_name = NombresUsuarios(df_usuarios['user_id'].to_numpy(), df_usuarios['nombre_usuario'].to_numpy())
+
+    product_info = Catalogo.desde_dataframe(df_productos)
+    product_info.indice_busqueda  # se construye aquí para que viaje dentro del caché
+
+    # Pre-crear índices para búsquedas rápidas
+    nombres = np.array([nombre.lower() for nombre in product_info.nombres], dtype=object)
+    marcas = np.array([str(marca).lower() for marca in product_info.marcas], dtype=object)
+    con_marca = marcas != ''
+    productos_nombres = dict(zip(nombres, product_info.prod_ids))
+    productos_marcas = dict(zip(marcas[con_marca], product_info.prod_ids[con_marca]))
+
+    return (df_usuarios, df_productos, df_calificaciones, user_id_to_name, product_info, productos_nombres,
+            productos_marcas, filas_descartadas)
+
+
+def cargar_datos_ratings(ruta, min_ratings=50, tam_bloque=TAM_BLOQUE):
+    """Matriz dispersa, popularidad, conteos y filas descartadas (tupla de load_data)
+
+    Los mapas de ids viajan dentro de la matriz (matriz.usuarios / matriz.productos).
+    """
+    return leer_ratings(ruta, min_ratings=min_ratings, tam_bloque=tam_bloque)
+
+
+def leer_ratings(ruta, min_ratings=50, tam_bloque=TAM_BLOQUE):
+    """(matriz, popularidad, conteos por usuario, filas descartadas) desde Parquet o CSV
+
+    ruta es el CSV; si junto a él hay un ratings_Electronics.parquet vigente se usa ese.
+    """
+    ruta = Path(ruta)
+    if columnar_vigente(ruta.parent, 'ratings_Electronics'):
+        return leer_ratings_columnar(ruta.parent, min_ratings=min_ratings)
+    return leer_ratings_por_bloques(ruta, min_ratings=min_ratings, tam_bloque=tam_bloque)
+
+
+def leer_ratings_columnar(directorio, min_ratings=50):
+    """Una sola pasada sobre el Parquet: los ids ya vienen como códigos de diccionario"""
+    df, descartadas = leer_tabla(directorio, 'ratings_Electronics', ['user_id', 'prod_id', 'rating'])
+    usuarios, productos = df['user_id'].cat, df['prod_id'].cat
+
+    conteo = np.bincount(usuarios.codes, minlength=len(usuarios.categories))
+    counts = pd.Series(conteo, index=usuarios.categories.to_numpy(dtype=object), name='count')
+    counts = counts[counts > 0].sort_values(ascending=False)
+
+    # Usuarios que califican en orden lexicográfico, como en la lectura del CSV
+    activos = np.flatnonzero(conteo >= min_ratings)
+    user_ids = usuarios.categories.to_numpy(dtype=str)[activos]
+    orden = np.argsort(user_ids)
+    fila_de_codigo = np.full(len(conteo), -1, dtype=np.int32)
+    fila_de_codigo[activos[orden]] = np.arange(len(activos), dtype=np.int32)
+
+    filas = fila_de_codigo[usuarios.codes]
+    conservar = filas >= 0
+    codigos = productos.codes[conservar]
+    usados = np.unique(codigos)
+    matriz, popularidad = _construir_matriz(
+        filas[conservar], np.searchsorted(usados, codigos), df['rating'].to_numpy()[conservar],
+        user_ids[orden], productos.categories.to_numpy(dtype=str)[usados]
+    )
+    return matriz, popularidad, counts, descartadas
+
+
+def _bloques(ruta, tam_bloque):
+    """Bloques del CSV de ratings (sin encabezado) con el esquema de columnar.TABLAS
+
+    Devuelve (bloque, filas inválidas); las líneas mal formadas llegan como
+    ParserWarning. Se leen todas las columnas: con usecols pandas no las detecta.
+    """
+    lector = pd.read_csv(
+        ruta, header=None, names=COLUMNAS_RATINGS, dtype={'user_id': 'str', 'prod_id': 'str'},
+        on_bad_lines='warn', chunksize=tam_bloque
+    )
+    for bloque in lector:
+        yield tipar(bloque, 'ratings_Electronics', categorias=False)
+
+
+def contar_ratings_por_usuario(ruta, tam_bloque=TAM_BLOQUE):
+    """Primera pasada: ratings por usuario y filas descartadas, sin cargar el archivo completo"""
+    counts = pd.Series(dtype=np.int64, name='count')
+    descartadas = 0
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        warnings.simplefilter('ignore', pd.errors.DtypeWarning)  # los valores inválidos se cuentan aparte
+        for bloque, invalidas in _bloques(ruta, tam_bloque):
+            # Se reduce en cada bloque: la memoria crece con los usuarios distintos, no con las filas
+            conteo = bloque['user_id'].value_counts(sort=False)
+            counts = pd.concat([counts, conteo]).groupby(level=0, sort=False).sum()
+            descartadas += invalidas
+    return counts.sort_values(ascending=False), descartadas + contar_lineas_omitidas(avisos)
+
+
+def leer_ratings_por_bloques(ruta, min_ratings=50, tam_bloque=TAM_BLOQUE):
+    """Lee ratings_Electronics.csv en dos pasadas: matriz, popularidad, conteos y filas descartadas
+
+    La memoria pico queda acotada por el tamaño de bloque más la salida filtrada:
+    la segunda pasada solo guarda códigos enteros y ratings de los usuarios que
+    califican, directamente en los buffers de la matriz CSR.
+    """
+    counts, descartadas = contar_ratings_por_usuario(ruta, tam_bloque)
+    activos = pd.Index(np.sort(counts.index[counts >= min_ratings].to_numpy(dtype=str)))
+
+    filas, columnas, ratings = [], [], []
+    codigos_productos = {}
+    with warnings.catch_warnings():
+        # Las filas descartadas ya se contaron en la primera pasada
+        warnings.simplefilter('ignore', pd.errors.ParserWarning)
+        warnings.simplefilter('ignore', pd.errors.DtypeWarning)
+        for bloque, _ in _bloques(ruta, tam_bloque):
+            # Los ids se resuelven una vez por valor distinto del bloque, no por fila
+            codigos_usuario, usuarios = pd.factorize(bloque['user_id'])
+            fila_usuario = activos.get_indexer(usuarios)[codigos_usuario]
+            conservar = fila_usuario >= 0
+            if not conservar.any():
+                continue
+
+            # Solo se registran los productos calificados por usuarios que califican
+            codigos, productos = pd.factorize(bloque['prod_id'][conservar])
+            productos = productos.tolist()
+            for prod_id in productos:
+                codigos_productos.setdefault(prod_id, len(codigos_productos))
+            codigo_categoria = np.fromiter((codigos_productos[p] for p in productos), dtype=np.int32,
+                                           count=len(productos))
+
+            filas.append(fila_usuario[conservar].astype(np.int32))
+            columnas.append(codigo_categoria[codigos])
+            ratings.append(bloque['rating'].to_numpy()[conservar])
+
+    vacio = [np.empty(0, dtype=np.int32)]
+    matriz, popularidad = _construir_matriz(
+        np.concatenate(filas or vacio), np.concatenate(columnas or vacio),
+        np.concatenate(ratings or [np.empty(0, dtype=np.int8)]),
+        activos.to_numpy(dtype=str), np.array(list(codigos_productos), dtype=str)
+    )
+    return matriz, popularidad, counts, descartadas
+
+
+def _construir_matriz(filas, columnas, ratings, user_ids, prod_ids):
+    """Matriz y popularidad desde códigos; las columnas se reordenan por prod_id"""
+    # Productos en orden lexicográfico, como en la versión categórica
+    orden = np.argsort(prod_ids)
+    nueva_posicion = np.empty(len(orden), dtype=np.int32)
+    nueva_posicion[orden] = np.arange(len(orden), dtype=np.int32)
+    columnas = nueva_posicion[columnas]
+    prod_ids = prod_ids[orden]
+
+    # La popularidad cuenta todas las filas filtradas (incluye pares repetidos)
+    popularidad = calcular_popularidad(prod_ids, columnas, ratings)
+    # Importada aquí: las tablas relacionales se cargan sin traer scipy.sparse
+    from .matriz import MatrizRatings
+    matriz = MatrizRatings.desde_codigos(filas, columnas, ratings, user_ids, prod_ids)
+    return matriz, popularidad
+
+
+def calcular_popularidad(prod_ids, codigos_producto, ratings):
+    """Rating promedio y cantidad de ratings por producto a partir de los códigos de cada fila"""
+    count_rating = np.bincount(codigos_producto, minlength=len(prod_ids))
+    suma = np.bincount(codigos_producto, weights=ratings, minlength=len(prod_ids))
+    con_ratings = count_rating > 0
+    return pd.DataFrame({
+        'avg_rating': suma[con_ratings] / count_rating[con_ratings],
+        'rating_count': count_rating[con_ratings]
+    }, index=pd.Index(prod_ids[con_ratings], name='prod_id')).sort_values(by='avg_rating', ascending=False)
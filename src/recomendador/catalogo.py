@@ -0,0 +1,110 @@
+"""
+Catálogo de productos en formato columnar
+Cada atributo es un arreglo (nombre, marca, precio en centavos, imagen,
+reseñas); los prod_id viven en un DiccionarioIds y cada fila guarda su
+código int32. Para los llamadores existentes se comporta como el antiguo
+dict product_info y entrega la vista por producto bajo demanda
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from .diccionario import DiccionarioIds
+from .indice_busqueda import IndiceBusqueda
+
+PLACEHOLDER_IMAGEN = "https://via.placeholder.com/250x250?text=Sin+Imagen"
+
+
+class Catalogo(Mapping):
+    """Columnas del catálogo con acceso por prod_id"""
+
+    def __init__(self, prod_ids, nombres, marcas, precios_centavos, imagenes, reviews):
+        self.productos, self.codigos = DiccionarioIds.codificar(prod_ids)
+        self._fila_de_codigo = np.full(len(self.productos), -1, dtype=np.int32)
+        self._fila_de_codigo[self.codigos] = np.arange(len(self.codigos), dtype=np.int32)
+        self.nombres = np.asarray(nombres, dtype=object)
+        self.marcas = np.asarray(marcas, dtype=object)
+        self.precios_centavos = np.asarray(precios_centavos, dtype=np.int64)
+        self.imagenes = np.asarray(imagenes, dtype=object)
+        self.reviews = np.asarray(reviews, dtype=np.int64)
+        self._indice_busqueda = None
+
+    @classmethod
+    def desde_dataframe(cls, df_productos):
+        """Construye el catálogo desde db_productos sin iterar filas"""
+        imagenes = df_productos['imagen_url']
+        imagenes = imagenes.where(imagenes.notna() & (imagenes != ''), PLACEHOLDER_IMAGEN)
+
+        return cls(
+            df_productos['prod_id'].to_numpy(dtype=object),
+            df_productos['nombre_producto'].to_numpy(dtype=object),
+            df_productos['marca'].fillna('').to_numpy(dtype=object),
+            df_productos['precio'].to_numpy(),
+            imagenes.to_numpy(dtype=object),
+            df_productos['cantidad_resenas'].to_numpy(),
+        )
+
+    @property
+    def prod_ids(self):
+        """prod_id de cada fila como texto (solo para mostrar)"""
+        return self.productos.ids_texto(self.codigos)
+
+    @property
+    def precios(self):
+        """Precios en dólares"""
+        return self.precios_centavos / 100
+
+    @property
+    def indice_busqueda(self):
+        """Índice invertido de nombres y marcas, construido una vez por catálogo"""
+        if self._indice_busqueda is None:
+            self._indice_busqueda = IndiceBusqueda(self.nombres, self.marcas, self.reviews)
+        return self._indice_busqueda
+
+    def fila(self, prod_id):
+        """Posición del producto en las columnas, o -1 si no existe"""
+        codigo = self.productos.codigo(prod_id)
+        return int(self._fila_de_codigo[codigo]) if codigo >= 0 else -1
+
+    def filas(self, prod_ids):
+        """Versión vectorizada de fila()"""
+        codigos = self.productos.codigos(prod_ids)
+        return np.where(codigos >= 0, self._fila_de_codigo[codigos], -1)
+
+    def prod_id(self, fila):
+        return self.productos.id(self.codigos[fila])
+
+    def contiene(self, prod_ids):
+        """Máscara booleana de los prod_ids que existen en el catálogo"""
+        return self.filas(prod_ids) >= 0
+
+    def vista(self, fila):
+        """Dict por producto con las claves que usa la interfaz"""
+        return {
+            'nombre': self.nombres[fila],
+            'marca': self.marcas[fila],
+            'precio': self.precios_centavos[fila] / 100,
+            'imagen': self.imagenes[fila],
+            'reviews': self.reviews[fila],
+            'prod_id': self.prod_id(fila),
+        }
+
+    def __getitem__(self, prod_id):
+        fila = self.fila(prod_id)
+        if fila < 0:
+            raise KeyError(prod_id)
+        return self.vista(fila)
+
+    def __contains__(self, prod_id):
+        return self.fila(prod_id) >= 0
+
+    def __iter__(self):
+        return iter(self.prod_ids)
+
+    def items(self):
+        """(prod_id, vista) por posición, sin pasar por el diccionario"""
+        return ((self.prod_id(fila), self.vista(fila)) for fila in range(len(self)))
+
+    def __len__(self):
+        return len(self.codigos)
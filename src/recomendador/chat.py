@@ -0,0 +1,297 @@
+"""
+Asistente IA del chat: contexto de datos y llamadas a Groq
+El cliente de Groq se crea una vez por proceso y reutiliza sus conexiones
+HTTP; el texto de contexto se cachea por versión de los datos y se recuerda
+el último modelo que respondió. groq se importa con el primer mensaje, no al
+importar este módulo
+"""
+
+import threading
+
+from .metricas import contar_cache, medido
+
+# Modelos disponibles en Groq, en orden de preferencia
+MODELOS_GROQ = [
+    "llama-3.1-8b-instant",      # Modelo rápido y ligero
+    "llama-3.1-70b-versatile",   # Modelo más potente
+    "gemma-7b-it",                # Alternativa
+]
+
+MENSAJE_SISTEMA = "Eres un asistente de IA experto en e-commerce y análisis de datos. Responde de forma clara, concisa y útil."
+
+# Los clientes compartidos y el modelo vigente se leen y se cambian desde todas las sesiones
+_lock = threading.Lock()
+_clientes = {}
+_contexto_cacheado = (None, None)
+_modelo_vigente = None
+_NO_IMPORTADO = object()
+_clase_groq = _NO_IMPORTADO
+
+
+def clase_groq():
+    """La clase Groq, importada la primera vez que se pide (None si groq no está instalado)"""
+    global _clase_groq
+    if _clase_groq is _NO_IMPORTADO:
+        try:
+            from groq import Groq
+        except ImportError:
+            Groq = None
+        _clase_groq = Groq
+    return _clase_groq
+
+
+def obtener_cliente(api_key, base_url=None):
+    """Cliente de Groq compartido por el proceso (un pool de conexiones por API key)"""
+    clave = (api_key, base_url)
+    with _lock:
+        cliente = _clientes.get(clave)
+        if cliente is None:
+            cliente = clase_groq()(api_key=api_key, base_url=base_url)
+            _clientes[clave] = cliente
+        return cliente
+
+
+def contexto_cacheado(db_usuarios, db_productos, db_calificaciones, huella=None):
+    """Contexto de datos, reconstruido solo cuando cambia la versión de las tablas
+
+    huella: la de la versión de los datos (la de RecargaDatos); sin ella la
+    versión son las propias tablas (los objetos compartidos de solo lectura
+    cambian con cada recarga), sin recorrer sus filas.
+    """
+    global _contexto_cacheado
+    tablas = (db_usuarios, db_productos, db_calificaciones)
+    huella_guardada, contexto = _contexto_cacheado
+    if huella is None:
+        vigente = isinstance(huella_guardada, tuple) and all(a is b for a, b in zip(huella_guardada, tablas))
+        huella = tablas
+    else:
+        vigente = huella_guardada == huella
+
+    contar_cache('contexto_chat', vigente)
+    if not vigente:
+        contexto = obtener_contexto_datos(db_usuarios, db_productos, db_calificaciones)
+        _contexto_cacheado = (huella, contexto)
+    return contexto
+
+
+def modelos_en_orden():
+    """El último modelo que funcionó primero; luego el resto de la lista"""
+    with _lock:
+        vigente = _modelo_vigente
+    if vigente is None:
+        return list(MODELOS_GROQ)
+    return [vigente] + [m for m in MODELOS_GROQ if m != vigente]
+
+
+def _marcar_modelo(modelo, disponible):
+    """Registra el resultado de un modelo: el que responde pasa a vigente; uno retirado deja de serlo"""
+    global _modelo_vigente
+    with _lock:
+        if disponible:
+            _modelo_vigente = modelo
+        elif _modelo_vigente == modelo:
+            _modelo_vigente = None
+
+
+def _modelo_no_disponible(error):
+    mensaje = str(error).lower()
+    return "decommissioned" in mensaje or "not available" in mensaje
+
+
+def obtener_contexto_datos(db_usuarios, db_productos, db_calificaciones):
+    """Genera un contexto detallado de los datos para enviar a la IA"""
+
+    # Estadísticas generales
+    stats = {
+        'total_usuarios': len(db_usuarios),
+        'total_productos': len(db_productos),
+        'total_calificaciones': len(db_calificaciones),
+        'rating_promedio': db_calificaciones['calificacion'].mean(),
+        'precio_promedio': db_productos['precio'].mean() / 100,
+        'precio_min': db_productos['precio'].min() / 100,
+        'precio_max': db_productos['precio'].max() / 100,
+    }
+
+    # Productos más vendidos
+    top_productos = db_productos.nlargest(5, 'cantidad_resenas')[['prod_id', 'nombre_producto', 'cantidad_resenas']].to_dict('records')
+
+    # Usuarios más activos
+    usuarios_activos = db_usuarios[db_usuarios['total_calificaciones'] > 0].shape[0]
+
+    contexto = f"""
+Eres un **analista experto en e-commerce y estrategia comercial**, especializado en análisis de datos,
+comportamiento de clientes y optimización de catálogos de productos.
+
+A continuación se te proporciona un **resumen estadístico de la base de datos de un e-commerce**.
+Debes analizarla y generar **respuestas claras, estratégicas y basadas únicamente en los datos proporcionados**.
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+📊 CONTEXTO DE LA BASE DE DATOS
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+🔹 ESTADÍSTICAS GENERALES:
+- Total de Usuarios: {stats['total_usuarios']}
+- Usuarios Activos: {usuarios_activos}
+- Total de Productos: {stats['total_productos']}
+- Total de Calificaciones: {stats['total_calificaciones']}
+- Rating Promedio: {stats['rating_promedio']:.2f} / 5.0
+- Tasa de Conversión (reseñas/usuarios): {(stats['total_calificaciones']/stats['total_usuarios']*100):.1f} %
+
+🔹 ANÁLISIS DE PRECIOS:
+- Precio Promedio: ${stats['precio_promedio']:.2f}
+- Precio Mínimo: ${stats['precio_min']:.2f}
+- Precio Máximo: ${stats['precio_max']:.2f}
+
+🔹 PRODUCTOS MÁS POPULARES (por número de reseñas):
+{chr(10).join([f"- {p['nombre_producto']}: {p['cantidad_resenas']} reseñas" for p in top_productos])}
+
+🔹 PRODUCTOS DISPONIBLES EN EL CATÁLOGO:
+{', '.join(db_productos['nombre_producto'].head(20).tolist())} (y más…)
+
+🔹 DISTRIBUCIÓN POR CATEGORÍAS:
+- Pantalones: 5 productos
+- Camisas: 5 productos
+- Camisetas: 5 productos
+- Zapatos: 5 productos
+- Chaquetas: 4 productos
+- Accesorios: 21 productos
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+📌 INSTRUCCIONES DE ANÁLISIS
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+Utiliza **solo esta información** para:
+
+1️⃣ Detectar patrones relevantes de comportamiento del cliente  
+2️⃣ Identificar oportunidades comerciales y riesgos  
+3️⃣ Proponer mejoras en el catálogo y surtido de productos  
+4️⃣ Recomendar estrategias de ventas y marketing  
+5️⃣ Responder preguntas analíticas que se te formulen posteriormente  
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+🧠 FORMATO DE RESPUESTA
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+- Usa lenguaje claro y profesional
+- Organiza la respuesta con títulos y viñetas
+- Incluye recomendaciones accionables
+- Justifica cada sugerencia con los datos disponibles
+- No inventes métricas ni supongas información no incluida
+
+Si faltan datos para una conclusión, indícalo explícitamente.
+
+"""
+    return contexto
+
+
+
+def _crear_completion(client, mensaje_completo, **kwargs):
+    """Llama al primer modelo disponible (empezando por el vigente); None si ninguno responde"""
+    for modelo in modelos_en_orden():
+        try:
+            respuesta = client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": MENSAJE_SISTEMA
+                    },
+                    {
+                        "role": "user",
+                        "content": mensaje_completo
+                    }
+                ],
+                model=modelo,
+                max_tokens=1024,
+                temperature=0.7,
+                **kwargs
+            )
+            _marcar_modelo(modelo, True)
+            return respuesta
+        except Exception as e:
+            if _modelo_no_disponible(e):
+                _marcar_modelo(modelo, False)
+                continue  # Intentar con el siguiente modelo
+            else:
+                raise  # Si es otro error, lo pasamos arriba
+    return None
+
+
+def _mensaje_error(e):
+    error_msg = str(e)
+    if "api" in error_msg.lower() or "key" in error_msg.lower() or "401" in error_msg:
+        return "❌ Error de API Key: Verifica que tu API Key de Groq sea válida en `.streamlit/secrets.toml`"
+    else:
+        return f"❌ Error al conectar con Groq: {error_msg}\n\nIntenta nuevamente en un momento."
+
+
+def _mensaje_usuario(pregunta, db_usuarios, db_productos, db_calificaciones, huella):
+    contexto = contexto_cacheado(db_usuarios, db_productos, db_calificaciones, huella)
+    return f"{contexto}\n\nPREGUNTA DEL USUARIO: {pregunta}"
+
+
+@medido()
+def responder_con_groq(pregunta, db_usuarios, db_productos, db_calificaciones, api_key, base_url=None, huella=None):
+    """Genera respuestas inteligentes usando Groq API (IA de código abierto)
+
+    huella: versión de las tablas (ver contexto_cacheado).
+    """
+    try:
+        if clase_groq() is None:
+            return "❌ Error: Módulo groq no está instalado"
+
+        # Cliente compartido: reutiliza la conexión HTTP/TLS entre mensajes
+        client = obtener_cliente(api_key, base_url)
+        mensaje_completo = _mensaje_usuario(pregunta, db_usuarios, db_productos, db_calificaciones, huella)
+
+        chat_completion = _crear_completion(client, mensaje_completo)
+        if chat_completion is None:
+            return "❌ No hay modelos disponibles en Groq. Intenta más tarde."
+        return chat_completion.choices[0].message.content
+
+    except Exception as e:
+        return _mensaje_error(e)
+
+
+@medido()
+def responder_con_groq_stream(pregunta, db_usuarios, db_productos, db_calificaciones, api_key,
+                              base_url=None, al_terminar=None, huella=None):
+    """Como responder_con_groq, pero entrega el texto a medida que llegan los tokens
+
+    al_terminar(texto, completa) se llama siempre al cerrar el generador, también
+    cuando el consumidor lo abandona o el stream falla a mitad (completa=False);
+    la conexión del stream se cierra en ese momento.
+    """
+    partes = []
+    completa = False
+    stream = None
+    try:
+        if clase_groq() is None:
+            partes.append("❌ Error: Módulo groq no está instalado")
+            yield partes[-1]
+        else:
+            client = obtener_cliente(api_key, base_url)
+            mensaje_completo = _mensaje_usuario(pregunta, db_usuarios, db_productos, db_calificaciones, huella)
+
+            stream = _crear_completion(client, mensaje_completo, stream=True)
+            if stream is None:
+                partes.append("❌ No hay modelos disponibles en Groq. Intenta más tarde.")
+                yield partes[-1]
+            else:
+                for chunk in stream:
+                    texto = chunk.choices[0].delta.content if chunk.choices else None
+                    if texto:
+                        partes.append(texto)
+                        yield texto
+        completa = True
+
+    except Exception as e:
+        # Un error a mitad de la respuesta va aparte del texto parcial, que queda incompleto
+        completa = not partes
+        partes.append(_mensaje_error(e) if completa else f"\n\n{_mensaje_error(e)}")
+        yield partes[-1]
+
+    finally:
+        if stream is not None:
+            stream.close()
+        if al_terminar is not None:
+            al_terminar(''.join(partes), completa)
@@ -0,0 +1,235 @@
+"""
+Formato columnar en disco (Parquet) para las tablas de datos
+Cada tabla tiene un esquema tipado: ids categóricos, ratings int8 y precios
+int32. La conversión desde CSV cuenta las filas descartadas (líneas mal
+formadas o valores que no respetan el esquema) y las guarda en los metadatos
+del archivo, así cada carga las sigue reportando. Si no hay Parquet o el CSV
+es más nuevo, se lee el CSV con el mismo esquema
+"""
+
+import os
+import shutil
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Tipo por columna: 'texto' (object), 'categoria' o un dtype numérico entero
+TABLAS = {
+    'db_usuarios': {
+        'csv': 'db_usuarios.csv', 'sep': ';', 'encabezado': True,
+        'columnas': {'user_id': 'texto', 'nombre_usuario': 'texto', 'total_calificaciones': 'int32'},
+    },
+    'db_productos': {
+        'csv': 'db_productos.csv', 'sep': ';', 'encabezado': True,
+        'columnas': {'prod_id': 'texto', 'nombre_producto': 'texto', 'marca': 'texto', 'precio': 'int32',
+                     'imagen_url': 'texto', 'cantidad_resenas': 'int32', 'categoria': 'categoria'},
+    },
+    'db_calificaciones_completo': {
+        'csv': 'db_calificaciones_completo.csv', 'sep': ',', 'encabezado': True,
+        'columnas': {'user_id': 'categoria', 'prod_id': 'categoria', 'calificacion': 'int8', 'fecha': 'categoria'},
+    },
+    'ratings_Electronics': {
+        'csv': 'ratings_Electronics.csv', 'sep': ',', 'encabezado': False,
+        'columnas': {'user_id': 'categoria', 'prod_id': 'categoria', 'rating': 'int8', 'timestamp': 'int64'},
+    },
+}
+
+# Columnas sin las cuales la fila no sirve
+OBLIGATORIAS = {
+    'db_usuarios': ['user_id'],
+    'db_productos': ['prod_id', 'nombre_producto'],
+    'db_calificaciones_completo': ['user_id', 'prod_id'],
+    'ratings_Electronics': ['user_id', 'prod_id'],
+}
+
+CLAVE_DESCARTADAS = b'recomendador.filas_descartadas'
+TAM_BLOQUE_CONVERSION = 1_000_000
+
+
+def ruta_columnar(directorio, tabla):
+    return Path(directorio) / f'{tabla}.parquet'
+
+
+def columnar_vigente(directorio, tabla):
+    """True si el Parquet de la tabla existe, se puede leer y no es más viejo que el CSV"""
+    parquet = ruta_columnar(directorio, tabla)
+    if not parquet.exists():
+        return False
+    csv = Path(directorio) / TABLAS[tabla]['csv']
+    return not csv.exists() or parquet.stat().st_mtime >= csv.stat().st_mtime
+
+
+def tipar(df, tabla, categorias=True):
+    """Aplica el esquema de la tabla; devuelve (df tipado, filas que no lo cumplen)"""
+    esquema = TABLAS[tabla]['columnas']
+    validas = np.ones(len(df), dtype=bool)
+    for col in df.columns:
+        if esquema[col] not in ('texto', 'categoria'):
+            numeros = pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+            validas &= ~np.isnan(numeros) & (numeros % 1 == 0)
+            df[col] = numeros
+    for col in OBLIGATORIAS[tabla]:
+        if col in df.columns:
+            validas &= df[col].notna().to_numpy()
+
+    descartadas = int(len(df) - validas.sum())
+    if descartadas:
+        df = df[validas]
+    for col in df.columns:
+        tipo = esquema[col]
+        if tipo == 'categoria' and categorias:
+            df[col] = df[col].astype('category')
+        elif tipo not in ('texto', 'categoria'):
+            df[col] = df[col].astype(tipo)
+    return df.reset_index(drop=True), descartadas
+
+
+def _opciones_csv(tabla):
+    esquema = TABLAS[tabla]
+    # El texto se lee como object (sin conversión por celda al armar el catálogo); los
+    # números se infieren y tipar() descarta los que no encajan en el esquema.
+    # Sin usecols, porque con él pandas no detecta las líneas con campos de más
+    texto = [col for col, tipo in esquema['columnas'].items() if tipo in ('texto', 'categoria')]
+    opciones = dict(sep=esquema['sep'], dtype={col: object for col in texto}, on_bad_lines='warn')
+    if esquema['encabezado']:
+        opciones['header'] = 0
+    else:
+        opciones.update(header=None, names=list(esquema['columnas']))
+    return opciones
+
+
+def contar_lineas_omitidas(avisos):
+    """Líneas mal formadas reportadas por pandas con on_bad_lines='warn'"""
+    return sum(str(aviso.message).count('Skipping line') for aviso in avisos)
+
+
+def _verificar_columnas(presentes, columnas, ruta):
+    """ValueError que nombra las columnas del esquema que faltan en el encabezado del CSV"""
+    faltan = [col for col in columnas if col not in presentes]
+    if faltan:
+        raise ValueError(f"{Path(ruta).name}: faltan columnas del esquema: {', '.join(faltan)}")
+
+
+def leer_csv_tipado(directorio, tabla, columnas=None):
+    """Lee el CSV de la tabla con su esquema; devuelve (df, filas descartadas)"""
+    columnas = list(columnas or TABLAS[tabla]['columnas'])
+    ruta = Path(directorio) / TABLAS[tabla]['csv']
+    with warnings.catch_warnings(record=True) as avisos:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        warnings.simplefilter('ignore', pd.errors.DtypeWarning)  # tipar() cuenta los valores inválidos
+        df = pd.read_csv(ruta, **_opciones_csv(tabla))
+    _verificar_columnas(df.columns, columnas, ruta)
+    df, invalidas = tipar(df[columnas], tabla)
+    return df, invalidas + contar_lineas_omitidas(avisos)
+
+
+def leer_tabla(directorio, tabla, columnas=None):
+    """Lee solo las columnas pedidas, desde Parquet si está vigente o si no desde el CSV
+
+    Devuelve (df, filas descartadas al convertir o al leer el CSV).
+    """
+    if not columnar_vigente(directorio, tabla):
+        return leer_csv_tipado(directorio, tabla, columnas)
+
+    columnas = list(columnas or TABLAS[tabla]['columnas'])
+    archivo = pq.ParquetFile(ruta_columnar(directorio, tabla), read_dictionary=_columnas_categoria(tabla, columnas))
+    descartadas = int((archivo.metadata.metadata or {}).get(CLAVE_DESCARTADAS, b'0'))
+    df = archivo.read(columns=columnas).to_pandas()
+
+    # Mismos dtypes que la lectura del CSV: texto como object
+    texto = [col for col in columnas if TABLAS[tabla]['columnas'][col] == 'texto']
+    return df.astype({col: object for col in texto}), descartadas
+
+
+def convertir_tabla(directorio, tabla, tam_bloque=TAM_BLOQUE_CONVERSION):
+    """Escribe <tabla>.parquet junto al CSV; devuelve (filas escritas, filas descartadas)"""
+    esquema = _esquema_arrow(tabla)
+    ruta = Path(directorio) / TABLAS[tabla]['csv']
+    destino = ruta_columnar(directorio, tabla)
+    temporal = destino.with_name(destino.name + '.tmp')
+    filas = descartadas = 0
+    # Antes de abrir el Parquet: sin una columna del esquema no se escribe nada
+    _verificar_columnas(pd.read_csv(ruta, nrows=0, **_opciones_csv(tabla)).columns, esquema.names, ruta)
+
+    # Por bloques: la conversión no necesita el CSV completo en memoria. Las
+    # categorías se escriben como texto (Parquet las codifica por diccionario) y
+    # se vuelven categoría al leer
+    with warnings.catch_warnings(record=True) as avisos, pq.ParquetWriter(temporal, esquema) as escritor:
+        warnings.simplefilter('always', pd.errors.ParserWarning)
+        warnings.simplefilter('ignore', pd.errors.DtypeWarning)  # tipar() cuenta los valores inválidos
+        for bloque in pd.read_csv(ruta, chunksize=tam_bloque, **_opciones_csv(tabla)):
+            bloque, invalidas = tipar(bloque[esquema.names], tabla, categorias=False)
+            descartadas += invalidas
+            filas += len(bloque)
+            escritor.write_table(pa.Table.from_pandas(bloque, schema=esquema, preserve_index=False))
+        descartadas += contar_lineas_omitidas(avisos)
+        escritor.add_key_value_metadata({CLAVE_DESCARTADAS: str(descartadas).encode()})
+
+    temporal.replace(destino)
+    return filas, descartadas
+
+
+def anexar_tabla(directorio, tabla, df):
+    """Copias temporales del CSV y del Parquet (si está vigente) de la tabla con las filas de df al final
+
+    Devuelve [(temporal, destino)]; las tablas no cambian hasta reemplazar
+    cada destino por su temporal, en ese orden (el Parquet queda más nuevo
+    que el CSV y sigue vigente). Sin CSV ni Parquet devuelve [].
+    """
+    esquema = TABLAS[tabla]
+    df, _ = tipar(df[list(esquema['columnas'])].copy(), tabla, categorias=False)
+    csv = Path(directorio) / esquema['csv']
+    parquet = ruta_columnar(directorio, tabla)
+    vigente = columnar_vigente(directorio, tabla)
+    reemplazos = []
+
+    if csv.exists():
+        temporal = csv.with_name(csv.name + '.tmp')
+        shutil.copyfile(csv, temporal)
+        with open(temporal, 'rb+') as archivo:
+            # Si la última línea no termina en salto, las filas nuevas no se pegan a ella
+            if archivo.seek(0, os.SEEK_END):
+                archivo.seek(-1, os.SEEK_END)
+                if archivo.read(1) != b'\n':
+                    archivo.write(b'\n')
+            archivo.write(df.to_csv(header=False, index=False, sep=esquema['sep']).encode())
+        reemplazos.append((temporal, csv))
+
+    if vigente:
+        # Se reescribe por lotes de filas: Parquet no admite agregar al final
+        temporal = parquet.with_name(parquet.name + '.tmp')
+        original = pq.ParquetFile(parquet)
+        with pq.ParquetWriter(temporal, _esquema_arrow(tabla)) as escritor:
+            for lote in original.iter_batches(batch_size=TAM_BLOQUE_CONVERSION):
+                escritor.write_batch(lote)
+            escritor.write_table(pa.Table.from_pandas(df, schema=_esquema_arrow(tabla), preserve_index=False))
+            escritor.add_key_value_metadata(
+                {CLAVE_DESCARTADAS: (original.metadata.metadata or {}).get(CLAVE_DESCARTADAS, b'0')}
+            )
+        reemplazos.append((temporal, parquet))
+    return reemplazos
+
+
+def convertir_directorio(directorio, tablas=None, tam_bloque=TAM_BLOQUE_CONVERSION):
+    """Convierte las tablas cuyo CSV existe; devuelve {tabla: (filas, descartadas)}"""
+    return {
+        tabla: convertir_tabla(directorio, tabla, tam_bloque=tam_bloque)
+        for tabla in tablas or TABLAS
+        if (Path(directorio) / TABLAS[tabla]['csv']).exists()
+    }
+
+
+def _columnas_categoria(tabla, columnas):
+    return [col for col in columnas if TABLAS[tabla]['columnas'][col] == 'categoria']
+
+
+def _esquema_arrow(tabla):
+    tipos = {'texto': pa.string(), 'categoria': pa.string()}
+    return pa.schema([
+        (col, tipos[tipo] if tipo in tipos else pa.from_numpy_dtype(np.dtype(tipo)))
+        for col, tipo in TABLAS[tabla]['columnas'].items()
+    ])
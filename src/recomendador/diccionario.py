@@ -0,0 +1,186 @@
+"""
+Diccionarios de ids de usuarios y productos con códigos int32 densos
+Cada diccionario guarda los ids una sola vez, ordenados y en un arreglo
+compacto (bytes de ancho fijo si son ASCII); el código de un id es su
+posición y se resuelve por búsqueda binaria, sin hashear strings. El
+catálogo, las tablas y la matriz de ratings se cruzan por esos códigos y el
+texto solo se decodifica en el borde de la interfaz
+"""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+
+def _compactar(ids):
+    """Arreglo de ids como bytes de ancho fijo (o unicode si alguno no es ASCII)"""
+    ids = np.asarray(ids)
+    if ids.dtype.kind == 'S':
+        return ids
+    if ids.dtype.kind == 'O':
+        ids = ids.astype(str)
+    try:
+        return ids.astype(np.bytes_)
+    except UnicodeEncodeError:
+        return ids
+
+
+class DiccionarioIds(Mapping):
+    """id → código int32 (posición en el arreglo ordenado de ids) y código → id"""
+
+    def __init__(self, ids):
+        """ids ya ordenados y sin repetidos"""
+        self.ids = _compactar(ids)
+
+    @classmethod
+    def desde_valores(cls, valores):
+        """Diccionario con los valores distintos de un arreglo cualquiera"""
+        return cls(np.unique(_compactar(valores)))
+
+    @classmethod
+    def codificar(cls, valores):
+        """Diccionario de los valores y el código de cada uno, en una sola pasada"""
+        ids, codigos = np.unique(_compactar(valores), return_inverse=True)
+        return cls(ids), codigos.astype(np.int32)
+
+    @classmethod
+    def unir(cls, *diccionarios):
+        """Diccionario que cubre a todos; si uno ya contiene a los demás se reutiliza tal cual"""
+        mayor = max(diccionarios, key=len)
+        if all(d is mayor or (mayor.codigos(d.ids) >= 0).all() for d in diccionarios):
+            return mayor
+        partes = [d.ids for d in diccionarios]
+        if any(p.dtype.kind == 'U' for p in partes):
+            partes = [p.astype(str) for p in partes]
+        return cls(np.unique(np.concatenate(partes)))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        return iter(self.ids_texto())
+
+    def __contains__(self, id_):
+        return self.codigo(id_) >= 0
+
+    def __getitem__(self, id_):
+        codigo = self.codigo(id_)
+        if codigo < 0:
+            raise KeyError(id_)
+        return codigo
+
+    def get(self, id_, default=None):
+        codigo = self.codigo(id_)
+        return default if codigo < 0 else codigo
+
+    @property
+    def nbytes(self):
+        return self.ids.nbytes
+
+    def codigo(self, id_):
+        """Código del id, o -1 si no está"""
+        return int(self.codigos([id_])[0]) if len(self.ids) else -1
+
+    def codigos(self, ids):
+        """Versión vectorizada de codigo(): int32 con -1 para los ids ausentes"""
+        if len(self.ids) == 0:
+            return np.full(len(ids), -1, dtype=np.int32)
+        try:
+            buscados = self._mismo_tipo(ids)
+        except (TypeError, ValueError):
+            return np.full(len(ids), -1, dtype=np.int32)
+        pos = np.searchsorted(self.ids, buscados)
+        pos_validas = np.minimum(pos, len(self.ids) - 1)
+        encontrados = (pos < len(self.ids)) & (self.ids[pos_validas] == buscados)
+        return np.where(encontrados, pos, -1).astype(np.int32)
+
+    def id(self, codigo):
+        """Texto del id de un código"""
+        id_ = self.ids[codigo]
+        return id_.decode() if isinstance(id_, bytes) else str(id_)
+
+    def ids_texto(self, codigos=None):
+        """Ids como str (arreglo object) para mostrar; todos o solo los de los códigos dados"""
+        ids = self.ids if codigos is None else self.ids[codigos]
+        if ids.dtype.kind == 'S':
+            ids = np.char.decode(ids)
+        return ids.astype(object)
+
+    def _mismo_tipo(self, ids):
+        ids = np.asarray(ids)
+        if self.ids.dtype.kind == 'S' and ids.dtype.kind != 'S':
+            try:
+                return _compactar(ids).astype(np.bytes_)
+            except UnicodeEncodeError:
+                # Un id no ASCII no puede estar en un diccionario de bytes
+                return np.array([str(i).encode() for i in ids])
+        if self.ids.dtype.kind == 'U' and ids.dtype.kind == 'S':
+            return np.char.decode(ids)
+        return ids
+
+
+class NombresUsuarios(Mapping):
+    """user_id → nombre respaldado por un diccionario de ids y un arreglo alineado a sus códigos"""
+
+    def __init__(self, user_ids, nombres):
+        self.usuarios, codigos = DiccionarioIds.codificar(user_ids)
+        self.nombres = np.full(len(self.usuarios), None, dtype=object)
+        self.nombres[codigos] = np.asarray(nombres, dtype=object)
+
+    def __len__(self):
+        return len(self.usuarios)
+
+    def __iter__(self):
+        return iter(self.usuarios)
+
+    def __getitem__(self, user_id):
+        return self.nombres[self.usuarios[user_id]]
+
+
+class Diccionarios:
+    """Un diccionario por entidad compartido por tablas, catálogo y matriz de ratings
+
+    Guarda además las traducciones int32 entre los códigos compartidos y las
+    posiciones de cada estructura, de modo que los cruces son indexación de
+    arreglos.
+    """
+
+    def __init__(self, catalogo, matriz, nombres_usuarios=None):
+        # Usuarios: los de db_usuarios y las filas de la matriz
+        usuarios_tabla = nombres_usuarios.usuarios if nombres_usuarios is not None else DiccionarioIds([])
+        self.usuarios = DiccionarioIds.unir(usuarios_tabla, matriz.usuarios)
+        self.usuario_de_fila = self._traducir(self.usuarios, matriz.usuarios)
+        self.fila_de_usuario = self._inversa(self.usuario_de_fila, len(self.usuarios))
+
+        self.nombres = np.full(len(self.usuarios), None, dtype=object)
+        if nombres_usuarios is not None:
+            self.nombres[self._traducir(self.usuarios, usuarios_tabla)] = nombres_usuarios.nombres
+
+        # Productos: los del catálogo y las columnas de la matriz
+        self.productos = DiccionarioIds.unir(catalogo.productos, matriz.productos)
+        self.producto_de_columna = self._traducir(self.productos, matriz.productos)
+        self.columna_de_producto = self._inversa(self.producto_de_columna, len(self.productos))
+        self.producto_de_fila_catalogo = self._traducir(self.productos, catalogo.productos)[catalogo.codigos]
+        self.fila_catalogo = self._inversa(self.producto_de_fila_catalogo, len(self.productos))
+
+    @staticmethod
+    def _traducir(compartido, propio):
+        """Código compartido de cada código propio (identidad si es el mismo diccionario)"""
+        if compartido is propio:
+            return np.arange(len(propio), dtype=np.int32)
+        return compartido.codigos(propio.ids)
+
+    @staticmethod
+    def _inversa(codigos, n):
+        inversa = np.full(n, -1, dtype=np.int32)
+        inversa[codigos] = np.arange(len(codigos), dtype=np.int32)
+        return inversa
+
+    def nombre_usuario(self, fila):
+        """Nombre para mostrar del usuario de una fila de la matriz (su id si no tiene nombre)"""
+        codigo = self.usuario_de_fila[fila]
+        return self.nombres[codigo] or self.usuarios.id(codigo)
+
+    def columnas_en_catalogo(self):
+        """Máscara de columnas de la matriz cuyo producto existe en el catálogo"""
+        return self.fila_catalogo[self.producto_de_columna] >= 0
@@ -0,0 +1,348 @@
+"""
+Registro de calificaciones nuevas y agregados incrementales
+Una calificación nueva no reescribe las tablas: se agrega al final de
+eventos_calificaciones.csv (el esquema de db_calificaciones_completo.csv) y
+cada proceso lee el registro desde la posición hasta donde ya lo leyó. Los
+agregados (suma y cantidad de ratings por producto, ratings por usuario y
+usuarios con al menos min_ratings) parten de lo que calculó la carga completa
+y se actualizan con cada evento, sin volver a recorrer los ratings.
+compactar() pliega el registro en las tablas base (CSV y Parquet) y lo
+vacía; la recarga en caliente toma la versión nueva, que ya los incluye
+"""
+
+import io
+import os
+import threading
+from collections import namedtuple
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .columnar import TABLAS, anexar_tabla, tipar
+from .diccionario import DiccionarioIds
+
+ARCHIVO_EVENTOS = 'eventos_calificaciones.csv'
+TABLA_EVENTOS = 'db_calificaciones_completo'
+COLUMNAS_EVENTOS = list(TABLAS[TABLA_EVENTOS]['columnas'])
+SUFIJO_COMPACTANDO = '.compactando'
+
+# Identidad del archivo leído (dispositivo, inodo) y bytes ya procesados
+Cursor = namedtuple('Cursor', ['archivo', 'posicion'])
+
+
+# ============================================================================
+# REGISTRO DE EVENTOS
+# ============================================================================
+
+class RegistroEventos:
+    """Archivo de calificaciones solo de agregado, compartido por procesos"""
+
+    def __init__(self, directorio):
+        self.ruta = Path(directorio) / ARCHIVO_EVENTOS
+
+    def agregar(self, user_id, prod_id, calificacion, fecha=None):
+        """Agrega una calificación (fecha: hoy si no se indica)"""
+        self.agregar_lote([(user_id, prod_id, calificacion, fecha)])
+
+    def agregar_lote(self, eventos):
+        """Agrega (user_id, prod_id, calificacion, fecha) en una sola escritura
+
+        El archivo se abre con O_APPEND y todas las líneas van en un solo
+        write(): dos procesos que agregan a la vez no intercalan sus líneas.
+        """
+        datos = ''.join(_linea(*evento) for evento in eventos).encode()
+        if not datos:
+            return
+        try:
+            # Quien crea el archivo escribe el encabezado antes que cualquier evento
+            descriptor = os.open(self.ruta, os.O_WRONLY | os.O_CREAT | os.O_EXCL)
+        except FileExistsError:
+            pass
+        else:
+            try:
+                os.write(descriptor, (','.join(COLUMNAS_EVENTOS) + '\n').encode())
+            finally:
+                os.close(descriptor)
+        descriptor = os.open(self.ruta, os.O_WRONLY | os.O_APPEND)
+        try:
+            os.write(descriptor, datos)
+        finally:
+            os.close(descriptor)
+
+    def leer_nuevos(self, cursor=None):
+        """Eventos agregados desde el cursor: (df, cursor nuevo, filas descartadas)
+
+        Si el archivo fue reemplazado (compactación) se lee el nuevo desde el
+        principio. Una línea todavía incompleta queda para la próxima lectura.
+        """
+        return leer_eventos(self.ruta, cursor)
+
+
+def leer_eventos(ruta, cursor=None):
+    """(df con el esquema del registro, cursor, filas descartadas) desde la posición del cursor"""
+    try:
+        with open(ruta, 'rb') as archivo:
+            stat = os.fstat(archivo.fileno())
+            identidad = (stat.st_dev, stat.st_ino)
+            posicion = cursor.posicion if cursor is not None and cursor.archivo == identidad else 0
+            if posicion > stat.st_size:
+                posicion = 0
+            archivo.seek(posicion)
+            datos = archivo.read()
+    except FileNotFoundError:
+        return _eventos_vacios(), Cursor(None, 0), 0
+
+    completos = datos[:datos.rfind(b'\n') + 1]
+    cursor = Cursor(identidad, posicion + len(completos))
+    if posicion == 0:
+        # El encabezado no es un evento
+        completos = completos[completos.find(b'\n') + 1:]
+    if not completos:
+        return _eventos_vacios(), cursor, 0
+
+    df = pd.read_csv(io.BytesIO(completos), header=None, names=COLUMNAS_EVENTOS, sep=',',
+                     dtype={'user_id': object, 'prod_id': object, 'fecha': object}, on_bad_lines='skip')
+    df, _ = tipar(df, TABLA_EVENTOS, categorias=False)
+    return df, cursor, completos.count(b'\n') - len(df)
+
+
+def _linea(user_id, prod_id, calificacion, fecha=None):
+    campos = [str(user_id), str(prod_id), str(fecha or date.today().isoformat())]
+    if any(not campo or ',' in campo or '\n' in campo for campo in campos):
+        raise ValueError(f"Evento inválido: {campos}")
+    if int(calificacion) != calificacion or not 1 <= calificacion <= 5:
+        raise ValueError(f"Calificación fuera de 1..5: {calificacion}")
+    return f'{campos[0]},{campos[1]},{int(calificacion)},{campos[2]}\n'
+
+
+def _eventos_vacios():
+    return pd.DataFrame({
+        'user_id': pd.Series(dtype=object), 'prod_id': pd.Series(dtype=object),
+        'calificacion': pd.Series(dtype=np.int8), 'fecha': pd.Series(dtype=object),
+    })
+
+
+# ============================================================================
+# AGREGADOS INCREMENTALES
+# ============================================================================
+
+class AgregadosRatings:
+    """Suma y cantidad de ratings por producto y ratings por usuario, actualizados evento a evento
+
+    Como en la carga, la popularidad solo cuenta ratings de usuarios con al
+    menos min_ratings. Un usuario que llega al umbral cuenta desde ese evento:
+    sus ratings anteriores entran con la próxima carga completa. Los ids que
+    no estaban en la carga van a un dict aparte (los de la carga siguen en
+    arreglos alineados a su diccionario).
+    """
+
+    def __init__(self, prod_ids, suma, cuenta, user_ids, cuenta_usuario, min_ratings=50):
+        self.min_ratings = min_ratings
+        self._productos, codigos = DiccionarioIds.codificar(prod_ids)
+        self._suma = np.zeros(len(self._productos))
+        self._cuenta = np.zeros(len(self._productos), dtype=np.int64)
+        np.add.at(self._suma, codigos, np.asarray(suma, dtype=np.float64))
+        np.add.at(self._cuenta, codigos, np.asarray(cuenta, dtype=np.int64))
+        self._usuarios, codigos = DiccionarioIds.codificar(user_ids)
+        self._cuenta_usuario = np.zeros(len(self._usuarios), dtype=np.int64)
+        np.add.at(self._cuenta_usuario, codigos, np.asarray(cuenta_usuario, dtype=np.int64))
+        self._productos_nuevos = {}
+        self._usuarios_nuevos = {}
+
+        self.elegibles = int(np.count_nonzero(self._cuenta_usuario >= min_ratings))
+        self.nuevos_elegibles = []
+        self.eventos = 0
+        self.descartadas = 0
+        self._cursor = None
+        self._candado = threading.Lock()
+        self._popularidad = self._counts = None
+
+    @classmethod
+    def desde_carga(cls, popularidad, counts, min_ratings=50):
+        """Desde la popularidad y los conteos por usuario de leer_ratings()"""
+        return cls(popularidad.index.to_numpy(), popularidad['avg_rating'] * popularidad['rating_count'],
+                   popularidad['rating_count'], counts.index.to_numpy(), counts.to_numpy(), min_ratings)
+
+    @classmethod
+    def desde_matriz(cls, matriz, popularidad, min_ratings=50):
+        """Desde artefactos: los usuarios son las filas de la matriz (los bajo el umbral arrancan en 0)"""
+        cuenta_usuario = np.diff(matriz.matriz.indptr)
+        return cls(popularidad.index.to_numpy(), popularidad['avg_rating'] * popularidad['rating_count'],
+                   popularidad['rating_count'], matriz.usuarios.ids, cuenta_usuario, min_ratings)
+
+    def aplicar(self, user_id, prod_id, rating):
+        """Aplica un evento: dos búsquedas en los diccionarios y unas sumas"""
+        with self._candado:
+            codigo = self._usuarios.codigo(user_id)
+            if codigo >= 0:
+                self._cuenta_usuario[codigo] += 1
+                cuenta = int(self._cuenta_usuario[codigo])
+            else:
+                cuenta = self._usuarios_nuevos.get(user_id, (0,))[0] + 1
+                self._usuarios_nuevos[user_id] = (cuenta,)
+            if cuenta == self.min_ratings:
+                self.elegibles += 1
+                self.nuevos_elegibles.append(user_id)
+            if cuenta >= self.min_ratings:
+                codigo = self._productos.codigo(prod_id)
+                if codigo >= 0:
+                    self._suma[codigo] += rating
+                    self._cuenta[codigo] += 1
+                else:
+                    suma, cuenta = self._productos_nuevos.get(prod_id, (0.0, 0))
+                    self._productos_nuevos[prod_id] = (suma + rating, cuenta + 1)
+            self.eventos += 1
+
+    def aplicar_lote(self, user_ids, prod_ids, ratings):
+        """Aplica los eventos en orden, vectorizado; el costo depende del lote, no de los ratings ya cargados"""
+        with self._candado:
+            self._aplicar(np.asarray(user_ids, dtype=object), np.asarray(prod_ids, dtype=object),
+                          np.asarray(ratings, dtype=np.float64))
+
+    def actualizar(self, registro):
+        """Aplica los eventos del registro que todavía no se leyeron; devuelve cuántos"""
+        with self._candado:
+            df, self._cursor, descartadas = registro.leer_nuevos(self._cursor)
+            self.descartadas += descartadas
+            if len(df):
+                self._aplicar(df['user_id'].to_numpy(dtype=object), df['prod_id'].to_numpy(dtype=object),
+                              df['calificacion'].to_numpy(dtype=np.float64))
+        return len(df)
+
+    def _aplicar(self, user_ids, prod_ids, ratings):
+        if not len(user_ids):
+            return
+        # Ratings de cada usuario justo después de cada evento del lote
+        codigos, usuarios = pd.factorize(user_ids)
+        previas = self._leer(self._usuarios, self._cuenta_usuario, self._usuarios_nuevos, usuarios)
+        acumuladas = previas[codigos] + pd.Series(codigos).groupby(codigos).cumcount().to_numpy() + 1
+        totales = np.bincount(codigos, minlength=len(usuarios))
+        self._sumar(self._usuarios, [self._cuenta_usuario], self._usuarios_nuevos, usuarios, [totales])
+
+        # Cada usuario llega al umbral en un solo evento del lote, a lo sumo
+        llegan = user_ids[acumuladas == self.min_ratings]
+        self.elegibles += len(llegan)
+        self.nuevos_elegibles.extend(llegan.tolist())
+
+        cuentan = acumuladas >= self.min_ratings
+        codigos, productos = pd.factorize(prod_ids[cuentan])
+        self._sumar(self._productos, [self._suma, self._cuenta], self._productos_nuevos, productos, [
+            np.bincount(codigos, weights=ratings[cuentan], minlength=len(productos)),
+            np.bincount(codigos, minlength=len(productos)),
+        ])
+        self.eventos += len(user_ids)
+
+    @staticmethod
+    def _leer(diccionario, valores, nuevos, ids):
+        codigos = diccionario.codigos(ids)
+        leidos = valores[np.maximum(codigos, 0)] if len(valores) else np.zeros(len(ids), dtype=valores.dtype)
+        for i in np.flatnonzero(codigos < 0):
+            leidos[i] = nuevos.get(ids[i], (0,))[0]
+        return leidos
+
+    @staticmethod
+    def _sumar(diccionario, arreglos, nuevos, ids, incrementos):
+        """Suma cada incremento a su arreglo (ids distintos entre sí); los ids ausentes, al dict como tupla"""
+        codigos = diccionario.codigos(ids)
+        conocidos = codigos >= 0
+        for arreglo, incremento in zip(arreglos, incrementos):
+            arreglo[codigos[conocidos]] += incremento[conocidos]
+        for i in np.flatnonzero(~conocidos):
+            previos = nuevos.get(ids[i], (0,) * len(arreglos))
+            nuevos[ids[i]] = tuple(previo + incremento[i] for previo, incremento in zip(previos, incrementos))
+
+    # ========================================================================
+    # CONSULTAS
+    # ========================================================================
+
+    def producto(self, prod_id):
+        """(rating promedio, cantidad de ratings) vigentes de un producto"""
+        with self._candado:
+            codigo = self._productos.codigo(prod_id)
+            suma, cuenta = ((self._suma[codigo], self._cuenta[codigo]) if codigo >= 0
+                            else self._productos_nuevos.get(prod_id, (0.0, 0)))
+        return (float(suma / cuenta) if cuenta else 0.0), int(cuenta)
+
+    def ratings_usuario(self, user_id):
+        with self._candado:
+            return int(self._leer(self._usuarios, self._cuenta_usuario, self._usuarios_nuevos,
+                                  np.array([user_id], dtype=object))[0])
+
+    def popularidad(self):
+        """DataFrame como el de calcular_popularidad (se rearma solo si llegaron eventos)"""
+        with self._candado:
+            if self._popularidad is None or self._popularidad[0] != self.eventos:
+                nuevos = list(self._productos_nuevos.items())
+                prod_ids = np.concatenate([self._productos.ids_texto(), np.array([p for p, _ in nuevos], dtype=object)])
+                suma = np.concatenate([self._suma, [s for _, (s, _) in nuevos]])
+                cuenta = np.concatenate([self._cuenta, np.array([c for _, (_, c) in nuevos], dtype=np.int64)])
+                con_ratings = cuenta > 0
+                popularidad = pd.DataFrame({
+                    'avg_rating': suma[con_ratings] / cuenta[con_ratings],
+                    'rating_count': cuenta[con_ratings]
+                }, index=pd.Index(prod_ids[con_ratings], name='prod_id')).sort_values(by='avg_rating', ascending=False)
+                self._popularidad = (self.eventos, popularidad)
+            return self._popularidad[1]
+
+    def counts(self):
+        """Ratings por usuario, de mayor a menor (como los conteos de la carga)"""
+        with self._candado:
+            if self._counts is None or self._counts[0] != self.eventos:
+                user_ids = np.concatenate([self._usuarios.ids_texto(), np.array(list(self._usuarios_nuevos), dtype=object)])
+                cuentas = np.concatenate([self._cuenta_usuario,
+                                          np.fromiter((c for c, in self._usuarios_nuevos.values()), dtype=np.int64)])
+                counts = pd.Series(cuentas, index=user_ids, name='count')
+                self._counts = (self.eventos, counts[counts > 0].sort_values(ascending=False))
+            return self._counts[1]
+
+
+# ============================================================================
+# COMPACTACIÓN
+# ============================================================================
+
+def compactar(directorio):
+    """Pliega el registro en db_calificaciones_completo y ratings_Electronics y lo vacía
+
+    El registro se renombra a .compactando antes de leerlo (los eventos que
+    llegan mientras tanto van a un registro nuevo). Las tablas se escriben en
+    temporales y se reemplazan juntas al final; si algo falla antes, las
+    tablas quedan como estaban y el .compactando se retoma en la próxima
+    compactación. Devuelve {tabla: filas agregadas}.
+    """
+    ruta = Path(directorio) / ARCHIVO_EVENTOS
+    pendiente = ruta.with_name(ruta.name + SUFIJO_COMPACTANDO)
+    if not pendiente.exists():
+        try:
+            ruta.rename(pendiente)
+        except FileNotFoundError:
+            return {}
+
+    eventos, _, _ = leer_eventos(pendiente)
+    por_tabla = {TABLA_EVENTOS: eventos, 'ratings_Electronics': a_ratings(eventos)}
+    reemplazos, agregadas = [], {}
+    try:
+        for tabla, filas in por_tabla.items():
+            cambios = anexar_tabla(directorio, tabla, filas) if len(filas) else []
+            reemplazos.extend(cambios)
+            if cambios:
+                agregadas[tabla] = len(filas)
+    except BaseException:
+        for temporal, _ in reemplazos:
+            temporal.unlink(missing_ok=True)
+        raise
+
+    for temporal, destino in reemplazos:
+        temporal.replace(destino)
+    pendiente.unlink()
+    return agregadas
+
+
+def a_ratings(eventos):
+    """Eventos con el esquema de ratings_Electronics (la fecha pasa a timestamp en segundos)"""
+    fechas = pd.to_datetime(eventos['fecha'], errors='coerce').fillna(pd.Timestamp.now().normalize())
+    return pd.DataFrame({
+        'user_id': eventos['user_id'], 'prod_id': eventos['prod_id'], 'rating': eventos['calificacion'],
+        'timestamp': ((fechas - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).astype(np.int64),
+    })
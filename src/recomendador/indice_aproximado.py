@@ -0,0 +1,232 @@
+"""
+Índice aproximado de vecinos (IVF) sobre los factores SVD de los productos
+Los productos se agrupan con k-means esférico en n_listas listas; una consulta
+puntúa los centroides y solo recorre los productos de las n_sondeos listas
+más cercanas, en lugar de todo el catálogo. Dos métricas: 'producto' (producto
+interno, usuario → producto: con U[u] * sigma el score es el rating predicho
+del SVD) y 'coseno' (producto → producto). Más sondeos: más recall y más latencia
+"""
+
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from .matriz import MEMORIA_BLOQUE
+from .seleccion import top_k, top_k_filas
+
+METRICAS = ('producto', 'coseno')
+ARCHIVOS = ('centroides', 'inicios', 'vectores', 'orden')
+
+MUESTRA_POR_LISTA = 256
+# Los sondeos por defecto recorren al menos unos MIN_CANDIDATOS productos (todos en catálogos chicos)
+MIN_CANDIDATOS = 2048
+
+
+class IndiceIVF:
+    """Listas invertidas: centroides unitarios y vectores de producto agrupados por lista
+
+    orden[i] es la columna de la matriz del vector i; la lista l ocupa las
+    filas inicios[l]:inicios[l + 1]. Con 'coseno' los vectores se guardan
+    normalizados.
+    """
+
+    def __init__(self, centroides, inicios, vectores, orden, metrica='producto', n_sondeos=None):
+        if metrica not in METRICAS:
+            raise ValueError(f"Métrica desconocida '{metrica}' (opciones: {', '.join(METRICAS)})")
+        self.centroides = centroides
+        self.inicios = inicios
+        self.vectores = vectores
+        self.orden = orden
+        self.metrica = metrica
+        por_lista = max(len(orden), 1) / max(self.n_listas, 1)
+        self.n_sondeos = n_sondeos or min(self.n_listas, max(1, self.n_listas // 12, int(np.ceil(MIN_CANDIDATOS / por_lista))))
+
+        self._fila_de_columna = np.full(int(orden.max()) + 1 if len(orden) else 0, -1, dtype=np.int64)
+        self._fila_de_columna[orden] = np.arange(len(orden))
+
+    @classmethod
+    def construir(cls, vectores, metrica='producto', n_listas=None, validos=None, iteraciones=10,
+                  n_sondeos=None, semilla=0):
+        """Indexa las filas de vectores (un producto por fila, p. ej. Vt.T); validos filtra cuáles"""
+        vectores = np.asarray(vectores, dtype=np.float32)
+        columnas = np.arange(len(vectores)) if validos is None else np.flatnonzero(validos)
+        vectores = vectores[columnas]
+        if not len(columnas):
+            # Ningún producto válido: índice vacío (las consultas no devuelven nada)
+            ancho = vectores.shape[1] + (metrica == 'producto')
+            return cls(np.empty((0, ancho), dtype=np.float32), np.zeros(1, dtype=np.int64), vectores,
+                       columnas.astype(np.int32), metrica, n_sondeos)
+        n_listas = max(1, min(n_listas or int(round(np.sqrt(len(columnas)))), len(columnas)))
+
+        if metrica == 'producto':
+            # Producto interno máximo → coseno: con una coordenada extra todos los
+            # vectores quedan de la misma norma y las listas agrupan por dirección y norma
+            direcciones = _aumentar(vectores)
+        else:
+            vectores = direcciones = _unitarios(vectores)
+        rng = np.random.default_rng(semilla)
+        centroides = _kmeans_esferico(direcciones, n_listas, iteraciones, rng)
+        listas = _asignar(direcciones, centroides)
+
+        orden = np.argsort(listas, kind='stable')
+        inicios = np.searchsorted(listas[orden], np.arange(n_listas + 1)).astype(np.int64)
+        return cls(centroides, inicios, np.ascontiguousarray(vectores[orden]),
+                   columnas[orden].astype(np.int32), metrica, n_sondeos)
+
+    @classmethod
+    def para_modelo(cls, modelo, metrica='producto', **opciones):
+        """Índice de los productos entrenados de un ModeloSVD (columnas de Vt)"""
+        return cls.construir(np.asarray(modelo.Vt).T, metrica, **opciones)
+
+    @property
+    def n_listas(self):
+        return len(self.centroides)
+
+    @property
+    def n_productos(self):
+        return len(self.orden)
+
+    # ========================================================================
+    # CONSULTAS
+    # ========================================================================
+
+    def buscar(self, consulta, k=10, n_sondeos=None, excluir=None):
+        """Top k (columnas, scores) aproximado para un vector de consulta, de mayor a menor
+
+        El score es el producto interno o el coseno según la métrica del
+        índice. Las columnas de excluir nunca se devuelven.
+        """
+        consulta = np.asarray(consulta, dtype=np.float32)
+        # Con 'producto' la coordenada extra de los centroides no participa (la de la consulta es 0)
+        filas = self._candidatos(self.centroides[:, :len(consulta)] @ consulta, n_sondeos)
+        scores = self.vectores[filas] @ consulta
+        if self.metrica == 'coseno':
+            scores /= max(float(np.linalg.norm(consulta)), np.finfo(np.float32).tiny)
+
+        columnas = self.orden[filas]
+        if excluir is not None and len(excluir):
+            scores[np.isin(columnas, excluir)] = -np.inf
+        indices, valores = top_k(scores, k)
+        presentes = np.isfinite(valores)
+        return columnas[indices[presentes]], valores[presentes]
+
+    def buscar_lote(self, consultas, k=10, n_sondeos=None):
+        """buscar() para cada fila de consultas; (columnas int32 con -1, scores float32 con 0)"""
+        consultas = np.asarray(consultas, dtype=np.float32)
+        indices = np.full((len(consultas), k), -1, dtype=np.int32)
+        valores = np.zeros((len(consultas), k), dtype=np.float32)
+        for i, consulta in enumerate(consultas):
+            columnas, scores = self.buscar(consulta, k, n_sondeos)
+            indices[i, :len(columnas)] = columnas
+            valores[i, :len(scores)] = scores
+        return indices, valores
+
+    def recomendar(self, modelo, user_index, n=5, n_sondeos=None, excluir=None):
+        """Top n (columnas, scores) del usuario con score positivo; excluir: por defecto sus calificados"""
+        excluir = modelo.calificados(user_index) if excluir is None else excluir
+        return self.recomendar_factores(modelo.factores(user_index) * modelo.sigma, n, n_sondeos, excluir)
+
+    def recomendar_factores(self, consulta, n=5, n_sondeos=None, excluir=None):
+        """Top n con score positivo para una consulta ya ponderada (factores * sigma, p. ej. plegados)"""
+        columnas, scores = self.buscar(consulta, n, n_sondeos, excluir)
+        positivos = scores > 0
+        return columnas[positivos], scores[positivos]
+
+    def similares(self, columna, n=10, n_sondeos=None):
+        """Top n productos (columnas, scores) más cercanos a uno indexado, sin él mismo"""
+        fila = self._fila_de_columna[columna] if columna < len(self._fila_de_columna) else -1
+        if fila < 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        return self.buscar(self.vectores[fila], n, n_sondeos, excluir=[columna])
+
+    def recall(self, consultas, k=10, n_sondeos=None):
+        """Recall@k medio frente a la búsqueda exacta (argpartition sobre todos los vectores)"""
+        consultas = np.asarray(consultas, dtype=np.float32)
+        esperados, _ = top_k_filas(consultas @ np.asarray(self.vectores).T, k)
+        aproximados, _ = self.buscar_lote(consultas, k, n_sondeos)
+        esperados = self.orden[esperados]
+        return float(np.mean([np.isin(a, e).sum() / len(e) for a, e in zip(aproximados, esperados)])) if k and self.n_productos else 1.0
+
+    def _candidatos(self, scores_listas, n_sondeos):
+        """Filas de vectores de las n_sondeos listas con mayor score"""
+        listas, _ = top_k(scores_listas, n_sondeos or self.n_sondeos)
+        if not len(listas):
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate([np.arange(self.inicios[l], self.inicios[l + 1]) for l in listas])
+
+    # ========================================================================
+    # PERSISTENCIA
+    # ========================================================================
+
+    def guardar(self, directorio):
+        directorio = Path(directorio)
+        rutas = _rutas(directorio, self.metrica)
+        for nombre in ARCHIVOS[:-1]:
+            np.save(rutas[nombre], getattr(self, nombre), allow_pickle=False)
+        # El orden va al final: su presencia indica que el índice está completo
+        temporal = rutas['orden'].with_name(f".{rutas['orden'].name}")
+        np.save(temporal, self.orden, allow_pickle=False)
+        temporal.replace(rutas['orden'])
+
+    @classmethod
+    def cargar(cls, directorio, metrica='producto', n_sondeos=None):
+        """Índice guardado en un directorio de versión (vectores mapeados en memoria), o None"""
+        rutas = _rutas(Path(directorio), metrica)
+        if not rutas['orden'].exists():
+            return None
+        return cls(
+            np.load(rutas['centroides'], allow_pickle=False),
+            np.load(rutas['inicios'], allow_pickle=False),
+            np.load(rutas['vectores'], mmap_mode='r', allow_pickle=False),
+            np.load(rutas['orden'], allow_pickle=False),
+            metrica, n_sondeos
+        )
+
+
+def _rutas(directorio, metrica):
+    return {nombre: directorio / f'ann_{metrica}_{nombre}.npy' for nombre in ARCHIVOS}
+
+
+def _aumentar(vectores):
+    """[v, sqrt(M² - |v|²)] / M con M la mayor norma: vectores unitarios de una dimensión más"""
+    cuadrados = np.einsum('ij,ij->i', vectores, vectores)
+    maximo = max(float(cuadrados.max()), np.finfo(np.float32).tiny) if len(vectores) else 1.0
+    extra = np.sqrt(np.maximum(maximo - cuadrados, 0))[:, np.newaxis]
+    return (np.hstack([vectores, extra]) / np.sqrt(maximo)).astype(np.float32)
+
+
+def _unitarios(vectores):
+    normas = np.linalg.norm(vectores, axis=1, keepdims=True)
+    return vectores * np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0)
+
+
+def _asignar(direcciones, centroides):
+    """Lista (centroide de mayor coseno) de cada dirección, por bloques de memoria acotada"""
+    # Scores float32 de un bloque (filas × listas) en memoria a la vez
+    tam_bloque = int(max(1, MEMORIA_BLOQUE // (4 * len(centroides))))
+    listas = np.empty(len(direcciones), dtype=np.int64)
+    for inicio in range(0, len(direcciones), tam_bloque):
+        listas[inicio:inicio + tam_bloque] = np.argmax(direcciones[inicio:inicio + tam_bloque] @ centroides.T, axis=1)
+    return listas
+
+
+def _kmeans_esferico(direcciones, n_listas, iteraciones, rng):
+    """Centroides unitarios entrenados sobre una muestra de a lo sumo MUESTRA_POR_LISTA por lista"""
+    tam_muestra = min(len(direcciones), n_listas * MUESTRA_POR_LISTA)
+    muestra = direcciones[np.sort(rng.choice(len(direcciones), tam_muestra, replace=False))]
+    centroides = muestra[rng.choice(len(muestra), n_listas, replace=False)]
+
+    for _ in range(iteraciones):
+        listas = _asignar(muestra, centroides)
+        # Suma por lista como producto disperso (one-hot × muestra)
+        pertenencia = sparse.csr_matrix(
+            (np.ones(len(muestra), dtype=np.float32), (listas, np.arange(len(muestra)))),
+            shape=(n_listas, len(muestra))
+        )
+        sumas = np.asarray(pertenencia @ muestra)
+        # Una lista vacía se vuelve a sembrar con un punto al azar
+        vacias = np.flatnonzero(np.diff(pertenencia.indptr) == 0)
+        sumas[vacias] = muestra[rng.choice(len(muestra), len(vacias), replace=False)]
+        centroides = _unitarios(sumas).astype(np.float32)
+    return centroides
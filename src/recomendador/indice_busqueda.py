@@ -0,0 +1,139 @@
+"""
+Índice invertido para la búsqueda de productos
+Postings por token, prefijos resueltos con búsqueda binaria sobre el
+vocabulario ordenado y trigramas para coincidencias dentro de una palabra.
+Textos y consultas se pliegan a minúsculas sin acentos ("Pantalón" ≈ "pantalon")
+"""
+
+import re
+import unicodedata
+
+import numpy as np
+
+PATRON_TOKEN = re.compile(r'\w+')
+
+# Puntaje por tipo de coincidencia de cada palabra de la consulta
+PUNTAJE_EXACTO = 3
+PUNTAJE_PREFIJO = 2
+PUNTAJE_SUBCADENA = 1
+
+
+def plegar(texto):
+    """Minúsculas y sin acentos ni diacríticos"""
+    descompuesto = unicodedata.normalize('NFKD', str(texto))
+    return ''.join(c for c in descompuesto if not unicodedata.combining(c)).casefold()
+
+
+def tokenizar(texto):
+    return PATRON_TOKEN.findall(plegar(texto))
+
+
+def _trigramas(token):
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def _agrupar(claves, valores, n_claves):
+    """Postings estilo CSR: valores únicos de cada clave, ordenados"""
+    claves = np.asarray(claves, dtype=np.int64)
+    valores = np.asarray(valores, dtype=np.int32)
+    orden = np.lexsort((valores, claves))
+    claves, valores = claves[orden], valores[orden]
+
+    unicos = np.ones(len(claves), dtype=bool)
+    unicos[1:] = (claves[1:] != claves[:-1]) | (valores[1:] != valores[:-1])
+    claves, valores = claves[unicos], valores[unicos]
+    return np.searchsorted(claves, np.arange(n_claves + 1)), valores
+
+
+class IndiceBusqueda:
+    """Índice de nombres y marcas; buscar() devuelve filas ordenadas por relevancia"""
+
+    def __init__(self, nombres, marcas, popularidad=None):
+        tokens, documentos = [], []
+        for fila, (nombre, marca) in enumerate(zip(nombres, marcas)):
+            for token in tokenizar(f'{nombre} {marca}'):
+                tokens.append(token)
+                documentos.append(fila)
+
+        self.n_documentos = len(nombres)
+        self.vocabulario, ids_token = np.unique(np.array(tokens, dtype=str), return_inverse=True)
+        self._indptr, self._postings = _agrupar(ids_token, documentos, len(self.vocabulario))
+
+        # Trigramas sobre el vocabulario (no sobre los documentos): trigrama → ids de token
+        trigramas, ids = [], []
+        for id_token, token in enumerate(self.vocabulario):
+            for trigrama in _trigramas(token):
+                trigramas.append(trigrama)
+                ids.append(id_token)
+        self._trigramas, ids_trigrama = np.unique(np.array(trigramas, dtype=str), return_inverse=True)
+        self._indptr_trigramas, self._tokens_trigrama = _agrupar(ids_trigrama, ids, len(self._trigramas))
+
+        self.popularidad = np.zeros(self.n_documentos) if popularidad is None else np.asarray(popularidad)
+
+    def buscar(self, consulta, limite=None):
+        """Filas que contienen todas las palabras de la consulta y su puntaje, de mayor a menor"""
+        palabras = tokenizar(consulta)
+        if not palabras:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+
+        filas, puntajes = None, None
+        for palabra in palabras:
+            filas_palabra, puntajes_palabra = self._buscar_palabra(palabra)
+            if filas is None:
+                filas, puntajes = filas_palabra, puntajes_palabra
+            else:
+                filas, i, j = np.intersect1d(filas, filas_palabra, assume_unique=True, return_indices=True)
+                puntajes = puntajes[i] + puntajes_palabra[j]
+            if len(filas) == 0:
+                break
+
+        # Mayor puntaje primero; a igual puntaje, el producto más popular
+        orden = np.lexsort((-self.popularidad[filas], -puntajes))
+        if limite is not None:
+            orden = orden[:limite]
+        return filas[orden], puntajes[orden]
+
+    def _buscar_palabra(self, palabra):
+        """Documentos que contienen la palabra (exacta, como prefijo o como subcadena)"""
+        grupos = []
+
+        # Prefijo: rango contiguo en el vocabulario ordenado (incluye la coincidencia exacta)
+        inicio = np.searchsorted(self.vocabulario, palabra, side='left')
+        fin = np.searchsorted(self.vocabulario, palabra + '\U0010ffff', side='left')
+        for id_token in range(inicio, fin):
+            nivel = PUNTAJE_EXACTO if self.vocabulario[id_token] == palabra else PUNTAJE_PREFIJO
+            grupos.append((self._documentos(id_token), nivel))
+
+        if len(palabra) >= 3:
+            for id_token in self._tokens_con_subcadena(palabra):
+                if not inicio <= id_token < fin:
+                    grupos.append((self._documentos(id_token), PUNTAJE_SUBCADENA))
+
+        if not grupos:
+            return np.empty(0, dtype=np.int32), np.empty(0)
+
+        documentos = np.concatenate([docs for docs, _ in grupos])
+        niveles = np.concatenate([np.full(len(docs), nivel, dtype=np.float64) for docs, nivel in grupos])
+
+        # Un documento puede coincidir con varios tokens: se queda el mejor nivel
+        orden = np.lexsort((-niveles, documentos))
+        documentos, niveles = documentos[orden], niveles[orden]
+        primeros = np.ones(len(documentos), dtype=bool)
+        primeros[1:] = documentos[1:] != documentos[:-1]
+        return documentos[primeros], niveles[primeros]
+
+    def _tokens_con_subcadena(self, palabra):
+        candidatos = None
+        for trigrama in _trigramas(palabra):
+            pos = np.searchsorted(self._trigramas, trigrama)
+            if pos == len(self._trigramas) or self._trigramas[pos] != trigrama:
+                return []
+            tokens = self._tokens_trigrama[self._indptr_trigramas[pos]:self._indptr_trigramas[pos + 1]]
+            candidatos = tokens if candidatos is None else np.intersect1d(candidatos, tokens, assume_unique=True)
+            if len(candidatos) == 0:
+                return []
+        # Los trigramas filtran; la subcadena se confirma sobre el token
+        return [id_token for id_token in candidatos if palabra in self.vocabulario[id_token]]
+
+    def _documentos(self, id_token):
+        return self._postings[self._indptr[id_token]:self._indptr[id_token + 1]]
@@ -0,0 +1,127 @@
+"""
+Puntuación SVD por micro-lotes
+Las consultas concurrentes (una por sesión) se encolan; un hilo las junta
+durante a lo sumo max_espera_ms o hasta max_lote, apila sus factores y las
+puntúa con un solo producto matricial contra Vt (una GEMM en lugar de una GEMV
+por consulta: Vt se lee una vez por lote). Cada consulta recibe su top-n en un
+Future, así quien la envía puede esperarla con su propio presupuesto. El hilo
+arranca con la primera consulta y termina tras INACTIVIDAD_S sin consultas
+(un puntuador descartado no retiene su modelo)
+"""
+
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future
+
+import numpy as np
+
+from .matriz import MEMORIA_BLOQUE
+from .seleccion import top_k
+
+INACTIVIDAD_S = 60.0
+
+_Consulta = namedtuple('_Consulta', ['factores', 'n', 'excluir', 'futuro'])
+
+
+class PuntuadorLotes:
+    """Cola de consultas (factores de usuario, n, columnas a excluir) atendida por un hilo"""
+
+    def __init__(self, modelo, max_lote=64, max_espera_ms=2.0):
+        self.modelo = modelo
+        self.max_lote = max_lote
+        self.max_espera_ms = max_espera_ms
+        self.lotes = 0
+        self.consultas = 0
+
+        self._cola = queue.SimpleQueue()
+        # Encolar y decidir si el hilo sigue vivo van bajo el mismo candado
+        self._candado = threading.Lock()
+        self._hilo = None
+
+    def enviar(self, factores, n=5, excluir=None):
+        """Future con el top n (columnas, scores) de score positivo para un vector de factores"""
+        futuro = Future()
+        excluir = np.empty(0, dtype=np.int64) if excluir is None else np.asarray(excluir, dtype=np.int64)
+        with self._candado:
+            self._cola.put(_Consulta(np.asarray(factores, dtype=np.float32), n, excluir, futuro))
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._atender, name='puntuador-lotes', daemon=True)
+                self._hilo.start()
+        return futuro
+
+    def recomendar(self, user_index, n=5):
+        """Future del top n del usuario sin sus calificados (como ModeloSVD.recomendar)"""
+        return self.enviar(self.modelo.factores(user_index), n, self.modelo.calificados(user_index))
+
+    @property
+    def tamano_medio_lote(self):
+        return self.consultas / self.lotes if self.lotes else 0.0
+
+    def cerrar(self):
+        """Atiende lo que queda en la cola y detiene el hilo"""
+        with self._candado:
+            hilo = self._hilo
+            if hilo is not None:
+                self._cola.put(None)
+        if hilo is not None:
+            hilo.join()
+
+    def _atender(self):
+        while True:
+            try:
+                primera = self._cola.get(timeout=INACTIVIDAD_S)
+            except queue.Empty:
+                primera = None
+            if primera is None:
+                # Inactivo o cerrar(): termina solo si no quedó nada en la cola
+                with self._candado:
+                    if self._cola.empty():
+                        self._hilo = None
+                        return
+                continue
+
+            lote = [primera]
+            limite = time.perf_counter() + self.max_espera_ms / 1000
+            while len(lote) < self.max_lote:
+                try:
+                    consulta = self._cola.get(timeout=max(limite - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if consulta is None:
+                    # El aviso de cerrar() se atiende después de este lote
+                    self._cola.put(None)
+                    break
+                lote.append(consulta)
+            self._puntuar(lote)
+
+    def _puntuar(self, lote):
+        # Las que ya expiraron (cancel() de quien esperaba) no se puntúan
+        lote = [consulta for consulta in lote if consulta.futuro.set_running_or_notify_cancel()]
+        self.lotes += 1
+        self.consultas += len(lote)
+        # Scores float32 de un sub-lote (consultas × productos) en memoria a la vez
+        tam_bloque = int(max(1, MEMORIA_BLOQUE // (4 * max(self.modelo.n_productos, 1))))
+        for inicio in range(0, len(lote), tam_bloque):
+            bloque = lote[inicio:inicio + tam_bloque]
+            try:
+                resultados = self._top_n(bloque)
+            except Exception as error:
+                for consulta in bloque:
+                    consulta.futuro.set_exception(error)
+                continue
+            for consulta, resultado in zip(bloque, resultados):
+                consulta.futuro.set_result(resultado)
+
+    def _top_n(self, bloque):
+        scores = self.modelo.puntuar_factores(np.stack([consulta.factores for consulta in bloque]))
+        # El top-k va fila por fila: argpartition sobre todo el bloque (consultas × productos
+        # índices int64) sale de la caché y es más lento que una fila a la vez
+        resultados = []
+        for fila, consulta in zip(scores, bloque):
+            fila[consulta.excluir] = -np.inf
+            columnas, valores = top_k(fila, consulta.n)
+            positivos = valores > 0
+            resultados.append((columnas[positivos], valores[positivos]))
+        return resultados
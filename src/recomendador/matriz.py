@@ -0,0 +1,98 @@
+"""
+Matriz dispersa de ratings usuarios × productos
+Se construye directamente desde los códigos categóricos de user_id/prod_id,
+sin pasar por el pivot denso; filas y columnas son los códigos de dos
+DiccionarioIds (usuarios y productos)
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from .diccionario import DiccionarioIds
+
+# Tope de memoria de los temporales de un bloque en los cálculos por bloques
+# (scores, similitudes, proyecciones); cada módulo fija con él su tamaño de bloque
+MEMORIA_BLOQUE = 32 * 2**20
+
+
+class MatrizRatings:
+    """Ratings en CSR (float32); fila = código de usuario, columna = código de producto"""
+
+    def __init__(self, matriz, user_ids, prod_ids):
+        """user_ids y prod_ids: DiccionarioIds o arreglos ordenados de ids"""
+        self.matriz = sparse.csr_matrix(matriz)
+        self.usuarios = user_ids if isinstance(user_ids, DiccionarioIds) else DiccionarioIds(user_ids)
+        self.productos = prod_ids if isinstance(prod_ids, DiccionarioIds) else DiccionarioIds(prod_ids)
+
+    @property
+    def user_ids(self):
+        """Ids de usuario por fila (arreglo compacto del diccionario)"""
+        return self.usuarios.ids
+
+    @property
+    def prod_ids(self):
+        """Ids de producto por columna (arreglo compacto del diccionario)"""
+        return self.productos.ids
+
+    @classmethod
+    def desde_dataframe(cls, df, col_usuario='user_id', col_producto='prod_id', col_rating='rating'):
+        """Construye la matriz desde un DataFrame largo (una fila por rating)"""
+        usuarios = pd.Categorical(df[col_usuario])
+        productos = pd.Categorical(df[col_producto])
+        return cls.desde_codigos(
+            usuarios.codes, productos.codes, df[col_rating].to_numpy(),
+            usuarios.categories.to_numpy(dtype=str), productos.categories.to_numpy(dtype=str)
+        )
+
+    @classmethod
+    def desde_codigos(cls, filas, columnas, ratings, user_ids, prod_ids):
+        """Construye la matriz desde códigos enteros ya calculados"""
+        filas = np.asarray(filas, dtype=np.int32)
+        columnas = np.asarray(columnas, dtype=np.int32)
+        ratings = np.asarray(ratings, dtype=np.float32)
+
+        # Un par usuario-producto repetido conserva el último rating
+        clave = filas.astype(np.int64) * len(prod_ids) + columnas
+        _, ultimos = np.unique(clave[::-1], return_index=True)
+        ultimos = len(clave) - 1 - ultimos
+
+        matriz = sparse.csr_matrix(
+            (ratings[ultimos], (filas[ultimos], columnas[ultimos])),
+            shape=(len(user_ids), len(prod_ids)),
+            dtype=np.float32
+        )
+        return cls(matriz, user_ids, prod_ids)
+
+    @property
+    def shape(self):
+        return self.matriz.shape
+
+    @property
+    def nnz(self):
+        return self.matriz.nnz
+
+    def fila(self, user_index):
+        """Vector denso de ratings de un usuario"""
+        return self.matriz[user_index].toarray().ravel()
+
+    def productos_calificados(self, user_index):
+        """Índices de productos que el usuario ya calificó"""
+        inicio, fin = self.matriz.indptr[user_index], self.matriz.indptr[user_index + 1]
+        return self.matriz.indices[inicio:fin]
+
+    def a_dataframe(self):
+        """Vista densa equivalente al antiguo pivot (solo para matrices pequeñas)"""
+        return pd.DataFrame(self.matriz.toarray(), index=self.usuarios.ids_texto(),
+                            columns=self.productos.ids_texto())
+
+
+def a_csr(matriz, dtype=np.float32):
+    """Convierte una matriz de interacciones (MatrizRatings, DataFrame, ndarray o dispersa) a CSR"""
+    if isinstance(matriz, MatrizRatings):
+        matriz = matriz.matriz
+    elif isinstance(matriz, pd.DataFrame):
+        matriz = matriz.to_numpy()
+    if sparse.issparse(matriz):
+        return sparse.csr_matrix(matriz, dtype=dtype)
+    return sparse.csr_matrix(np.asarray(matriz, dtype=dtype))
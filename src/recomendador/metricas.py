@@ -0,0 +1,300 @@
+"""
+Métricas de los caminos críticos: latencias, llamadas y aciertos de caché
+Cada operación medida acumula un histograma de latencias de límites fijos
+(un contador por cubeta, la suma y la cantidad). Registrar una llamada solo
+encola la muestra; las muestras se reparten en las cubetas por bloques, con
+NumPy, así que la memoria no crece con las llamadas. Las métricas son del
+proceso (todas las sesiones) y se exportan en el formato de texto de
+Prometheus: a un archivo, por HTTP en /metrics o a la página de diagnóstico
+de la app. RECOMENDADOR_METRICAS=0 las desactiva; las funciones decoradas
+quedan con un solo chequeo de más por llamada
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+# Límites superiores de las cubetas, en segundos (la última, +Inf, es implícita)
+LIMITES_S = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+             10.0, 30.0, 60.0)
+PREFIJO = 'recomendador'
+PENDIENTES_MAX = 1024
+
+_habilitadas = os.environ.get('RECOMENDADOR_METRICAS', '1') != '0'
+_lock = threading.Lock()
+_histogramas = {}
+_caches = {}
+
+
+def habilitar(activas=True):
+    global _habilitadas
+    _habilitadas = activas
+
+
+def habilitadas():
+    return _habilitadas
+
+
+def reiniciar():
+    """Pone en cero todo lo registrado (los histogramas siguen siendo los mismos objetos)"""
+    with _lock:
+        for histograma in _histogramas.values():
+            histograma.reiniciar()
+        _caches.clear()
+
+
+# ============================================================================
+# REGISTRO
+# ============================================================================
+
+class Histograma:
+    """Latencias de una operación: cuenta por cubeta, suma y cantidad
+
+    observar() solo agrega la muestra a una deque (append es atómico, sin
+    candado); las muestras pendientes se reparten en las cubetas en bloque,
+    cuando se acumulan PENDIENTES_MAX o cuando alguien lee el histograma.
+    """
+
+    def __init__(self, limites=LIMITES_S):
+        self.limites = limites
+        self.cubetas = np.zeros(len(limites) + 1, dtype=np.int64)
+        self.suma = 0.0
+        self.cantidad = 0
+        self._pendientes = deque()
+        self._lock = threading.Lock()
+
+    def observar(self, segundos):
+        self._pendientes.append(segundos)
+        if len(self._pendientes) >= PENDIENTES_MAX:
+            self._plegar()
+
+    def _plegar(self):
+        with self._lock:
+            pendientes = self._pendientes
+            muestras = np.fromiter((pendientes.popleft() for _ in range(len(pendientes))), dtype=np.float64)
+            self.cubetas += np.bincount(np.searchsorted(self.limites, muestras), minlength=len(self.cubetas))
+            self.suma += float(muestras.sum())
+            self.cantidad += len(muestras)
+
+    def reiniciar(self):
+        self._plegar()
+        with self._lock:
+            self.cubetas[:] = 0
+            self.suma = 0.0
+            self.cantidad = 0
+
+    def copia(self):
+        """(cubetas, suma, cantidad) consistentes entre sí, con las muestras pendientes incluidas"""
+        self._plegar()
+        with self._lock:
+            return self.cubetas.tolist(), self.suma, self.cantidad
+
+    def percentil(self, q):
+        """Percentil q (0-100) estimado interpolando dentro de su cubeta, como histogram_quantile"""
+        cubetas, _, cantidad = self.copia()
+        if not cantidad:
+            return 0.0
+        objetivo = q / 100 * cantidad
+        acumulado = 0
+        for i, en_cubeta in enumerate(cubetas):
+            if acumulado + en_cubeta >= objetivo and en_cubeta:
+                if i == len(self.limites):
+                    return self.limites[-1]
+                inferior = self.limites[i - 1] if i else 0.0
+                return inferior + (self.limites[i] - inferior) * (objetivo - acumulado) / en_cubeta
+            acumulado += en_cubeta
+        return self.limites[-1]
+
+
+def histograma(operacion):
+    """El histograma de la operación (se crea con la primera medición)"""
+    encontrado = _histogramas.get(operacion)
+    if encontrado is None:
+        with _lock:
+            encontrado = _histogramas.setdefault(operacion, Histograma())
+    return encontrado
+
+
+def observar(operacion, segundos):
+    """Registra una latencia de la operación"""
+    if _habilitadas:
+        histograma(operacion).observar(segundos)
+
+
+def contar_cache(cache, acierto):
+    """Registra una consulta a un caché y si encontró el valor"""
+    if not _habilitadas:
+        return
+    with _lock:
+        conteo = _caches.setdefault(cache, [0, 0])
+        conteo[0 if acierto else 1] += 1
+
+
+class medir:
+    """Context manager que registra la latencia del bloque: with medir('render_grid'): ..."""
+
+    __slots__ = ('operacion', 'inicio')
+
+    def __init__(self, operacion):
+        self.operacion = operacion
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *error):
+        observar(self.operacion, time.perf_counter() - self.inicio)
+        return False
+
+
+def medido(operacion=None):
+    """Decorador que registra la latencia de cada llamada (por defecto con el nombre de la función)
+
+    En un generador se mide hasta que termina o se cierra, y el tiempo hasta
+    el primer fragmento va aparte (<operacion>_primer_fragmento).
+    """
+    def decorar(funcion):
+        nombre = operacion or funcion.__name__
+        # Resuelto una vez: cada llamada solo toma el tiempo y suma en su cubeta
+        registrar = histograma(nombre).observar
+        if inspect.isgeneratorfunction(funcion):
+            @functools.wraps(funcion)
+            def generador(*args, **kwargs):
+                if not _habilitadas:
+                    return (yield from funcion(*args, **kwargs))
+                inicio = time.perf_counter()
+                interno = funcion(*args, **kwargs)
+                try:
+                    primero = True
+                    for fragmento in interno:
+                        if primero:
+                            observar(nombre + '_primer_fragmento', time.perf_counter() - inicio)
+                            primero = False
+                        yield fragmento
+                finally:
+                    # Si el consumidor lo abandona, el generador interno se cierra ahora
+                    interno.close()
+                    registrar(time.perf_counter() - inicio)
+            return generador
+
+        @functools.wraps(funcion)
+        def medida(*args, **kwargs):
+            if not _habilitadas:
+                return funcion(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcion(*args, **kwargs)
+            finally:
+                registrar(time.perf_counter() - inicio)
+        return medida
+    return decorar
+
+
+# ============================================================================
+# EXPORTACIÓN
+# ============================================================================
+
+def resumen():
+    """Filas por operación (llamadas, media y percentiles en ms) y por caché (tasa de aciertos)"""
+    with _lock:
+        histogramas = sorted(_histogramas.items())
+        caches = sorted((cache, list(conteo)) for cache, conteo in _caches.items())
+    operaciones = []
+    for operacion, histograma in histogramas:
+        _, suma, cantidad = histograma.copia()
+        operaciones.append({
+            'operacion': operacion, 'llamadas': cantidad, 'total_s': suma,
+            'media_ms': suma / cantidad * 1000 if cantidad else 0.0,
+            **{f'p{q}_ms': histograma.percentil(q) * 1000 for q in (50, 95, 99)},
+        })
+    tasas = [
+        {'cache': cache, 'aciertos': aciertos, 'fallos': fallos,
+         'tasa_aciertos': aciertos / (aciertos + fallos) if aciertos + fallos else 0.0}
+        for cache, (aciertos, fallos) in caches
+    ]
+    return operaciones, tasas
+
+
+def texto_prometheus():
+    """Métricas en el formato de texto de Prometheus (0.0.4)"""
+    with _lock:
+        histogramas = sorted(_histogramas.items())
+        caches = sorted((cache, list(conteo)) for cache, conteo in _caches.items())
+
+    nombre = f'{PREFIJO}_latencia_segundos'
+    lineas = [f'# HELP {nombre} Latencia de las operaciones instrumentadas', f'# TYPE {nombre} histogram']
+    for operacion, histograma in histogramas:
+        cubetas, suma, cantidad = histograma.copia()
+        etiqueta = f'operacion="{_escapar(operacion)}"'
+        acumulado = 0
+        for limite, en_cubeta in zip(histograma.limites + (float('inf'),), cubetas):
+            acumulado += en_cubeta
+            le = '+Inf' if limite == float('inf') else repr(limite)
+            lineas.append(f'{nombre}_bucket{{{etiqueta},le="{le}"}} {acumulado}')
+        lineas.append(f'{nombre}_sum{{{etiqueta}}} {suma!r}')
+        lineas.append(f'{nombre}_count{{{etiqueta}}} {cantidad}')
+
+    nombre = f'{PREFIJO}_cache_consultas_total'
+    lineas += [f'# HELP {nombre} Consultas a cachés por resultado', f'# TYPE {nombre} counter']
+    for cache, (aciertos, fallos) in caches:
+        for resultado, valor in (('acierto', aciertos), ('fallo', fallos)):
+            lineas.append(f'{nombre}{{cache="{_escapar(cache)}",resultado="{resultado}"}} {valor}')
+    return '\n'.join(lineas) + '\n'
+
+
+def escribir(ruta):
+    """Escribe el texto Prometheus en ruta (vía temporal: un lector nunca ve un archivo a medias)"""
+    ruta = Path(ruta)
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    temporal.write_text(texto_prometheus(), encoding='utf-8')
+    temporal.replace(ruta)
+
+
+def exportar_archivo(ruta, intervalo_s=15.0):
+    """Reescribe ruta cada intervalo_s en un hilo (para el textfile collector de node_exporter)"""
+    def exportar():
+        while True:
+            try:
+                escribir(ruta)
+            except OSError:
+                pass  # Se reintenta en el próximo intervalo
+            time.sleep(intervalo_s)
+
+    hilo = threading.Thread(target=exportar, name='metricas-archivo', daemon=True)
+    hilo.start()
+    return hilo
+
+
+class _ManejadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        cuerpo = texto_prometheus().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, *args):
+        pass
+
+
+def servir(puerto, host='127.0.0.1'):
+    """Sirve GET /metrics en un hilo; devuelve el servidor (shutdown() lo detiene)"""
+    servidor = ThreadingHTTPServer((host, puerto), _ManejadorMetricas)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name='metricas-http', daemon=True).start()
+    return servidor
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,214 @@
+"""
+Top-N precalculado para todos los usuarios de una versión de artefactos
+Un trabajo por lotes puntúa a los usuarios en bloques repartidos en un
+ProcessPoolExecutor y escribe, junto a los demás .npy de la versión, una tabla
+de ancho fijo: fila de la matriz → columnas (int32, -1 = vacío) y scores
+(float32) del top-N. La tabla se arma en archivos temporales: cada bloque
+terminado queda registrado en disco, así una corrida interrumpida se retoma
+donde quedó, y al final los temporales reemplazan a la tabla anterior (que se
+sigue sirviendo mientras tanto) y top_n.json marca la tabla nueva como
+completa. La app lee la fila del usuario en O(1)
+"""
+
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from .artefactos import cargar_artefactos, version_actual
+from .matriz import MEMORIA_BLOQUE
+
+ARCHIVO_TOP_N = 'top_n.json'
+ARCHIVO_PROGRESO = 'top_n_progreso.json'
+ARCHIVO_PRODUCTOS = 'top_n_productos.npy'
+ARCHIVO_SCORES = 'top_n_scores.npy'
+# La tabla en construcción: nunca se escribe sobre la que puede estar mapeada en la app
+SUFIJO_TEMPORAL = '.construyendo'
+
+
+class TablaTopN:
+    """Top-N por usuario mapeado en memoria"""
+
+    def __init__(self, productos, scores, meta):
+        self.productos = productos
+        self.scores = scores
+        self.meta = meta
+
+    @property
+    def n(self):
+        return self.productos.shape[1]
+
+    def fila(self, user_index, n=None):
+        """Columnas de la matriz del top n del usuario, de mayor a menor score (sin huecos)"""
+        columnas = self.productos[user_index, :n]
+        return columnas[columnas >= 0]
+
+    def fila_con_scores(self, user_index, n=None):
+        """(columnas, scores) del top n del usuario, como fila()"""
+        columnas = self.productos[user_index, :n]
+        presentes = columnas >= 0
+        return columnas[presentes], self.scores[user_index, :n][presentes]
+
+
+def cargar_top_n(directorio_version):
+    """Tabla de una versión, o None si no se precalculó o la corrida quedó a medias"""
+    directorio = Path(directorio_version)
+    try:
+        meta = json.loads((directorio / ARCHIVO_TOP_N).read_text(encoding='utf-8'))
+    except FileNotFoundError:
+        return None
+    return TablaTopN(
+        np.load(directorio / ARCHIVO_PRODUCTOS, mmap_mode='r', allow_pickle=False),
+        np.load(directorio / ARCHIVO_SCORES, mmap_mode='r', allow_pickle=False),
+        meta
+    )
+
+
+def marca_top_n(directorio_version):
+    """mtime (ns) de top_n.json, distinto en cada tabla publicada; None si no hay tabla completa"""
+    try:
+        return (Path(directorio_version) / ARCHIVO_TOP_N).stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def tam_bloque_por_defecto(n_productos):
+    """Usuarios por bloque de modo que sus scores ocupen a lo sumo MEMORIA_BLOQUE, por proceso"""
+    return int(max(1, min(4096, MEMORIA_BLOQUE // (4 * max(n_productos, 1)))))
+
+
+def precalcular_top_n(directorio_base, version=None, n=12, tam_bloque=None, max_procesos=None,
+                      productos_validos=None):
+    """Calcula (o retoma) la tabla top-N de una versión; devuelve su meta
+
+    productos_validos es una máscara por columna (p. ej. los que existen en el
+    catálogo); los demás nunca entran en la tabla. Con max_procesos=1 se
+    calcula en el proceso actual.
+    """
+    directorio_base = Path(directorio_base)
+    version = version or version_actual(directorio_base)
+    artefactos = cargar_artefactos(directorio_base, version)
+    directorio = artefactos.directorio
+    n_usuarios, n_productos = artefactos.matriz.shape
+    tam_bloque = tam_bloque or tam_bloque_por_defecto(n_productos)
+
+    if productos_validos is None:
+        excluir = np.empty(0, dtype=np.int64)
+    else:
+        excluir = np.flatnonzero(~np.asarray(productos_validos, dtype=bool))
+    parametros = {
+        'n': int(n),
+        'tam_bloque': int(tam_bloque),
+        'n_usuarios': int(n_usuarios),
+        'excluidos': hashlib.sha1(excluir.tobytes()).hexdigest(),
+    }
+
+    # Tabla completa con los mismos parámetros: nada que hacer
+    completa = cargar_top_n(directorio)
+    if completa is not None and all(completa.meta.get(k) == v for k, v in parametros.items()):
+        return dict(completa.meta, bloques_calculados=0)
+
+    hechos = _retomar(directorio, parametros)
+    if hechos is None:
+        hechos = set()
+        _iniciar_tabla(directorio, parametros)
+
+    inicio = time.perf_counter()
+    pendientes = [b for b in range(0, n_usuarios, tam_bloque) if b // tam_bloque not in hechos]
+    argumentos = (directorio_base, version, n, excluir)
+
+    if max_procesos == 1:
+        _iniciar_trabajador(*argumentos)
+        for bloque in pendientes:
+            hechos.add(_procesar_bloque(bloque, min(bloque + tam_bloque, n_usuarios)) // tam_bloque)
+            _guardar_progreso(directorio, parametros, hechos)
+    else:
+        # Cada proceso abre los artefactos mapeados en memoria y escribe su bloque
+        # directamente en la tabla; por la cola solo viajan números de bloque
+        with ProcessPoolExecutor(max_workers=max_procesos, initializer=_iniciar_trabajador,
+                                 initargs=argumentos) as pool:
+            futuros = [pool.submit(_procesar_bloque, b, min(b + tam_bloque, n_usuarios)) for b in pendientes]
+            for futuro in as_completed(futuros):
+                hechos.add(futuro.result() // tam_bloque)
+                _guardar_progreso(directorio, parametros, hechos)
+
+    meta = dict(parametros, segundos=round(time.perf_counter() - inicio, 3), bloques_calculados=len(pendientes))
+    # Cada reemplazo es atómico y quien ya mapeó la tabla anterior la sigue leyendo entera
+    # (su archivo vive hasta que se cierra el último mapeo)
+    for archivo in (ARCHIVO_SCORES, ARCHIVO_PRODUCTOS):
+        os.replace(_temporal(directorio, archivo), directorio / archivo)
+    _escribir_json(directorio / ARCHIVO_TOP_N, meta)
+    (directorio / ARCHIVO_PROGRESO).unlink(missing_ok=True)
+    return meta
+
+
+def _temporal(directorio, archivo):
+    return directorio / (archivo + SUFIJO_TEMPORAL)
+
+
+def _iniciar_tabla(directorio, parametros):
+    """Crea la tabla vacía en los temporales (la completa anterior sigue en uso)"""
+    forma = (parametros['n_usuarios'], parametros['n'])
+    productos = np.lib.format.open_memmap(_temporal(directorio, ARCHIVO_PRODUCTOS), mode='w+', dtype=np.int32,
+                                          shape=forma)
+    productos[:] = -1
+    productos.flush()
+    scores = np.lib.format.open_memmap(_temporal(directorio, ARCHIVO_SCORES), mode='w+', dtype=np.float32, shape=forma)
+    scores.flush()
+    _guardar_progreso(directorio, parametros, set())
+
+
+def _retomar(directorio, parametros):
+    """Bloques ya hechos de una corrida previa con los mismos parámetros, o None"""
+    try:
+        progreso = json.loads((directorio / ARCHIVO_PROGRESO).read_text(encoding='utf-8'))
+    except (FileNotFoundError, ValueError):
+        return None
+    existen = _temporal(directorio, ARCHIVO_PRODUCTOS).exists() and _temporal(directorio, ARCHIVO_SCORES).exists()
+    if not existen or progreso.get('parametros') != parametros:
+        return None
+    return set(progreso['hechos'])
+
+
+def _guardar_progreso(directorio, parametros, hechos):
+    _escribir_json(directorio / ARCHIVO_PROGRESO, {'parametros': parametros, 'hechos': sorted(hechos)})
+
+
+def _escribir_json(ruta, contenido):
+    temporal = ruta.with_name(ruta.name + '.tmp')
+    temporal.write_text(json.dumps(contenido, indent=2), encoding='utf-8')
+    os.replace(temporal, ruta)
+
+
+# ============================================================================
+# TRABAJADORES
+# ============================================================================
+
+_trabajo = {}
+
+
+def _iniciar_trabajador(directorio_base, version, n, excluir):
+    artefactos = cargar_artefactos(directorio_base, version)
+    _trabajo.update(
+        modelo=artefactos.modelo,
+        n=n,
+        excluir=excluir,
+        productos=np.load(_temporal(artefactos.directorio, ARCHIVO_PRODUCTOS), mmap_mode='r+'),
+        scores=np.load(_temporal(artefactos.directorio, ARCHIVO_SCORES), mmap_mode='r+'),
+    )
+
+
+def _procesar_bloque(inicio, fin):
+    """Top-N de los usuarios [inicio, fin) escrito en la tabla; devuelve inicio al terminar"""
+    indices, scores = _trabajo['modelo'].recomendar_lote(np.arange(inicio, fin), _trabajo['n'], _trabajo['excluir'])
+    k = indices.shape[1]
+    _trabajo['productos'][inicio:fin, :k] = indices
+    _trabajo['scores'][inicio:fin, :k] = scores
+    # El bloque solo se registra como hecho después de llegar al disco
+    _trabajo['productos'].flush()
+    _trabajo['scores'].flush()
+    return inicio
@@ -0,0 +1,133 @@
+"""
+Recarga en caliente de los datos de data/
+Cada archivo vigilado se identifica por tamaño, mtime y hash de su contenido;
+el hash solo se recalcula cuando cambian el tamaño o el mtime, así que tocar
+un archivo sin cambiarlo no recarga nada. Un hilo revisa los archivos cada
+intervalo_s y, cuando la huella cambia y los archivos quedaron quietos una
+revisión completa (no se lee una copia a medio escribir), construye la
+versión nueva en segundo plano y la publica reemplazando una sola referencia.
+Cada rerun lee la versión vigente una vez y la usa hasta terminar: no hay
+pausa para las demás sesiones, y la versión anterior se libera cuando ya
+nadie la referencia
+"""
+
+import hashlib
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+from .columnar import TABLAS, ruta_columnar
+
+# huella: hash de las huellas de todos los archivos; datos: lo que devolvió construir()
+Version = namedtuple('Version', ['huella', 'datos'])
+
+TAM_LECTURA = 2**20
+
+
+def archivos_de_tablas(directorio, tablas):
+    """CSV y Parquet de cada tabla (existan o no): cualquiera de los dos puede ser el que se lee"""
+    directorio = Path(directorio)
+    return [ruta for tabla in tablas for ruta in (directorio / TABLAS[tabla]['csv'], ruta_columnar(directorio, tabla))]
+
+
+def hash_contenido(ruta):
+    """blake2b del archivo, leído por bloques"""
+    resumen = hashlib.blake2b(digest_size=16)
+    with open(ruta, 'rb') as archivo:
+        for bloque in iter(lambda: archivo.read(TAM_LECTURA), b''):
+            resumen.update(bloque)
+    return resumen.hexdigest()
+
+
+class RecargaDatos:
+    """Versión vigente de unos archivos y de lo que construir() arma con ellos"""
+
+    def __init__(self, rutas, construir, intervalo_s=5.0):
+        """construir(): arma los datos desde los archivos; la primera versión se construye aquí mismo"""
+        self.rutas = [Path(ruta) for ruta in rutas]
+        self.construir = construir
+        self.intervalo_s = intervalo_s
+        self.recargas = 0
+        self.error = None
+
+        self._hashes = {}
+        self._fallida = None
+        self._estado = self._estado_archivos()
+        self.actual = Version(self._huella(self._estado), construir())
+
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        """Arranca el hilo que revisa los archivos; devuelve el propio objeto"""
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._vigilar, name='recarga-datos', daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join()
+            self._hilo = None
+
+    def revisar(self):
+        """Publica una versión nueva si los archivos cambiaron; True si la publicó
+
+        Un cambio de tamaño o mtime solo se procesa cuando se repite igual en
+        la revisión siguiente. Si construir() falla, sigue vigente la versión
+        anterior y el error queda en self.error hasta que los archivos vuelvan
+        a cambiar y la recarga funcione.
+        """
+        estado = self._estado_archivos()
+        if estado != self._estado:
+            self._estado = estado
+            return False
+        huella = self._huella(estado)
+        if huella in (self.actual.huella, self._fallida):
+            return False
+
+        try:
+            datos = self.construir()
+        except Exception as error:
+            # No se reintenta con los mismos archivos
+            self.error = error
+            self._fallida = huella
+            return False
+        self.actual = Version(huella, datos)
+        self.recargas += 1
+        self.error = None
+        return True
+
+    def _vigilar(self):
+        while not self._detener.wait(self.intervalo_s):
+            self.revisar()
+
+    def _estado_archivos(self):
+        """(tamaño, mtime_ns) de cada archivo; None si no existe"""
+        estado = []
+        for ruta in self.rutas:
+            try:
+                stat = ruta.stat()
+            except FileNotFoundError:
+                estado.append(None)
+            else:
+                estado.append((stat.st_size, stat.st_mtime_ns))
+        return tuple(estado)
+
+    def _huella(self, estado):
+        """Hash de (ruta, tamaño, hash de contenido) de todos los archivos; el mtime no entra"""
+        resumen = hashlib.blake2b(digest_size=16)
+        for ruta, firma in zip(self.rutas, estado):
+            if firma is None:
+                resumen.update(f'{ruta}:-\n'.encode())
+                continue
+            guardado = self._hashes.get(ruta)
+            if guardado is None or guardado[0] != firma:
+                try:
+                    guardado = (firma, hash_contenido(ruta))
+                except FileNotFoundError:
+                    guardado = (firma, '-')
+                self._hashes[ruta] = guardado
+            resumen.update(f'{ruta}:{firma[0]}:{guardado[1]}\n'.encode())
+        return resumen.hexdigest()
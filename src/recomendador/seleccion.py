@@ -0,0 +1,34 @@
+"""
+Selección del top-k con argpartition (O(n) en lugar de ordenar todo el vector)
+"""
+
+import numpy as np
+
+
+def top_k(scores, k, excluir=None):
+    """Índices y valores de los k mayores de un vector, de mayor a menor"""
+    scores = np.asarray(scores)
+    if excluir is not None and len(excluir):
+        scores = scores.copy()
+        scores[excluir] = -np.inf
+
+    indices, valores = top_k_filas(scores[np.newaxis, :], k)
+    return indices[0], valores[0]
+
+
+def top_k_filas(scores, k):
+    """Índices y valores de los k mayores por fila, ordenados de mayor a menor"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        vacio = np.empty((scores.shape[0], 0))
+        return vacio.astype(np.int64), vacio.astype(scores.dtype)
+
+    if k < scores.shape[1]:
+        # Sin negar los scores: -scores sería una copia completa de la matriz
+        candidatos = np.argpartition(scores, scores.shape[1] - k, axis=1)[:, -k:]
+    else:
+        candidatos = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+
+    valores = np.take_along_axis(scores, candidatos, axis=1)
+    orden = np.argsort(-valores, axis=1, kind='stable')
+    return np.take_along_axis(candidatos, orden, axis=1), np.take_along_axis(valores, orden, axis=1)
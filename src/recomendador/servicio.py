@@ -0,0 +1,235 @@
+"""
+Servicio de recomendaciones para la página "Mis Recomendaciones"
+Sirve resultados SVD o por vecinos desde estructuras precalculadas dentro de
+un presupuesto de latencia (el SVD sale de la tabla top-N por lotes si existe;
+los usuarios nuevos o con ratings recientes se pliegan en el SVD al vuelo y,
+con un índice aproximado, se puntúan solo contra las listas sondeadas; sin
+él, las consultas concurrentes se pueden puntuar por micro-lotes); si el
+usuario no existe o el presupuesto se agota, responde con los productos más
+populares. Trabaja solo con códigos de producto del diccionario compartido;
+la interfaz los traduce a filas del catálogo
+"""
+
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import numpy as np
+
+from .metricas import observar
+from .matriz import a_csr
+from .seleccion import top_k
+
+# productos: códigos int del diccionario compartido de productos
+Recomendacion = namedtuple('Recomendacion', ['productos', 'fuente', 'latencia_ms'])
+
+ESTRATEGIAS = ('svd', 'vecinos')
+FUENTES = ESTRATEGIAS + ('precalculado', 'plegado', 'popularidad')
+
+
+class ServicioRecomendaciones:
+    """Punto único de entrada para recomendaciones personalizadas"""
+
+    def __init__(self, modelo_svd, motor_vecinos, ratings, codigos_producto, populares,
+                 productos_validos=None, presupuesto_ms=20.0, n_vecinos=10, max_hilos=2, top_n=None,
+                 indice=None, puntuador=None):
+        """codigos_producto: código compartido de cada columna; populares: códigos en orden de respaldo
+
+        top_n: TablaTopN precalculada; con ella el SVD se sirve sin puntuar.
+        indice: IndiceIVF ('producto') de los factores; con él el SVD al vuelo
+        recorre solo las listas sondeadas en lugar de todo el catálogo. Los
+        productos plegados después del entrenamiento no están en el índice ni
+        en la tabla: se puntúan aparte y se mezclan con sus resultados.
+        puntuador: PuntuadorLotes del mismo modelo; sin índice, el SVD al vuelo
+        de las sesiones concurrentes se junta en un producto matricial por lote.
+        """
+        self.modelo_svd = modelo_svd
+        self.motor_vecinos = motor_vecinos
+        self.ratings = a_csr(ratings)
+        self.populares = np.asarray(populares).tolist()
+        self.presupuesto_ms = presupuesto_ms
+        self.n_vecinos = n_vecinos
+        self.top_n = top_n
+        self.indice = indice
+        self.puntuador = puntuador
+
+        # Código compartido y si se puede mostrar (p. ej. si existe en el catálogo) de cada
+        # columna; plegar un producto los reemplaza juntos, antes de que la columna exista
+        codigos_producto = np.asarray(codigos_producto)
+        if productos_validos is None:
+            validos = np.ones(len(codigos_producto), dtype=bool)
+        else:
+            validos = np.asarray(productos_validos, dtype=bool)
+        self._productos = (codigos_producto, validos)
+        self._excluidos_siempre = np.flatnonzero(~validos)
+        self._candado_productos = threading.Lock()
+
+        self._pool = ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='recomendador')
+        # Una tarea por hilo: cancel() no detiene una que ya corre, así que no se encola
+        # nada detrás de las lentas (sin cupo, la respuesta es la de popularidad)
+        self._cupos = threading.BoundedSemaphore(max_hilos)
+        self._latencias = {fuente: deque(maxlen=1000) for fuente in FUENTES}
+
+    def recomendar(self, user_index, n=6, estrategia='svd'):
+        """Top n códigos de producto para el usuario; nunca tarda más que el presupuesto"""
+        inicio = time.perf_counter()
+
+        # El SVD conoce también a los usuarios plegados; vecinos, solo a los de la matriz
+        n_usuarios = self.modelo_svd.n_usuarios if estrategia == 'svd' else self.ratings.shape[0]
+        if user_index is None or not 0 <= user_index < n_usuarios:
+            return self._popularidad(n, inicio)
+
+        precalculado = self.top_n is not None and n <= self.top_n.n and user_index < self.top_n.productos.shape[0]
+        if estrategia == 'svd' and precalculado and not self.modelo_svd.plegado(user_index):
+            return self._precalculado(user_index, n, inicio)
+
+        if estrategia == 'svd' and self.indice is not None:
+            futuro = self._enviar(self._top_n_aproximado, self.modelo_svd.factores(user_index), n,
+                                  self._excluir(user_index))
+        elif estrategia == 'svd' and self.puntuador is not None:
+            # Se encola sin pasar por el pool: el lote junta las consultas de todas las sesiones
+            futuro = self.puntuador.enviar(self.modelo_svd.factores(user_index), n, self._excluir(user_index))
+        else:
+            calcular = self._puntuar_svd if estrategia == 'svd' else self._puntuar_vecinos
+            futuro = self._enviar(self._top_n, calcular, user_index, n)
+        if futuro is None:
+            return self._popularidad(n, inicio)
+        try:
+            columnas, _ = futuro.result(timeout=self._restante_s(inicio))
+        except TimeoutError:
+            futuro.cancel()
+            return self._popularidad(n, inicio)
+
+        if not len(columnas):
+            return self._popularidad(n, inicio)
+        return self._registrar(self.codigos_producto[columnas].tolist(), estrategia, inicio)
+
+    def recomendar_nuevo(self, columnas, ratings, n=6):
+        """Top n para un usuario que no está en la matriz a partir de unos pocos ratings
+
+        Los ratings (columnas de la matriz, valores) se pliegan en el SVD solo
+        para esta consulta: el modelo compartido no cambia.
+        """
+        inicio = time.perf_counter()
+        columnas = np.asarray(columnas, dtype=np.int64)
+        if not len(columnas):
+            return self._popularidad(n, inicio)
+
+        factores = self.modelo_svd.proyectar(columnas, ratings)
+        excluir = np.concatenate([columnas, self._excluidos_siempre])
+        # Como en recomendar(): todo camino espera con el presupuesto y, sin cupo o sin tiempo, popularidad
+        if self.indice is not None:
+            futuro = self._enviar(self._top_n_aproximado, factores, n, excluir)
+        elif self.puntuador is not None:
+            futuro = self.puntuador.enviar(factores, n, excluir)
+        else:
+            futuro = self._enviar(self._top_n_factores, factores, n, excluir)
+        if futuro is None:
+            return self._popularidad(n, inicio)
+        try:
+            indices, _ = futuro.result(timeout=self._restante_s(inicio))
+        except TimeoutError:
+            futuro.cancel()
+            return self._popularidad(n, inicio)
+        productos = self.codigos_producto[indices].tolist()
+        if not productos:
+            return self._popularidad(n, inicio)
+        return self._registrar(productos, 'plegado', inicio)
+
+    def plegar_usuario(self, columnas, ratings, user_index=None):
+        """Incorpora ratings nuevos (de un usuario nuevo o existente) al SVD sin reentrenar"""
+        return self.modelo_svd.plegar_usuario(columnas, ratings, user_index)
+
+    def plegar_producto(self, codigo_producto, filas, ratings):
+        """Incorpora un producto nuevo (código compartido) al SVD desde sus primeros ratings"""
+        with self._candado_productos:
+            codigos_producto, validos = self._productos
+            # Primero su código: quien recibe la columna del modelo ya la puede traducir
+            self._productos = (np.append(codigos_producto, codigo_producto), np.append(validos, True))
+            return self.modelo_svd.plegar_producto(filas, ratings)
+
+    @property
+    def codigos_producto(self):
+        return self._productos[0]
+
+    def percentil_ms(self, q=99, fuente='svd'):
+        """Percentil de latencia observada (ms) para una fuente"""
+        muestras = self._latencias[fuente]
+        return float(np.percentile(muestras, q)) if muestras else 0.0
+
+    def _enviar(self, funcion, *args):
+        """Future de funcion en el pool, o None si todos los hilos siguen ocupados"""
+        if not self._cupos.acquire(blocking=False):
+            return None
+        futuro = self._pool.submit(funcion, *args)
+        futuro.add_done_callback(lambda _: self._cupos.release())
+        return futuro
+
+    def _restante_s(self, inicio):
+        return max(self.presupuesto_ms / 1000 - (time.perf_counter() - inicio), 0.0)
+
+    def _top_n(self, calcular, user_index, n):
+        """(columnas, scores) con score positivo, como los del índice y el puntuador"""
+        scores = calcular(user_index)
+        excluir = self._excluir(user_index)
+        # Los productos plegados no tienen columna en la matriz de vecinos
+        indices, valores = top_k(scores, n, excluir[excluir < len(scores)])
+        positivos = valores > 0
+        return indices[positivos], valores[positivos]
+
+    def _top_n_factores(self, factores, n, excluir):
+        indices, valores = top_k(self.modelo_svd.puntuar_factores(factores), n, excluir)
+        positivos = valores > 0
+        return indices[positivos], valores[positivos]
+
+    def _top_n_aproximado(self, factores, n, excluir):
+        columnas, scores = self.indice.recomendar_factores(factores * self.modelo_svd.sigma, n, excluir=excluir)
+        return self._con_nuevos(columnas, scores, factores, n, excluir)
+
+    def _con_nuevos(self, columnas, scores, factores, n, excluir):
+        """Top n de un resultado del índice o de la tabla junto con los productos plegados"""
+        nuevas, scores_nuevos = self.modelo_svd.puntuar_nuevos(factores)
+        if not len(nuevas):
+            return columnas, scores
+        columnas = np.concatenate([columnas, nuevas])
+        scores = np.concatenate([scores, scores_nuevos]).astype(np.float32)
+        scores[np.isin(columnas, excluir)] = -np.inf
+        indices, valores = top_k(scores, n)
+        positivos = valores > 0
+        return columnas[indices[positivos]], valores[positivos]
+
+    def _excluir(self, user_index):
+        return np.concatenate([self._calificados(user_index), self._excluidos_siempre])
+
+    def _puntuar_svd(self, user_index):
+        return self.modelo_svd.puntuar(user_index)
+
+    def _puntuar_vecinos(self, user_index):
+        # Ratings de los vecinos ponderados por su similitud
+        indices, sims = self.motor_vecinos.vecinos(user_index, self.n_vecinos)
+        return self.ratings[indices].T @ sims.astype(np.float32)
+
+    def _calificados(self, user_index):
+        return self.modelo_svd.calificados(user_index)
+
+    def _precalculado(self, user_index, n, inicio):
+        # Lectura O(1) de la fila del usuario en la tabla top-N
+        columnas, scores = self.top_n.fila_con_scores(user_index, n)
+        columnas, _ = self._con_nuevos(columnas, scores, self.modelo_svd.factores(user_index), n,
+                                       self._excluidos_siempre)
+        # Leídos después de las columnas: incluyen a todo producto plegado que estas traigan
+        codigos_producto, validos = self._productos
+        columnas = columnas[validos[columnas]]
+        if not len(columnas):
+            return self._popularidad(n, inicio)
+        return self._registrar(codigos_producto[columnas].tolist(), 'precalculado', inicio)
+
+    def _popularidad(self, n, inicio):
+        return self._registrar(self.populares[:n], 'popularidad', inicio)
+
+    def _registrar(self, productos, fuente, inicio):
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        self._latencias[fuente].append(latencia_ms)
+        observar(f'recomendar_{fuente}', latencia_ms / 1000)
+        return Recomendacion(productos, fuente, latencia_ms)
@@ -0,0 +1,259 @@
+"""
+Modelo de factores SVD entrenado una sola vez
+Puntúa un usuario como U[u] * sigma @ Vt (O(k × productos)) sin reconstruir
+la matriz completa de predicciones. Usuarios y productos nuevos, o ratings
+nuevos de un usuario, se pliegan (fold-in) proyectándolos sobre los factores
+entrenados, sin volver a correr svds: u = Vt[:, cols] @ r / sigma para un
+usuario y v = U[filas].T @ r / sigma para un producto. El modelo se comparte
+entre sesiones: cada pliegue publica una capa nueva en una sola asignación
+"""
+
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+from .matriz import MatrizRatings, a_csr
+from .seleccion import top_k, top_k_filas
+from .svd_aleatorio import svd_aleatorio
+
+# Capa de pliegue sobre los factores entrenados (que pueden estar mapeados en memoria y
+# ser de solo lectura): factores y ratings de los usuarios plegados, columnas de Vt de los
+# productos nuevos y prod_ids de todas las columnas. No se modifica: se reemplaza entera
+_Pliegue = namedtuple('_Pliegue', ['U', 'ratings', 'n_usuarios_nuevos', 'Vt', 'prod_ids'])
+
+
+class ModeloSVD:
+    """Factores U, sigma, Vt de la matriz de ratings y ratings conocidos para filtrar"""
+
+    def __init__(self, U, sigma, Vt, ratings, prod_ids=None):
+        self.U = np.ascontiguousarray(U, dtype=np.float32)
+        self.sigma = np.asarray(sigma, dtype=np.float32)
+        self.Vt = np.ascontiguousarray(Vt, dtype=np.float32)
+        self.ratings = a_csr(ratings)
+
+        # Quien puntúa lee self._pliegue una vez y ve una capa completa aunque otra
+        # sesión esté plegando; los pliegues, de a uno, parten de la capa vigente
+        self._pliegue = _Pliegue({}, {}, 0, np.empty((len(self.sigma), 0), dtype=np.float32),
+                                 np.arange(self.Vt.shape[1]) if prod_ids is None else np.asarray(prod_ids))
+        self._candado_pliegue = threading.Lock()
+
+    @classmethod
+    def entrenar(cls, matriz, n_factores=15):
+        """Descompone la matriz con svds; factores ordenados por valor singular"""
+        # scipy.sparse.linalg tarda en importarse y solo hace falta para entrenar
+        from scipy.sparse.linalg import svds
+
+        ratings = a_csr(matriz)
+        k = max(1, min(n_factores, min(ratings.shape) - 1))
+        U, sigma, Vt = svds(ratings, k=k)
+
+        orden = np.argsort(sigma)[::-1]
+        return cls(U[:, orden], sigma[orden], Vt[orden], ratings, _prod_ids(matriz))
+
+    @classmethod
+    def entrenar_aleatorio(cls, matriz, n_factores=15, sobremuestreo=10, iteraciones=2, tam_bloque=None, semilla=0):
+        """Como entrenar() pero con SVD aleatorizado por bloques de usuarios (ver svd_aleatorio)
+
+        La matriz puede estar mapeada desde los artefactos: solo se lee un
+        bloque a la vez.
+        """
+        ratings = a_csr(matriz)
+        U, sigma, Vt = svd_aleatorio(ratings, n_factores, sobremuestreo, iteraciones, tam_bloque, semilla)
+        return cls(U, sigma, Vt, ratings, _prod_ids(matriz))
+
+    @property
+    def prod_ids(self):
+        return self._pliegue.prod_ids
+
+    @property
+    def n_factores(self):
+        return len(self.sigma)
+
+    @property
+    def n_usuarios(self):
+        return self.U.shape[0] + self._pliegue.n_usuarios_nuevos
+
+    @property
+    def n_productos(self):
+        return self.Vt.shape[1] + self._pliegue.Vt.shape[1]
+
+    def factores(self, user_index):
+        """Vector de factores del usuario (el plegado si lo tiene)"""
+        plegado = self._pliegue.U.get(user_index)
+        return self.U[user_index] if plegado is None else plegado
+
+    def puntuar(self, user_index):
+        """Rating predicho del usuario para todos los productos"""
+        return self.puntuar_factores(self.factores(user_index))
+
+    def puntuar_factores(self, factores):
+        """Rating predicho para un vector de factores (usuario plegado o anónimo) o una fila por usuario"""
+        ponderados = factores * self.sigma
+        scores = ponderados @ self.Vt
+        nuevos = self._pliegue.Vt
+        if nuevos.shape[1]:
+            scores = np.concatenate([scores, ponderados @ nuevos], axis=-1)
+        return scores
+
+    def puntuar_nuevos(self, factores):
+        """(columnas, scores) de los productos plegados después del entrenamiento para un vector de factores"""
+        nuevos = self._pliegue.Vt
+        return np.arange(self.Vt.shape[1], self.Vt.shape[1] + nuevos.shape[1]), (factores * self.sigma) @ nuevos
+
+    def calificados(self, user_index):
+        """Índices de productos que el usuario ya calificó"""
+        return self._ratings_usuario(user_index)[0]
+
+    def plegado(self, user_index):
+        """True si el usuario tiene factores o ratings plegados después del entrenamiento"""
+        pliegue = self._pliegue
+        return user_index in pliegue.U or user_index in pliegue.ratings
+
+    # ========================================================================
+    # PLIEGUE (FOLD-IN)
+    # ========================================================================
+
+    def proyectar(self, columnas, ratings):
+        """Factores de un vector de ratings (columnas, valores) sobre Vt/sigma, sin guardarlos"""
+        columnas = np.asarray(columnas, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float32)
+        return self._Vt_columnas(columnas) @ ratings * self._inversa_sigma()
+
+    def proyectar_producto(self, factores, ratings):
+        """Factores de un producto a partir de los factores de quienes lo calificaron y sus ratings"""
+        return factores.T @ ratings * self._inversa_sigma()
+
+    def plegar_usuario(self, columnas, ratings, user_index=None):
+        """Agrega ratings de un usuario y recalcula sus factores; devuelve su user_index
+
+        Sin user_index crea un usuario nuevo; con él, los ratings se combinan con
+        los que el modelo ya conoce (el nuevo valor reemplaza al anterior).
+        """
+        with self._candado_pliegue:
+            pliegue = self._pliegue
+            n_usuarios_nuevos = pliegue.n_usuarios_nuevos
+            if user_index is None:
+                user_index = self.U.shape[0] + n_usuarios_nuevos
+                n_usuarios_nuevos += 1
+                conocidas, valores = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            else:
+                conocidas, valores = self._ratings_usuario(user_index, pliegue)
+
+            columnas, ratings = self._combinar(conocidas, valores, columnas, ratings)
+            self._pliegue = pliegue._replace(
+                U={**pliegue.U, user_index: self.proyectar(columnas, ratings)},
+                ratings={**pliegue.ratings, user_index: (columnas, ratings)},
+                n_usuarios_nuevos=n_usuarios_nuevos
+            )
+        return user_index
+
+    def plegar_producto(self, filas, ratings, prod_id=None):
+        """Agrega un producto nuevo desde los ratings de usuarios (filas); devuelve su columna
+
+        Los factores de los usuarios no cambian; el producto solo pasa a figurar
+        entre sus calificados para no recomendárselo.
+        """
+        filas = np.asarray(filas, dtype=np.int64)
+        ratings = np.asarray(ratings, dtype=np.float32)
+        with self._candado_pliegue:
+            pliegue = self._pliegue
+            factores = np.array([self.factores(fila) for fila in filas], dtype=np.float32).reshape(len(filas), -1)
+            v = self.proyectar_producto(factores, ratings)
+
+            columna = self.Vt.shape[1] + pliegue.Vt.shape[1]
+            ratings_plegados = dict(pliegue.ratings)
+            for fila, rating in zip(filas.tolist(), ratings):
+                conocidas, valores = self._ratings_usuario(fila, pliegue)
+                ratings_plegados[fila] = self._combinar(conocidas, valores, [columna], [rating])
+            self._pliegue = pliegue._replace(
+                ratings=ratings_plegados,
+                Vt=np.concatenate([pliegue.Vt, v.astype(np.float32)[:, np.newaxis]], axis=1),
+                prod_ids=np.append(pliegue.prod_ids, columna if prod_id is None else prod_id)
+            )
+        return columna
+
+    def _ratings_usuario(self, user_index, pliegue=None):
+        pliegue = self._pliegue if pliegue is None else pliegue
+        plegados = pliegue.ratings.get(user_index)
+        if plegados is not None:
+            return plegados
+        if user_index >= self.ratings.shape[0]:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        inicio, fin = self.ratings.indptr[user_index], self.ratings.indptr[user_index + 1]
+        return self.ratings.indices[inicio:fin], self.ratings.data[inicio:fin]
+
+    @staticmethod
+    def _combinar(columnas, valores, nuevas, nuevos):
+        """Une dos listas (columna, rating); ante columnas repetidas gana la última"""
+        columnas = np.concatenate([columnas, np.asarray(nuevas, dtype=np.int64)])
+        valores = np.concatenate([valores, np.asarray(nuevos, dtype=np.float32)])
+        _, ultimas = np.unique(columnas[::-1], return_index=True)
+        ultimas = len(columnas) - 1 - ultimas
+        return columnas[ultimas], valores[ultimas].astype(np.float32)
+
+    def _Vt_columnas(self, columnas):
+        base = columnas < self.Vt.shape[1]
+        if base.all():
+            return self.Vt[:, columnas]
+        Vt = np.empty((self.n_factores, len(columnas)), dtype=np.float32)
+        Vt[:, base] = self.Vt[:, columnas[base]]
+        Vt[:, ~base] = self._pliegue.Vt[:, columnas[~base] - self.Vt.shape[1]]
+        return Vt
+
+    def _inversa_sigma(self):
+        return np.divide(1.0, self.sigma, out=np.zeros_like(self.sigma), where=self.sigma > 0)
+
+    # ========================================================================
+    # RECOMENDACIÓN
+    # ========================================================================
+
+    def recomendar(self, user_index, n=5, excluir_calificados=True):
+        """Top n productos (índices, scores) con score positivo"""
+        excluir = self.calificados(user_index) if excluir_calificados else None
+        indices, scores = top_k(self.puntuar(user_index), n, excluir)
+
+        positivos = scores > 0
+        return indices[positivos], scores[positivos]
+
+    def recomendar_lote(self, user_indices, n=5, excluir=None):
+        """Top n (índices int32, scores float32) de un lote de usuarios en un solo producto matricial
+
+        Usa los factores entrenados (sin el pliegue). Excluye lo ya calificado y
+        las columnas de excluir; donde no hay n scores positivos el índice es -1
+        y el score 0.
+        """
+        user_indices = np.asarray(user_indices, dtype=np.int64)
+        scores = (self.U[user_indices] * self.sigma) @ self.Vt
+
+        calificados = self.ratings[user_indices]
+        filas = np.repeat(np.arange(len(user_indices)), np.diff(calificados.indptr))
+        scores[filas, calificados.indices] = -np.inf
+        if excluir is not None and len(excluir):
+            scores[:, excluir] = -np.inf
+
+        indices, valores = top_k_filas(scores, n)
+        positivos = valores > 0
+        return np.where(positivos, indices, -1).astype(np.int32), np.where(positivos, valores, 0).astype(np.float32)
+
+    def recomendar_ids(self, user_index, n=5, excluir_calificados=True):
+        """Top n productos como lista de prod_id"""
+        indices, _ = self.recomendar(user_index, n, excluir_calificados)
+        prod_ids = self.prod_ids[indices]
+        if prod_ids.dtype.kind == 'S':
+            prod_ids = np.char.decode(prod_ids)
+        return prod_ids.tolist()
+
+
+def _prod_ids(matriz):
+    return matriz.prod_ids if isinstance(matriz, MatrizRatings) else getattr(matriz, 'columns', None)
+
+
+def obtener_recomendaciones_svd(user_index, interactions_matrix, n_factors=15, n_recommendations=5):
+    """SVD-based recommendations"""
+    if isinstance(interactions_matrix, ModeloSVD):
+        modelo = interactions_matrix
+    else:
+        modelo = ModeloSVD.entrenar(interactions_matrix, n_factores=n_factors)
+
+    return modelo.recomendar_ids(user_index, n_recommendations)
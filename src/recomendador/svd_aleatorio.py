@@ -0,0 +1,109 @@
+"""
+SVD truncado aleatorizado por bloques de filas (alternativa a svds)
+La matriz de ratings se recorre en bloques de usuarios (una CSR mapeada desde
+los artefactos solo lee del disco el bloque en curso): cada pasada acumula
+Aᵀ(A Z) en un bosquejo productos × (k + sobremuestreo), que se ortonormaliza
+entre las iteraciones de potencia. Con la base Q de las filas, la SVD de A Q
+sale de una matriz (k + sobremuestreo)². Fuera de los factores, la memoria
+queda acotada por bloque × (k + sobremuestreo); las operaciones densas (QR,
+Gram, autovalores) van a BLAS y usan todos los núcleos
+"""
+
+import numpy as np
+
+from .matriz import MEMORIA_BLOQUE, a_csr
+
+
+def bloques_filas(ratings, tam_bloque):
+    """(inicio, bloque CSR) de tam_bloque filas; solo el bloque se copia a memoria"""
+    for inicio in range(0, ratings.shape[0], tam_bloque):
+        yield inicio, ratings[inicio:inicio + tam_bloque]
+
+
+def tam_bloque_por_defecto(ancho):
+    """Filas del bloque de modo que filas × ancho en float64 ocupen a lo sumo MEMORIA_BLOQUE"""
+    return int(max(1, MEMORIA_BLOQUE // (8 * max(ancho, 1))))
+
+
+def svd_aleatorio(matriz, k=15, sobremuestreo=10, iteraciones=2, tam_bloque=None, semilla=0):
+    """(U, sigma, Vt) con los k mayores valores singulares, de mayor a menor
+
+    sobremuestreo: columnas extra del bosquejo; iteraciones: pasadas de
+    potencia adicionales. Ambos suben la precisión (y el costo) cuando el
+    espectro decae lento.
+    """
+    ratings = a_csr(matriz)
+    n_usuarios, n_productos = ratings.shape
+    k = max(1, min(k, min(ratings.shape) - 1))
+    ancho = min(k + sobremuestreo, n_productos)
+    tam_bloque = tam_bloque or tam_bloque_por_defecto(ancho)
+
+    # El bosquejo viaja en float32 (como los ratings: scipy no convierte cada bloque);
+    # las sumas y la ortonormalización, en float64
+    rng = np.random.default_rng(semilla)
+    Z = _normal_por_bloques(ratings, rng.standard_normal((n_productos, ancho), dtype=np.float32), tam_bloque)
+    for _ in range(iteraciones):
+        Z = _normal_por_bloques(ratings, _ortonormal(Z), tam_bloque)
+    Q = _ortonormal(Z)
+
+    # SVD de A Q (usuarios × ancho) desde su Gram: A Q = U S Wᵀ ⇒ (A Q)ᵀ A Q = W S² Wᵀ.
+    # A Q no se guarda: cuesta una pasada más y ahorra usuarios × ancho en memoria
+    gram = np.zeros((ancho, ancho))
+    for _, bloque in bloques_filas(ratings, tam_bloque):
+        proyectado = bloque @ Q
+        gram += proyectado.T.astype(np.float64) @ proyectado
+    autovalores, W = np.linalg.eigh(gram)
+    orden = np.argsort(autovalores)[::-1][:k]
+    sigma = np.sqrt(np.maximum(autovalores[orden], 0))
+    inversa = np.divide(1.0, sigma, out=np.zeros_like(sigma), where=sigma > 0)
+
+    # Vt = (Q W)ᵀ y U = A Vtᵀ / sigma, por bloques
+    V = (Q.astype(np.float64) @ W[:, orden]).astype(np.float32)
+    U = np.empty((n_usuarios, k), dtype=np.float32)
+    for inicio, bloque in bloques_filas(ratings, tam_bloque):
+        U[inicio:inicio + bloque.shape[0]] = (bloque @ V) * inversa.astype(np.float32)
+    return U, sigma.astype(np.float32), np.ascontiguousarray(V.T)
+
+
+def error_reconstruccion(matriz, U, sigma, Vt, tam_bloque=None):
+    """||A - U diag(sigma) Vt||_F / ||A||_F por bloques, sin formar la reconstrucción densa
+
+    Por bloque B: ||B||² - 2 Σ (B Vtᵀ) ∘ (U_b S) + ||U_b S||² (filas de Vt ortonormales).
+    """
+    ratings = a_csr(matriz)
+    Vt = np.asarray(Vt, dtype=np.float64)
+    sigma = np.asarray(sigma, dtype=np.float64)
+    tam_bloque = tam_bloque or tam_bloque_por_defecto(len(sigma))
+
+    total = error = 0.0
+    for inicio, bloque in bloques_filas(ratings, tam_bloque):
+        US = np.asarray(U[inicio:inicio + bloque.shape[0]], dtype=np.float64) * sigma
+        cuadrado = float(bloque.multiply(bloque).sum())
+        total += cuadrado
+        error += cuadrado - 2 * float(np.sum((bloque @ Vt.T) * US)) + float(np.sum(US * US))
+    return float(np.sqrt(max(error, 0) / total)) if total else 0.0
+
+
+def _normal_por_bloques(ratings, Z, tam_bloque):
+    """Aᵀ (A Z) acumulado por bloques de filas"""
+    acumulado = np.zeros((ratings.shape[1], Z.shape[1]))
+    for _, bloque in bloques_filas(ratings, tam_bloque):
+        acumulado += bloque.T @ (bloque @ Z)
+    return acumulado
+
+
+def _ortonormal(Z):
+    """Base ortonormal de las columnas de Z (productos × ancho)
+
+    QR de Cholesky aplicada dos veces: dos Gram de ancho² y dos productos
+    matriciales, varias veces más rápida que la QR de Householder en matrices
+    tan altas y angostas; si Z tiene rango incompleto se usa la QR común.
+    """
+    Q = np.asarray(Z, dtype=np.float64)
+    try:
+        for _ in range(2):
+            R = np.linalg.cholesky(Q.T @ Q).T
+            Q = Q @ np.linalg.inv(R)
+    except np.linalg.LinAlgError:
+        Q, _ = np.linalg.qr(np.asarray(Z, dtype=np.float64))
+    return Q.astype(np.float32)
@@ -0,0 +1,71 @@
+"""
+Vecinos más cercanos entre usuarios por similitud coseno
+Trabaja sobre una matriz CSR normalizada por filas: una sola multiplicación
+dispersa por consulta y selección del top-k con argpartition
+"""
+
+import numpy as np
+from scipy import sparse
+
+from .matriz import a_csr
+from .seleccion import top_k_filas
+
+
+class VecinosUsuarios:
+    """Motor de usuarios similares sobre la matriz usuarios × productos"""
+
+    def __init__(self, matriz):
+        X = a_csr(matriz)
+        normas = np.sqrt(np.asarray(X.multiply(X).sum(axis=1)).ravel())
+        inversas = np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0)
+
+        # Filas de norma 1: el producto punto es directamente la similitud coseno
+        self.matriz = sparse.csr_matrix(sparse.diags(inversas.astype(np.float32)) @ X)
+        self._traspuesta = self.matriz.T.tocsr()
+
+    @property
+    def n_usuarios(self):
+        return self.matriz.shape[0]
+
+    def similitudes(self, user_index):
+        """Similitud coseno del usuario contra todos los usuarios (un mat-vec)"""
+        fila = self.matriz[user_index].toarray().ravel()
+        return self.matriz @ fila
+
+    def vecinos(self, user_index, n=5):
+        """Top n usuarios similares (índices, similitudes), excluyendo al propio usuario"""
+        indices, sims = self.vecinos_lote([user_index], n)
+        return indices[0], sims[0]
+
+    def vecinos_lote(self, user_indices, n=5):
+        """Top n vecinos para un lote de usuarios en una sola multiplicación dispersa"""
+        user_indices = np.asarray(user_indices, dtype=np.int64)
+        scores = (self.matriz[user_indices] @ self._traspuesta).toarray()
+
+        # El propio usuario nunca es su vecino
+        scores[np.arange(len(user_indices)), user_indices] = -np.inf
+        indices, sims = top_k_filas(scores, min(n, self.n_usuarios - 1))
+        return indices, sims
+
+    def precalcular(self, n=5, tam_bloque=1024):
+        """Vecinos de todos los usuarios por bloques; memoria acotada a tam_bloque × usuarios"""
+        k = min(n, self.n_usuarios - 1)
+        indices = np.empty((self.n_usuarios, max(k, 0)), dtype=np.int32)
+        sims = np.empty((self.n_usuarios, max(k, 0)), dtype=np.float32)
+
+        for inicio in range(0, self.n_usuarios, tam_bloque):
+            bloque = np.arange(inicio, min(inicio + tam_bloque, self.n_usuarios))
+            indices[bloque], sims[bloque] = self.vecinos_lote(bloque, k)
+
+        return indices, sims
+
+
+def encontrar_usuarios_similares(user_index, interactions_matrix, n=5):
+    """Encuentra usuarios similares mediante similitud coseno"""
+    if isinstance(interactions_matrix, VecinosUsuarios):
+        motor = interactions_matrix
+    else:
+        motor = VecinosUsuarios(interactions_matrix)
+
+    indices, _ = motor.vecinos(user_index, n)
+    return indices.tolist()
@@ -0,0 +1,148 @@
+"""
+Vecinos entre productos (item-item) por similitud coseno
+Se calcula una sola vez, por bloques de productos repartidos en hilos (los
+productos dispersos de scipy y argpartition liberan el GIL), y guarda el top-k
+de cada producto en arreglos de ancho fijo: "productos similares" es una sola
+lectura de fila. La memoria queda acotada por el bloque, no por productos²
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from .matriz import MEMORIA_BLOQUE, a_csr
+from .seleccion import top_k_filas
+
+ARCHIVO_INDICES = 'similares_indices.npy'
+ARCHIVO_SIMILITUDES = 'similares_valores.npy'
+
+
+class VecinosProductos:
+    """Top-k productos similares por columna de la matriz: índices int32 (-1 = vacío) y similitudes float32"""
+
+    def __init__(self, indices, similitudes):
+        self.indices = indices
+        self.similitudes = similitudes
+
+    @classmethod
+    def por_coratings(cls, matriz, k=10, validos=None, tam_bloque=None, max_hilos=None):
+        """Coseno entre columnas de la matriz de ratings (usuarios que calificaron ambos productos)"""
+        X = a_csr(matriz)
+        normas = np.sqrt(np.asarray(X.multiply(X).sum(axis=0)).ravel())
+        inversas = np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0)
+
+        # Columnas de norma 1: el producto punto es directamente la similitud coseno. X
+        # queda en CSR: con CSC, scipy lo convertiría de nuevo en cada bloque
+        X = sparse.csr_matrix(X @ sparse.diags(inversas.astype(np.float32)))
+        productos = X.T.tocsr()
+
+        # El bloque queda disperso: el top-k se toma solo entre los productos con co-ratings
+        def similitudes(filas):
+            return productos[filas] @ X
+        return cls._construir(similitudes, X.shape[1], k, validos, tam_bloque, max_hilos)
+
+    @classmethod
+    def por_factores(cls, Vt, k=10, validos=None, tam_bloque=None, max_hilos=None):
+        """Coseno entre los factores SVD de los productos (columnas de Vt)"""
+        V = np.ascontiguousarray(np.asarray(Vt, dtype=np.float32).T)
+        normas = np.linalg.norm(V, axis=1)
+        V = V * np.divide(1.0, normas, out=np.zeros_like(normas), where=normas > 0)[:, np.newaxis]
+
+        def similitudes(filas):
+            return V[filas] @ V.T
+        return cls._construir(similitudes, V.shape[0], k, validos, tam_bloque, max_hilos)
+
+    @classmethod
+    def _construir(cls, similitudes, n_productos, k, validos, tam_bloque, max_hilos):
+        k = max(0, min(k, n_productos - 1))
+        indices = np.full((n_productos, k), -1, dtype=np.int32)
+        valores = np.zeros((n_productos, k), dtype=np.float32)
+
+        # Solo se calculan (y solo se proponen) los productos válidos, p. ej. los del catálogo
+        if validos is None:
+            filas = np.arange(n_productos)
+            invalidos = np.empty(0, dtype=np.int64)
+        else:
+            validos = np.asarray(validos, dtype=bool)
+            filas = np.flatnonzero(validos)
+            invalidos = np.flatnonzero(~validos)
+        # Similitudes float32 de un bloque (tam_bloque × productos) en memoria a la vez, por hilo
+        tam_bloque = tam_bloque or int(max(1, min(4096, MEMORIA_BLOQUE // (4 * max(n_productos, 1)))))
+
+        def procesar(inicio):
+            bloque = filas[inicio:inicio + tam_bloque]
+            S = similitudes(bloque)
+            if sparse.issparse(S):
+                indices[bloque], valores[bloque] = _top_k_disperso(S, bloque, k, validos)
+                return
+            S = S.astype(np.float32, copy=False)
+            S[np.arange(len(bloque)), bloque] = -np.inf
+            if len(invalidos):
+                S[:, invalidos] = -np.inf
+            idx, sims = top_k_filas(S, k)
+            positivos = sims > 0
+            indices[bloque] = np.where(positivos, idx, -1)
+            valores[bloque] = np.where(positivos, sims, 0)
+
+        if k:
+            with ThreadPoolExecutor(max_workers=max_hilos, thread_name_prefix='similares') as pool:
+                list(pool.map(procesar, range(0, len(filas), tam_bloque)))
+        return cls(indices, valores)
+
+    @property
+    def k(self):
+        return self.indices.shape[1]
+
+    @property
+    def n_productos(self):
+        return self.indices.shape[0]
+
+    def similares(self, columna, n=None):
+        """(columnas, similitudes) del top n del producto, de mayor a menor; una lectura de fila"""
+        fila = self.indices[columna, :n]
+        presentes = fila >= 0
+        return fila[presentes], self.similitudes[columna, :n][presentes]
+
+    def guardar(self, directorio):
+        directorio = Path(directorio)
+        # Los índices van al final: su presencia indica que el par está completo
+        np.save(directorio / ARCHIVO_SIMILITUDES, self.similitudes, allow_pickle=False)
+        temporal = directorio / f'.{ARCHIVO_INDICES}'
+        np.save(temporal, self.indices, allow_pickle=False)
+        temporal.replace(directorio / ARCHIVO_INDICES)
+
+    @classmethod
+    def cargar(cls, directorio):
+        """Índice guardado en un directorio de versión (mapeado en memoria), o None si no existe"""
+        directorio = Path(directorio)
+        if not (directorio / ARCHIVO_INDICES).exists():
+            return None
+        return cls(
+            np.load(directorio / ARCHIVO_INDICES, mmap_mode='r', allow_pickle=False),
+            np.load(directorio / ARCHIVO_SIMILITUDES, mmap_mode='r', allow_pickle=False)
+        )
+
+
+def _top_k_disperso(S, bloque, k, validos=None):
+    """Top k por fila de un bloque disperso (sin el propio producto ni los inválidos), con relleno -1 / 0"""
+    S = S.tocoo()
+    conservar = (S.data > 0) & (S.col != bloque[S.row])
+    if validos is not None:
+        conservar &= validos[S.col]
+    filas, columnas, sims = S.row[conservar], S.col[conservar], S.data[conservar]
+
+    # Orden por fila y, dentro de la fila, por similitud descendente: una sola clave
+    # float64 con filas separadas por más que la mayor similitud (lexsort es varias veces más lento)
+    escala = 2.0 * float(sims.max()) + 1.0 if len(sims) else 1.0
+    orden = np.argsort(filas * escala - sims)
+    filas, columnas, sims = filas[orden], columnas[orden], sims[orden]
+    puesto = np.arange(len(filas)) - np.searchsorted(filas, filas)
+    top = puesto < k
+
+    indices = np.full((len(bloque), k), -1, dtype=np.int32)
+    valores = np.zeros((len(bloque), k), dtype=np.float32)
+    indices[filas[top], puesto[top]] = columnas[top]
+    valores[filas[top], puesto[top]] = sims[top]
+    return indices, valores
@@ -0,0 +1,160 @@
+"""
+Fixtures compartidas: el paquete desde src/ y un servidor local que habla la
+API de chat compatible con OpenAI (la que usa el cliente de Groq)
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+
+class ServidorChat:
+    """Servidor de prueba: registra cada pedido y responde según la configuración
+
+    no_disponibles: modelos que responden 400 'model_decommissioned'.
+    respuesta: texto de la respuesta completa.
+    fragmentos, pausa_s: con stream=True, los fragmentos se envían como eventos
+    SSE con pausa_s entre uno y otro (enviados guarda cuándo salió cada uno).
+    cortar_tras: con stream=True, cierra la conexión después de esa cantidad de
+    fragmentos, sin terminar la respuesta.
+    """
+
+    def __init__(self):
+        self.no_disponibles = set()
+        self.respuesta = 'respuesta de prueba'
+        self.fragmentos = ['Hola', ', ', 'mundo']
+        self.pausa_s = 0.0
+        self.cortar_tras = None
+        self.enviados = []
+        self.pedidos = []  # (modelo, puerto del cliente, stream)
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), self._manejador())
+        self._servidor.daemon_threads = True
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, puerto = self._servidor.server_address
+        return f'http://{host}:{puerto}'
+
+    @property
+    def modelos_pedidos(self):
+        return [modelo for modelo, _, _ in self.pedidos]
+
+    def iniciar(self):
+        self._hilo.start()
+        return self
+
+    def detener(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+    def responder(self, manejador, cuerpo):
+        """Escribe la respuesta al pedido ya registrado"""
+        modelo = cuerpo['model']
+        if modelo in self.no_disponibles:
+            manejador.enviar_json(400, {'error': {
+                'message': f'The model `{modelo}` has been decommissioned and is no longer supported.',
+                'type': 'invalid_request_error', 'code': 'model_decommissioned',
+            }})
+            return
+        if cuerpo.get('stream'):
+            self._enviar_stream(manejador, modelo)
+            return
+        manejador.enviar_json(200, {
+            'id': 'chatcmpl-prueba', 'object': 'chat.completion', 'created': 0, 'model': modelo,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': self.respuesta},
+                         'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+        })
+
+    def _enviar_stream(self, manejador, modelo):
+        manejador.send_response(200)
+        manejador.send_header('Content-Type', 'text/event-stream')
+        manejador.send_header('Transfer-Encoding', 'chunked')
+        manejador.end_headers()
+        eventos = [{
+            'id': 'chatcmpl-prueba', 'object': 'chat.completion.chunk', 'created': 0, 'model': modelo,
+            'choices': [{'index': 0, 'delta': {'content': fragmento}, 'finish_reason': None}],
+        } for fragmento in self.fragmentos]
+        try:
+            for i, evento in enumerate(eventos):
+                if i == self.cortar_tras:
+                    manejador.close_connection = True
+                    return
+                if i:
+                    time.sleep(self.pausa_s)
+                manejador.enviar_fragmento(f'data: {json.dumps(evento)}\n\n')
+                self.enviados.append(time.perf_counter())
+            manejador.enviar_fragmento('data: [DONE]\n\n')
+            manejador.enviar_fragmento('')
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # El cliente cerró el stream a mitad
+
+    def _manejador(self):
+        servidor = self
+
+        class Manejador(BaseHTTPRequestHandler):
+            # HTTP/1.1 (Content-Length o chunked): el cliente puede reutilizar la conexión
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                cuerpo = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                servidor.pedidos.append((cuerpo['model'], self.client_address[1], bool(cuerpo.get('stream'))))
+                servidor.responder(self, cuerpo)
+
+            def enviar_json(self, estado, contenido):
+                datos = json.dumps(contenido).encode()
+                self.send_response(estado)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def enviar_fragmento(self, texto):
+                """Un fragmento de Transfer-Encoding: chunked ('' cierra la respuesta)"""
+                datos = texto.encode()
+                self.wfile.write(f'{len(datos):x}\r\n'.encode() + datos + b'\r\n')
+                self.wfile.flush()
+
+            def log_message(self, *args):
+                pass
+
+        return Manejador
+
+
+@pytest.fixture
+def servidor_chat():
+    servidor = ServidorChat().iniciar()
+    yield servidor
+    servidor.detener()
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    """recomendador.chat con su estado de proceso (clientes, contexto, modelo vigente) vacío"""
+    pytest.importorskip('groq')
+    from recomendador import chat
+
+    monkeypatch.setattr(chat, '_clientes', {})
+    monkeypatch.setattr(chat, '_contexto_cacheado', (None, None))
+    monkeypatch.setattr(chat, '_modelo_vigente', None)
+    return chat
+
+
+@pytest.fixture
+def tablas():
+    """db_usuarios, db_productos, db_calificaciones mínimas"""
+    db_usuarios = pd.DataFrame({'user_id': ['u1', 'u2'], 'nombre_usuario': ['Ana', 'Luis'],
+                                'total_calificaciones': [2, 0]})
+    db_productos = pd.DataFrame({'prod_id': ['p1', 'p2'], 'nombre_producto': ['Camisa', 'Zapato'],
+                                 'precio': [1999, 4999], 'cantidad_resenas': [10, 3]})
+    db_calificaciones = pd.DataFrame({'user_id': ['u1', 'u1'], 'prod_id': ['p1', 'p2'], 'calificacion': [5, 4]})
+    return db_usuarios, db_productos, db_calificaciones
@@ -0,0 +1,61 @@
+"""
+Cliente de Groq compartido, orden de respaldo de modelos y caché del contexto,
+contra el servidor local de conftest
+"""
+
+API_KEY = 'clave-de-prueba'
+
+
+def test_un_cliente_y_una_conexion_para_todos_los_mensajes(chat, servidor_chat, tablas):
+    for _ in range(3):
+        respuesta = chat.responder_con_groq('¿hola?', *tablas, API_KEY, base_url=servidor_chat.base_url, huella='v1')
+        assert respuesta == 'respuesta de prueba'
+
+    assert chat.obtener_cliente(API_KEY, servidor_chat.base_url) is chat.obtener_cliente(API_KEY, servidor_chat.base_url)
+    assert len(chat._clientes) == 1
+    # Los tres pedidos llegaron por la misma conexión TCP (mismo puerto de origen)
+    assert len({puerto for _, puerto, _ in servidor_chat.pedidos}) == 1
+
+
+def test_respaldo_en_el_orden_de_la_lista(chat, servidor_chat, tablas):
+    primero, segundo, tercero = chat.MODELOS_GROQ
+    servidor_chat.no_disponibles = {primero, segundo}
+
+    respuesta = chat.responder_con_groq('¿hola?', *tablas, API_KEY, base_url=servidor_chat.base_url, huella='v1')
+
+    assert respuesta == 'respuesta de prueba'
+    assert servidor_chat.modelos_pedidos == [primero, segundo, tercero]
+
+
+def test_modelo_retirado_se_saltea_tras_funcionar_uno_posterior(chat, servidor_chat, tablas):
+    primero, segundo, _ = chat.MODELOS_GROQ
+    servidor_chat.no_disponibles = {primero}
+
+    chat.responder_con_groq('uno', *tablas, API_KEY, base_url=servidor_chat.base_url, huella='v1')
+    assert servidor_chat.modelos_pedidos == [primero, segundo]
+
+    servidor_chat.pedidos.clear()
+    chat.responder_con_groq('dos', *tablas, API_KEY, base_url=servidor_chat.base_url, huella='v1')
+    assert servidor_chat.modelos_pedidos == [segundo]
+
+
+def test_contexto_se_rearma_solo_si_cambia_la_huella(chat, servidor_chat, tablas, monkeypatch):
+    armados = []
+    original = chat.obtener_contexto_datos
+
+    def contar(*args):
+        armados.append(args)
+        return original(*args)
+
+    monkeypatch.setattr(chat, 'obtener_contexto_datos', contar)
+
+    for huella in ('v1', 'v1', 'v1', 'v2', 'v2'):
+        chat.responder_con_groq('¿hola?', *tablas, API_KEY, base_url=servidor_chat.base_url, huella=huella)
+    assert len(armados) == 2
+
+    # Sin huella, la versión son las propias tablas
+    chat.contexto_cacheado(*tablas)
+    chat.contexto_cacheado(*tablas)
+    assert len(armados) == 3
+    chat.contexto_cacheado(*(df.copy() for df in tablas))
+    assert len(armados) == 4
@@ -0,0 +1,77 @@
+"""
+Respuestas del chat en stream: fragmentos a medida que llegan y cierre a
+mitad, contra el servidor local de conftest
+"""
+
+import time
+
+API_KEY = 'clave-de-prueba'
+PAUSA_S = 0.2
+
+
+def test_fragmentos_llegan_a_medida_que_se_envian(chat, servidor_chat, tablas):
+    servidor_chat.fragmentos = ['Hola', ', ', 'mundo', '!']
+    servidor_chat.pausa_s = PAUSA_S
+    chat_history = []
+
+    def guardar_respuesta(texto, completa):
+        # Como la página Chat IA: la respuesta completa queda en el historial
+        chat_history.append({'role': 'assistant', 'content': texto, 'completa': completa})
+
+    recibidos = []
+    for fragmento in chat.responder_con_groq_stream('¿hola?', *tablas, API_KEY, base_url=servidor_chat.base_url,
+                                                    al_terminar=guardar_respuesta, huella='v1'):
+        recibidos.append((fragmento, time.perf_counter()))
+
+    assert [fragmento for fragmento, _ in recibidos] == servidor_chat.fragmentos
+    # Cada fragmento se entrega antes de que el servidor mande el siguiente
+    for (_, recibido), enviado_siguiente in zip(recibidos, servidor_chat.enviados[1:]):
+        assert recibido < enviado_siguiente
+    assert chat_history == [{'role': 'assistant', 'content': 'Hola, mundo!', 'completa': True}]
+
+
+def test_cerrar_a_mitad_avisa_el_texto_parcial(chat, servidor_chat, tablas):
+    servidor_chat.fragmentos = ['Hola', ', ', 'mundo', '!']
+    servidor_chat.pausa_s = PAUSA_S
+    terminados = []
+
+    generador = chat.responder_con_groq_stream('¿hola?', *tablas, API_KEY, base_url=servidor_chat.base_url,
+                                               al_terminar=lambda texto, completa: terminados.append((texto, completa)),
+                                               huella='v1')
+    assert next(generador) == 'Hola'
+    assert next(generador) == ', '
+    generador.close()
+
+    assert terminados == [('Hola, ', False)]
+
+
+def test_error_a_mitad_queda_aparte_e_incompleto(chat, servidor_chat, tablas):
+    servidor_chat.fragmentos = ['Hola', ', ', 'mundo', '!']
+    servidor_chat.cortar_tras = 2
+    terminados = []
+
+    recibidos = list(chat.responder_con_groq_stream(
+        '¿hola?', *tablas, API_KEY, base_url=servidor_chat.base_url,
+        al_terminar=lambda texto, completa: terminados.append((texto, completa)), huella='v1'
+    ))
+
+    assert recibidos[:2] == ['Hola', ', ']
+    assert len(recibidos) == 3 and recibidos[2].startswith('\n\n❌')
+    assert terminados == [('Hola, ' + recibidos[2], False)]
+
+
+def test_error_antes_del_primer_fragmento_es_la_respuesta(chat, servidor_chat, tablas, monkeypatch):
+    def fallar(*args):
+        raise RuntimeError('tablas ilegibles')
+
+    monkeypatch.setattr(chat, 'obtener_contexto_datos', fallar)
+    terminados = []
+
+    recibidos = list(chat.responder_con_groq_stream(
+        '¿hola?', *tablas, API_KEY, base_url=servidor_chat.base_url,
+        al_terminar=lambda texto, completa: terminados.append((texto, completa)), huella='v1'
+    ))
+
+    assert len(recibidos) == 1 and recibidos[0].startswith('❌') and 'tablas ilegibles' in recibidos[0]
+    assert terminados == [(recibidos[0], True)]
+    assert servidor_chat.pedidos == []
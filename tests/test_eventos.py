@@ -0,0 +1,169 @@
+"""
+Registro de calificaciones y agregados incrementales frente al recálculo con
+groupby; compactación del registro en las tablas base
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from recomendador.columnar import convertir_tabla, leer_tabla
+from recomendador.eventos import ARCHIVO_EVENTOS, SUFIJO_COMPACTANDO, AgregadosRatings, RegistroEventos, compactar
+
+MIN_RATINGS = 50
+
+
+@pytest.fixture
+def base():
+    """Ratings de la carga: 'cerca' queda a 3 del umbral, 'activo' ya lo pasó, 'poco' lejos"""
+    rng = np.random.default_rng(0)
+    usuarios = ['cerca'] * (MIN_RATINGS - 3) + ['activo'] * (MIN_RATINGS + 10) + ['poco'] * 5
+    return pd.DataFrame({
+        'user_id': usuarios,
+        'prod_id': [f'P{i}' for i in rng.integers(0, 8, len(usuarios))],
+        'rating': rng.integers(1, 6, len(usuarios)).astype(float),
+    })
+
+
+@pytest.fixture
+def eventos():
+    """Lote de eventos: 'cerca' cruza el umbral en su tercer evento; 'nuevo' y 'P9' no estaban en la carga"""
+    return pd.DataFrame([
+        ('activo', 'P1', 5), ('cerca', 'P2', 4), ('nuevo', 'P1', 3), ('cerca', 'P3', 2),
+        ('activo', 'P9', 4), ('cerca', 'P2', 5), ('poco', 'P1', 1), ('cerca', 'P9', 3), ('activo', 'P2', 1),
+    ], columns=['user_id', 'prod_id', 'rating'])
+
+
+def _agregados(base):
+    counts = base['user_id'].value_counts()
+    elegibles = base[base['user_id'].map(counts) >= MIN_RATINGS]
+    popularidad = _popularidad(elegibles)
+    return AgregadosRatings.desde_carga(popularidad, counts, MIN_RATINGS)
+
+
+def _popularidad(ratings):
+    return pd.DataFrame({
+        'avg_rating': ratings.groupby('prod_id')['rating'].mean(),
+        'rating_count': ratings.groupby('prod_id')['rating'].count(),
+    })
+
+
+def _esperados(base, eventos):
+    """groupby sobre todo: carga de los elegibles más cada evento desde que su usuario llega al umbral"""
+    counts = base['user_id'].value_counts()
+    todos = pd.concat([base, eventos], ignore_index=True)
+    acumuladas = eventos['user_id'].map(counts).fillna(0) + eventos.groupby('user_id').cumcount() + 1
+    cuentan = pd.concat([base[base['user_id'].map(counts) >= MIN_RATINGS], eventos[acumuladas >= MIN_RATINGS]])
+    return _popularidad(cuentan), todos['user_id'].value_counts()
+
+
+def _comparar(agregados, base, eventos):
+    popularidad, counts = _esperados(base, eventos)
+    obtenida = agregados.popularidad()
+    pd.testing.assert_series_equal(obtenida['avg_rating'].sort_index(), popularidad['avg_rating'].sort_index(),
+                                   check_names=False)
+    np.testing.assert_array_equal(obtenida['rating_count'].sort_index(), popularidad['rating_count'].sort_index())
+    assert agregados.counts().sort_index().to_dict() == counts.sort_index().to_dict()
+    for prod_id, fila in popularidad.iterrows():
+        assert agregados.producto(prod_id) == (pytest.approx(fila['avg_rating']), fila['rating_count'])
+
+
+@pytest.mark.parametrize('forma', ['aplicar', 'aplicar_lote', 'registro'])
+def test_agregados_incrementales_igual_que_groupby(base, eventos, forma, tmp_path):
+    agregados = _agregados(base)
+    assert agregados.elegibles == 1
+
+    if forma == 'aplicar':
+        for evento in eventos.itertuples(index=False):
+            agregados.aplicar(*evento)
+    elif forma == 'aplicar_lote':
+        agregados.aplicar_lote(eventos['user_id'], eventos['prod_id'], eventos['rating'])
+    else:
+        registro = RegistroEventos(tmp_path)
+        # En dos tandas: la segunda lectura solo trae lo nuevo
+        registro.agregar_lote([(*evento, '2024-01-01') for evento in eventos[:4].itertuples(index=False)])
+        assert agregados.actualizar(registro) == 4
+        registro.agregar_lote([(*evento, None) for evento in eventos[4:].itertuples(index=False)])
+        assert agregados.actualizar(registro) == len(eventos) - 4
+        assert agregados.actualizar(registro) == 0
+
+    assert agregados.eventos == len(eventos)
+    _comparar(agregados, base, eventos)
+    # 'cerca' cruza el umbral: cuenta desde ese evento ('P9' con 4 de 'activo' y 3 de 'cerca')
+    assert agregados.elegibles == 2 and agregados.nuevos_elegibles == ['cerca']
+    assert agregados.ratings_usuario('cerca') == MIN_RATINGS + 1
+    assert agregados.producto('P9') == (3.5, 2)
+    # Los de usuarios bajo el umbral no cuentan
+    assert agregados.ratings_usuario('nuevo') == 1
+    assert agregados.producto('P1')[1] == _popularidad(base[base['user_id'] == 'activo']).loc['P1', 'rating_count'] + 1
+
+
+def test_aplicar_en_varios_lotes(base, eventos):
+    agregados = _agregados(base)
+    for inicio in range(0, len(eventos), 2):
+        lote = eventos[inicio:inicio + 2]
+        agregados.aplicar_lote(lote['user_id'], lote['prod_id'], lote['rating'])
+    _comparar(agregados, base, eventos)
+    assert agregados.nuevos_elegibles == ['cerca']
+
+
+@pytest.fixture
+def datos(tmp_path):
+    """Tablas base con 2 ratings; db_calificaciones_completo también en Parquet"""
+    (tmp_path / 'db_calificaciones_completo.csv').write_text(
+        'user_id,prod_id,calificacion,fecha\nU1,P1,5,2024-01-01\nU2,P2,3,2024-01-02\n', encoding='utf-8'
+    )
+    (tmp_path / 'ratings_Electronics.csv').write_text('U1,P1,5,1704067200\nU2,P2,3,1704153600\n', encoding='utf-8')
+    convertir_tabla(tmp_path, 'db_calificaciones_completo')
+    return tmp_path
+
+
+def test_compactar_pliega_el_registro_y_lo_vacia(datos):
+    registro = RegistroEventos(datos)
+    registro.agregar_lote([('U3', 'P1', 4, '2024-02-01'), ('U1', 'P3', 2, '2024-02-02')])
+
+    assert compactar(datos) == {'db_calificaciones_completo': 2, 'ratings_Electronics': 2}
+
+    assert not (datos / ARCHIVO_EVENTOS).exists()
+    assert not (datos / (ARCHIVO_EVENTOS + SUFIJO_COMPACTANDO)).exists()
+    assert not list(datos.glob('*.tmp'))
+    calificaciones, _ = leer_tabla(datos, 'db_calificaciones_completo')
+    assert calificaciones['user_id'].astype(str).tolist() == ['U1', 'U2', 'U3', 'U1']
+    assert calificaciones['calificacion'].tolist() == [5, 3, 4, 2]
+    csv = pd.read_csv(datos / 'db_calificaciones_completo.csv')
+    assert csv['prod_id'].tolist() == ['P1', 'P2', 'P1', 'P3']
+    ratings, _ = leer_tabla(datos, 'ratings_Electronics')
+    assert ratings['prod_id'].astype(str).tolist() == ['P1', 'P2', 'P1', 'P3']
+    assert ratings['timestamp'].tolist()[2:] == [1706745600, 1706832000]
+
+    # Sin eventos nuevos no hay nada que compactar; los que llegan después van a un registro nuevo
+    assert compactar(datos) == {}
+    registro.agregar('U4', 'P2', 5, '2024-03-01')
+    eventos, _, _ = registro.leer_nuevos()
+    assert eventos['user_id'].tolist() == ['U4']
+    assert compactar(datos) == {'db_calificaciones_completo': 1, 'ratings_Electronics': 1}
+    assert len(leer_tabla(datos, 'db_calificaciones_completo')[0]) == 5
+
+
+def test_compactacion_interrumpida_se_retoma(datos, monkeypatch):
+    from recomendador import eventos as modulo_eventos
+
+    RegistroEventos(datos).agregar('U3', 'P1', 4, '2024-02-01')
+    original = modulo_eventos.anexar_tabla
+
+    def fallar(directorio, tabla, df):
+        if tabla == 'ratings_Electronics':
+            raise OSError('disco lleno')
+        return original(directorio, tabla, df)
+
+    monkeypatch.setattr(modulo_eventos, 'anexar_tabla', fallar)
+    with pytest.raises(OSError):
+        compactar(datos)
+    # Las tablas quedan como estaban y el registro pendiente sigue ahí
+    assert len(leer_tabla(datos, 'db_calificaciones_completo')[0]) == 2
+    assert (datos / (ARCHIVO_EVENTOS + SUFIJO_COMPACTANDO)).exists()
+    assert not list(datos.glob('*.tmp'))
+
+    monkeypatch.undo()
+    assert compactar(datos) == {'db_calificaciones_completo': 1, 'ratings_Electronics': 1}
+    assert len(leer_tabla(datos, 'db_calificaciones_completo')[0]) == 3
@@ -0,0 +1,50 @@
+"""
+Índice aproximado (IVF): búsqueda frente al top exacto y máscara de válidos
+"""
+
+import numpy as np
+import pytest
+
+from recomendador.indice_aproximado import IndiceIVF
+
+
+@pytest.fixture
+def vectores():
+    return np.random.default_rng(0).normal(size=(200, 8)).astype(np.float32)
+
+
+@pytest.mark.parametrize('metrica', ['producto', 'coseno'])
+def test_sondeando_todas_las_listas_es_exacto(vectores, metrica):
+    indice = IndiceIVF.construir(vectores, metrica, n_listas=10)
+    consulta = vectores[3] + 0.1
+
+    columnas, _ = indice.buscar(consulta, k=5, n_sondeos=indice.n_listas)
+
+    if metrica == 'coseno':
+        vectores = vectores / np.linalg.norm(vectores, axis=1, keepdims=True)
+    assert columnas.tolist() == np.argsort(-(vectores @ consulta), kind='stable')[:5].tolist()
+
+
+def test_solo_indexa_los_validos(vectores):
+    validos = np.zeros(len(vectores), dtype=bool)
+    validos[::3] = True
+
+    indice = IndiceIVF.construir(vectores, validos=validos)
+
+    assert indice.n_productos == validos.sum()
+    columnas, _ = indice.buscar(vectores[0], k=20, n_sondeos=indice.n_listas)
+    assert validos[columnas].all()
+
+
+@pytest.mark.parametrize('metrica', ['producto', 'coseno'])
+def test_sin_validos_el_indice_queda_vacio(vectores, metrica, tmp_path):
+    indice = IndiceIVF.construir(vectores, metrica, validos=np.zeros(len(vectores), dtype=bool))
+
+    assert indice.n_productos == 0
+    columnas, scores = indice.recomendar_factores(vectores[0], n=5)
+    assert len(columnas) == len(scores) == 0
+    assert len(indice.similares(0)[0]) == 0
+    assert indice.recall(vectores[:4], k=5) == 1.0
+
+    indice.guardar(tmp_path)
+    assert len(IndiceIVF.cargar(tmp_path, metrica).buscar(vectores[0])[0]) == 0
@@ -0,0 +1,103 @@
+"""
+Tabla top-N precalculada: corrida completa y corrida interrumpida que se retoma
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+
+from recomendador import precalculo
+from recomendador.artefactos import cargar_artefactos, guardar_artefactos
+from recomendador.matriz import MatrizRatings
+from recomendador.svd import ModeloSVD
+
+N_USUARIOS = 50
+TAM_BLOQUE = 8  # 7 bloques: el último, de 2 usuarios
+PROCESAR_BLOQUE = precalculo._procesar_bloque
+
+
+class Interrupcion(Exception):
+    pass
+
+
+@pytest.fixture
+def version(tmp_path):
+    """Versión de artefactos publicada en tmp_path/modelos"""
+    rng = np.random.default_rng(0)
+    ratings = sparse.random(N_USUARIOS, 30, density=0.3, format='csr', dtype=np.float32, random_state=rng,
+                            data_rvs=lambda k: rng.integers(1, 6, k))
+    matriz = MatrizRatings(ratings, np.array([f'U{i:03d}' for i in range(N_USUARIOS)]),
+                           np.array([f'P{i:03d}' for i in range(30)]))
+    popularidad = pd.DataFrame({'avg_rating': np.zeros(30), 'rating_count': np.zeros(30, dtype=int)},
+                               index=pd.Index(matriz.productos.ids_texto(), name='prod_id'))
+    directorio_base = tmp_path / 'modelos'
+    return directorio_base, guardar_artefactos(directorio_base, matriz, ModeloSVD.entrenar(matriz, 5), popularidad)
+
+
+def _contar_bloques(monkeypatch, interrumpir_tras=None):
+    """Registra los bloques que se calculan; con interrumpir_tras, falla en el siguiente"""
+    calculados = []
+
+    def procesar(inicio, fin):
+        if interrumpir_tras is not None and len(calculados) == interrumpir_tras:
+            raise Interrupcion()
+        calculados.append(inicio)
+        return PROCESAR_BLOQUE(inicio, fin)
+
+    monkeypatch.setattr(precalculo, '_procesar_bloque', procesar)
+    return calculados
+
+
+def _precalcular(directorio_base, version):
+    return precalculo.precalcular_top_n(directorio_base, version, n=5, tam_bloque=TAM_BLOQUE, max_procesos=1)
+
+
+def test_corrida_interrumpida_se_retoma_sin_recalcular(version, monkeypatch):
+    directorio_base, nombre = version
+    directorio = directorio_base / nombre
+
+    calculados = _contar_bloques(monkeypatch, interrumpir_tras=3)
+    with pytest.raises(Interrupcion):
+        _precalcular(directorio_base, nombre)
+    assert calculados == [0, 8, 16]
+    # A medias no hay tabla publicada; el progreso queda en disco
+    assert precalculo.cargar_top_n(directorio) is None
+    assert (directorio / precalculo.ARCHIVO_PROGRESO).exists()
+
+    calculados = _contar_bloques(monkeypatch)
+    meta = _precalcular(directorio_base, nombre)
+    assert calculados == [24, 32, 40, 48]
+    assert meta['bloques_calculados'] == 4
+    assert not (directorio / precalculo.ARCHIVO_PROGRESO).exists()
+    assert not list(directorio.glob('*' + precalculo.SUFIJO_TEMPORAL))
+
+    # Igual que una corrida sin interrupciones: recomendar_lote de todos los usuarios de una vez
+    retomada = precalculo.cargar_top_n(directorio)
+    productos, scores = cargar_artefactos(directorio_base, nombre).modelo.recomendar_lote(np.arange(N_USUARIOS), 5)
+    np.testing.assert_array_equal(retomada.productos, productos)
+    np.testing.assert_allclose(retomada.scores, scores)
+
+    # Con la tabla completa y los mismos parámetros no se recalcula nada
+    calculados = _contar_bloques(monkeypatch)
+    assert _precalcular(directorio_base, nombre)['bloques_calculados'] == 0
+    assert calculados == []
+
+
+def test_la_tabla_publicada_se_sirve_mientras_se_recalcula(version, monkeypatch):
+    directorio_base, nombre = version
+    directorio = directorio_base / nombre
+    _precalcular(directorio_base, nombre)
+    anterior = precalculo.cargar_top_n(directorio)
+    marca = precalculo.marca_top_n(directorio)
+    productos = np.array(anterior.productos)
+
+    # Otra n: la corrida nueva arranca de cero en los temporales y se interrumpe
+    _contar_bloques(monkeypatch, interrumpir_tras=2)
+    with pytest.raises(Interrupcion):
+        precalculo.precalcular_top_n(directorio_base, nombre, n=3, tam_bloque=TAM_BLOQUE, max_procesos=1)
+
+    vigente = precalculo.cargar_top_n(directorio)
+    assert vigente.n == 5 and precalculo.marca_top_n(directorio) == marca
+    np.testing.assert_array_equal(vigente.productos, productos)
+    np.testing.assert_array_equal(anterior.productos, productos)
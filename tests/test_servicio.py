@@ -0,0 +1,62 @@
+"""
+Servicio de recomendaciones: presupuesto de latencia y respaldo por popularidad
+"""
+
+import threading
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from recomendador import IndiceIVF, ModeloSVD, ServicioRecomendaciones
+
+POPULARES = [900, 901, 902]
+
+
+@pytest.fixture
+def modelo():
+    rng = np.random.default_rng(0)
+    ratings = sparse.random(40, 30, density=0.3, format='csr', dtype=np.float32, random_state=rng,
+                            data_rvs=lambda k: rng.integers(1, 6, k))
+    return ModeloSVD.entrenar(ratings, n_factores=5)
+
+
+def servicio(modelo, **opciones):
+    return ServicioRecomendaciones(modelo, None, modelo.ratings, np.arange(modelo.n_productos), POPULARES,
+                                   presupuesto_ms=50.0, **opciones)
+
+
+class IndiceLento:
+    """Índice que no responde hasta que se lo suelta"""
+
+    def __init__(self, indice):
+        self.indice = indice
+        self.soltar = threading.Event()
+
+    def recomendar_factores(self, *args, **opciones):
+        self.soltar.wait()
+        return self.indice.recomendar_factores(*args, **opciones)
+
+
+@pytest.mark.parametrize('con_indice', [False, True])
+def test_usuario_nuevo_plegado(modelo, con_indice):
+    indice = IndiceIVF.para_modelo(modelo, n_listas=1) if con_indice else None
+
+    recomendacion = servicio(modelo, indice=indice).recomendar_nuevo([0, 1], [5, 4], n=4)
+
+    assert recomendacion.fuente == 'plegado'
+    scores = modelo.puntuar_factores(modelo.proyectar([0, 1], [5, 4]))
+    scores[[0, 1]] = -np.inf
+    assert recomendacion.productos == np.argsort(-scores, kind='stable')[:len(recomendacion.productos)].tolist()
+
+
+def test_usuario_nuevo_con_indice_lento_respeta_el_presupuesto(modelo):
+    lento = IndiceLento(IndiceIVF.para_modelo(modelo, n_listas=1))
+    try:
+        recomendacion = servicio(modelo, indice=lento).recomendar_nuevo([0, 1], [5, 4], n=3)
+    finally:
+        lento.soltar.set()
+
+    assert recomendacion.fuente == 'popularidad'
+    assert recomendacion.productos == POPULARES
+    assert recomendacion.latencia_ms < 500
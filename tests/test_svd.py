@@ -0,0 +1,149 @@
+"""
+Pliegue (fold-in) en el SVD: proyecciones, usuarios y productos nuevos, y
+consultas concurrentes con los pliegues
+"""
+
+import threading
+
+import numpy as np
+import pytest
+from scipy import sparse
+
+from recomendador import IndiceIVF, ModeloSVD, ServicioRecomendaciones
+from recomendador.precalculo import TablaTopN
+
+
+@pytest.fixture
+def ratings():
+    rng = np.random.default_rng(0)
+    return sparse.random(60, 40, density=0.3, format='csr', dtype=np.float32, random_state=rng,
+                         data_rvs=lambda k: rng.integers(1, 6, k))
+
+
+@pytest.fixture
+def modelo(ratings):
+    return ModeloSVD.entrenar(ratings, n_factores=6)
+
+
+def test_proyectar_los_ratings_de_un_usuario_reproduce_sus_factores(modelo, ratings):
+    for user_index in (0, 7, 31):
+        fila = ratings[user_index]
+        np.testing.assert_allclose(modelo.proyectar(fila.indices, fila.data), modelo.U[user_index], atol=1e-4)
+
+
+def test_proyectar_producto_reproduce_su_columna_de_vt(modelo, ratings):
+    columna = ratings[:, 5].tocsc()
+    filas = columna.indices
+    v = modelo.proyectar_producto(modelo.U[filas], columna.data)
+    np.testing.assert_allclose(v, modelo.Vt[:, 5], atol=1e-4)
+
+
+def test_plegar_usuario_nuevo(modelo):
+    n_usuarios = modelo.n_usuarios
+
+    user_index = modelo.plegar_usuario([1, 2], [5, 3])
+
+    assert user_index == n_usuarios and modelo.n_usuarios == n_usuarios + 1
+    assert modelo.plegado(user_index)
+    assert sorted(modelo.calificados(user_index).tolist()) == [1, 2]
+    np.testing.assert_allclose(modelo.factores(user_index), modelo.proyectar([1, 2], [5, 3]))
+    # Un segundo usuario nuevo no pisa al primero
+    assert modelo.plegar_usuario([3], [4]) == n_usuarios + 1
+
+
+def test_plegar_usuario_existente_combina_sus_ratings(modelo, ratings):
+    fila = ratings[0]
+    columna, nueva = fila.indices[0], int(np.setdiff1d(np.arange(ratings.shape[1]), fila.indices)[0])
+
+    modelo.plegar_usuario([columna, nueva], [1, 4], user_index=0)
+
+    conocidas = dict(zip(fila.indices.tolist(), fila.data.tolist()))
+    conocidas.update({int(columna): 1.0, nueva: 4.0})
+    columnas = np.array(sorted(conocidas))
+    np.testing.assert_allclose(modelo.factores(0), modelo.proyectar(columnas, [conocidas[c] for c in columnas]),
+                               atol=1e-5)
+    assert sorted(modelo.calificados(0).tolist()) == columnas.tolist()
+    assert not modelo.plegado(1)
+
+
+def test_plegar_producto(modelo, ratings):
+    n_productos = modelo.n_productos
+    # Los mismos ratings que el producto 5: sus factores quedan iguales a los de su columna
+    original = ratings[:, 5].tocsc()
+
+    columna = modelo.plegar_producto(original.indices, original.data, prod_id='nuevo')
+
+    assert columna == n_productos and modelo.n_productos == n_productos + 1
+    assert modelo.prod_ids[columna] == 'nuevo'
+    for user_index in (0, 9):
+        scores = modelo.puntuar(user_index)
+        assert len(scores) == modelo.n_productos
+        assert scores[columna] == pytest.approx(scores[5], abs=1e-3)
+    # Quienes lo calificaron lo tienen entre sus calificados; el resto, no
+    assert columna in modelo.calificados(int(original.indices[0]))
+    sin_calificar = int(np.setdiff1d(np.arange(ratings.shape[0]), original.indices)[0])
+    assert columna not in modelo.calificados(sin_calificar)
+    assert not modelo.plegado(sin_calificar)
+    # Un usuario puede calificarlo después
+    modelo.plegar_usuario([columna], [5], user_index=sin_calificar)
+    assert columna in modelo.calificados(sin_calificar)
+
+
+def _servicio(modelo, **opciones):
+    return ServicioRecomendaciones(modelo, None, modelo.ratings, np.arange(modelo.n_productos) + 100,
+                                   [0, 1, 2], presupuesto_ms=1000.0, **opciones)
+
+
+def _tabla(modelo, n=5):
+    productos, scores = modelo.recomendar_lote(np.arange(modelo.U.shape[0]), n)
+    return TablaTopN(productos, scores, {'n': n})
+
+
+@pytest.mark.parametrize('camino', ['tabla', 'indice', 'puntuar'])
+def test_producto_plegado_llega_a_todos_los_caminos(modelo, ratings, camino):
+    opciones = {'tabla': {'top_n': _tabla(modelo)}, 'indice': {'indice': IndiceIVF.para_modelo(modelo, n_listas=2)},
+                'puntuar': {}}[camino]
+    servicio = _servicio(modelo, **opciones)
+    # Un producto que calificaron con 5 los usuarios más parecidos al 0 (no él): su mejor score
+    parecidos = np.argsort(-(modelo.U @ modelo.U[0]))[:21]
+    parecidos = parecidos[parecidos != 0]
+
+    columna = servicio.plegar_producto(999, parecidos, np.full(len(parecidos), 5.0))
+
+    assert servicio.codigos_producto[columna] == 999
+    recomendacion = servicio.recomendar(0, n=3)
+    assert recomendacion.productos[0] == 999
+    assert recomendacion.fuente == ('precalculado' if camino == 'tabla' else 'svd')
+    # Plegar los ratings del usuario 0 como anónimo da sus mismos factores
+    assert servicio.recomendar_nuevo(ratings[0].indices, ratings[0].data, n=3).productos[0] == 999
+
+
+def test_consultas_concurrentes_con_pliegues(modelo):
+    servicio = _servicio(modelo, indice=IndiceIVF.para_modelo(modelo, n_listas=2))
+    errores = []
+    fin = threading.Event()
+
+    def consultar():
+        while not fin.is_set():
+            try:
+                for user_index in range(10):
+                    assert len(modelo.puntuar(user_index)) >= modelo.Vt.shape[1]
+                    servicio.recomendar(user_index, n=5)
+                    servicio.recomendar_nuevo([0, 1], [5, 4], n=5)
+            except Exception as error:
+                errores.append(error)
+                return
+
+    hilos = [threading.Thread(target=consultar) for _ in range(4)]
+    for hilo in hilos:
+        hilo.start()
+    for i in range(50):
+        servicio.plegar_producto(1000 + i, [i % 60, (i + 1) % 60], [4, 5])
+        servicio.plegar_usuario([i % 40], [3], user_index=i % 60)
+    fin.set()
+    for hilo in hilos:
+        hilo.join()
+
+    assert not errores
+    assert modelo.n_productos == len(modelo.prod_ids) == len(servicio.codigos_producto) == 40 + 50
+    assert servicio.codigos_producto[40:].tolist() == list(range(1000, 1050))